@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+用合成 PLY 序列跑一组固定的 pack/validate/splat4d 场景,输出可跨 commit 对比的 JSON.
+
+每个 case 都是一个独立子进程:
+- wall 时间由本脚本计时(包含解释器启动与 import,这也是用户实际感受到的耗时).
+- peak RSS 来自 `os.wait4` 的子进程 rusage(Linux/macOS). 其它平台为 null.
+- 若工具支持 `--profile-json`,会把其 stage 汇总一起收进结果(便于定位回归发生在哪个阶段).
+
+输出字段(每个 case):
+- `splatsPerSec` = splats * frames / wallSeconds
+- `framesPerSec` = frames / wallSeconds
+- `peakRssBytes`
+- `outputBytes`(pack 类 case)
+
+对比两次结果:
+    python3 Tools~/Benchmarks/run_benchmarks.py --compare old.json new.json
+
+用法示例:
+    python3 Tools~/Benchmarks/run_benchmarks.py --preset default --output bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from synthetic_ply import SyntheticSpec, write_synthetic_sequence
+
+_BENCH_DIR = Path(__file__).resolve().parent
+_TOOLS_DIR = _BENCH_DIR.parent
+_SOG4D_TOOL = _TOOLS_DIR / "Sog4D" / "ply_sequence_to_sog4d.py"
+_SPLAT4D_TOOL = _TOOLS_DIR / "Splat4D" / "ply_sequence_to_splat4d.py"
+
+# 预设规模. smoke 只用于验证脚本本身可跑,数值没有参考意义.
+_PRESETS: dict[str, dict[str, int]] = {
+    "smoke": {"splats": 2_000, "frames": 3},
+    "default": {"splats": 100_000, "frames": 10},
+    "large": {"splats": 1_000_000, "frames": 30},
+}
+
+
+@dataclass
+class _Case:
+    name: str
+    argv: list[str]
+    frames: int
+    output: Optional[Path] = None
+    profile: Optional[Path] = None
+    requires: Optional[str] = None  # 依赖的 case(其输出是本 case 的输入)
+
+
+def _info(msg: str) -> None:
+    print(f"[bench] {msg}", file=sys.stderr)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=_TOOLS_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _run_child(argv: list[str], log_path: Path) -> tuple[int, float, Optional[int], float]:
+    """
+    跑一个子进程,返回 (returncode, wallSeconds, peakRssBytes, cpuSeconds).
+    """
+    with log_path.open("wb") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(argv, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, ru = os.wait4(proc.pid, 0)
+            wall = time.perf_counter() - t0
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # Linux 的 ru_maxrss 单位是 KiB, macOS 是 bytes.
+            peak = int(ru.ru_maxrss) * (1 if sys.platform == "darwin" else 1024)
+            return proc.returncode, wall, peak, float(ru.ru_utime + ru.ru_stime)
+        rc = proc.wait()
+        wall = time.perf_counter() - t0
+        return rc, wall, None, float("nan")
+
+
+def _build_cases(args: argparse.Namespace, ply_dir: Path, work: Path, spec: SyntheticSpec) -> list[_Case]:
+    py = sys.executable
+    bundle = work / "bench.sog4d"
+    cases: list[_Case] = []
+
+    def sog4d_pack(name: str, output: Path, extra: list[str], shn_count: Optional[int] = None) -> _Case:
+        profile = work / f"{name}.profile.json"
+        argv = [
+            py, str(_SOG4D_TOOL), "pack",
+            "--input-dir", str(ply_dir),
+            "--output", str(output),
+            "--sh-bands", str(spec.sh_bands),
+            "--shN-count", str(args.shn_count if shn_count is None else shn_count),
+            "--scale-codebook-size", str(args.scale_codebook_size),
+            "--webp-effort", args.webp_effort,
+            "--seed", str(args.seed),
+            "--profile-json", str(profile),
+            *extra,
+        ]
+        return _Case(name=name, argv=argv, frames=spec.frames, output=output, profile=profile)
+
+    cases.append(sog4d_pack("sog4d_pack", bundle, []))
+    if args.jobs > 1:
+        cases.append(sog4d_pack(f"sog4d_pack_jobs{args.jobs}", work / "bench_jobs.sog4d", ["--jobs", str(args.jobs)]))
+    if args.large_shn_count > 0:
+        # 大 palette 的 k-means(init + 迭代)耗时随 k 增长最快,单独一个 case 盯住 `kmeans_fit:shN_centroids`.
+        cases.append(
+            sog4d_pack("sog4d_pack_large_k", work / "bench_large_k.sog4d", [], shn_count=args.large_shn_count)
+        )
+
+    for level in ("structure", "sample", "full"):
+        cases.append(
+            _Case(
+                name=f"sog4d_validate_{level}",
+                argv=[py, str(_SOG4D_TOOL), "validate", "--input", str(bundle), "--level", level],
+                frames=spec.frames,
+                requires="sog4d_pack",
+            )
+        )
+
+    def splat4d(name: str, output: Path, frames: int, extra: list[str]) -> _Case:
+        profile = work / f"{name}.profile.json"
+        argv = [py, str(_SPLAT4D_TOOL), "--output", str(output), "--profile-json", str(profile), *extra]
+        return _Case(name=name, argv=argv, frames=frames, output=output, profile=profile)
+
+    # average 模式只读首帧与末帧,吞吐按实际读取的帧数算.
+    cases.append(
+        splat4d(
+            "splat4d_average",
+            work / "average.splat4d",
+            min(spec.frames, 2),
+            ["--input-dir", str(ply_dir), "--mode", "average"],
+        )
+    )
+    if spec.frames > 1:
+        cases.append(
+            splat4d(
+                "splat4d_keyframe",
+                work / "keyframe.splat4d",
+                spec.frames,
+                ["--input-dir", str(ply_dir), "--mode", "keyframe", "--frame-step", str(args.frame_step)],
+            )
+        )
+    cases.append(
+        splat4d(
+            "splat4d_v2_single_frame",
+            work / "single.splat4d",
+            1,
+            [
+                "--input-ply", str(ply_dir / "time_00000.ply"),
+                "--splat4d-version", "2",
+                "--sh-codebook-count", str(args.shn_count),
+            ],
+        )
+    )
+    return cases
+
+
+def _select_cases(cases: list[_Case], only: Optional[list[str]]) -> list[_Case]:
+    # `--only` 选中的 case 依赖的 case 也要跑(例如 validate 需要 sog4d_pack 产出的 bundle).
+    if not only:
+        return cases
+    by_name = {case.name: case for case in cases}
+    selected = set(only)
+    pending = list(only)
+    while pending:
+        case = by_name.get(pending.pop())
+        if case is not None and case.requires is not None and case.requires not in selected:
+            _info(f"{case.name} 依赖 {case.requires},一并运行")
+            selected.add(case.requires)
+            pending.append(case.requires)
+    return [case for case in cases if case.name in selected]
+
+
+def _summarize_profile(path: Optional[Path]) -> Optional[dict[str, Any]]:
+    if path is None or not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    stages = {
+        name: {"wallSeconds": s.get("wallSeconds"), "calls": s.get("calls")}
+        for name, s in data.get("stages", {}).items()
+    }
+    return {"totalWallSeconds": data.get("totalWallSeconds"), "stages": stages}
+
+
+def _run_suite(args: argparse.Namespace) -> dict[str, Any]:
+    preset = _PRESETS[args.preset]
+    spec = SyntheticSpec(
+        splats=args.splats if args.splats is not None else preset["splats"],
+        frames=args.frames if args.frames is not None else preset["frames"],
+        sh_bands=args.sh_bands,
+        motion_rate=args.motion_rate,
+        churn_rate=args.churn_rate,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="sog4d_bench_", dir=args.work_dir) as tmp:
+        work = Path(tmp)
+        ply_dir = work / "frames"
+        _info(f"generate: splats={spec.splats}, frames={spec.frames}, shBands={spec.sh_bands}")
+        t0 = time.perf_counter()
+        write_synthetic_sequence(ply_dir, spec)
+        gen_seconds = time.perf_counter() - t0
+
+        results: list[dict[str, Any]] = []
+        for case in _select_cases(_build_cases(args, ply_dir, work, spec), args.only):
+            _info(f"run: {case.name}")
+            log_path = work / f"{case.name}.log"
+            rc, wall, peak, cpu = _run_child(case.argv, log_path)
+            entry: dict[str, Any] = {
+                "name": case.name,
+                "returncode": rc,
+                "wallSeconds": wall,
+                "cpuSeconds": cpu,
+                "peakRssBytes": peak,
+                "frames": case.frames,
+                "splats": spec.splats,
+                "framesPerSec": case.frames / wall if wall > 0 else None,
+                "splatsPerSec": spec.splats * case.frames / wall if wall > 0 else None,
+            }
+            if case.output is not None and case.output.exists():
+                entry["outputBytes"] = case.output.stat().st_size
+            profile = _summarize_profile(case.profile)
+            if profile is not None:
+                entry["profile"] = profile
+            if rc != 0:
+                entry["log"] = log_path.read_text(encoding="utf-8", errors="replace")[-4000:]
+                _info(f"{case.name} failed (rc={rc})")
+            results.append(entry)
+
+    return {
+        "schema": 1,
+        "gitCommit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "preset": args.preset,
+        "dataset": spec.to_dict(),
+        "generateSeconds": gen_seconds,
+        "cases": results,
+    }
+
+
+def _compare(old_path: Path, new_path: Path) -> int:
+    old = json.loads(old_path.read_text(encoding="utf-8"))
+    new = json.loads(new_path.read_text(encoding="utf-8"))
+    if old.get("dataset") != new.get("dataset"):
+        _info("warning: 两份结果的 dataset 参数不同,数值不可直接对比")
+    old_cases = {c["name"]: c for c in old.get("cases", [])}
+    print(f"{'case':<28} {'old s':>9} {'new s':>9} {'speedup':>8} {'old MiB':>9} {'new MiB':>9}")
+    for c in new.get("cases", []):
+        o = old_cases.get(c["name"])
+        if o is None:
+            continue
+        speedup = o["wallSeconds"] / c["wallSeconds"] if c["wallSeconds"] else float("nan")
+        old_mib = (o.get("peakRssBytes") or 0) / (1 << 20)
+        new_mib = (c.get("peakRssBytes") or 0) / (1 << 20)
+        print(
+            f"{c['name']:<28} {o['wallSeconds']:>9.3f} {c['wallSeconds']:>9.3f} {speedup:>7.2f}x"
+            f" {old_mib:>9.1f} {new_mib:>9.1f}"
+        )
+    return 0
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Run synthetic pack/validate/splat4d benchmarks")
+    p.add_argument("--preset", default="default", choices=sorted(_PRESETS), help="数据规模预设")
+    p.add_argument("--splats", type=int, default=None, help="覆盖预设的每帧 splat 数")
+    p.add_argument("--frames", type=int, default=None, help="覆盖预设的帧数")
+    p.add_argument("--sh-bands", type=int, default=3, help="合成数据的 SH bands(0..3)")
+    p.add_argument("--motion-rate", type=float, default=0.2, help="每帧移动的 splat 比例")
+    p.add_argument("--churn-rate", type=float, default=0.05, help="每帧更换 SH 原型的 splat 比例")
+    p.add_argument("--seed", type=int, default=0, help="数据生成与打包共用的随机种子")
+    p.add_argument("--shN-count", dest="shn_count", type=int, default=1024, help="sog4d shN / splat4d SH codebook 大小")
+    p.add_argument(
+        "--large-shN-count",
+        dest="large_shn_count",
+        type=int,
+        default=8192,
+        help="sog4d_pack_large_k case 的 shN palette 大小(默认 8192,与 pack 的默认值一致; 0 表示不跑)",
+    )
+    p.add_argument("--scale-codebook-size", type=int, default=1024, help="sog4d scale codebook 大小")
+    p.add_argument(
+        "--webp-effort",
+        default="balanced",
+        choices=["fast", "balanced", "max"],
+        help="sog4d pack 的 WebP 档位(默认 balanced,避免 max 档的编码时间淹没其它阶段)",
+    )
+    p.add_argument("--jobs", type=int, default=1, help=">1 时额外跑一个 `pack --jobs N` case")
+    p.add_argument("--frame-step", type=int, default=5, help="splat4d keyframe case 的步长")
+    p.add_argument("--only", action="append", default=None, help="只跑指定 case(可重复)")
+    p.add_argument("--work-dir", default=None, help="临时数据的父目录(默认系统临时目录)")
+    p.add_argument("--output", type=Path, default=None, help="结果 JSON 路径(默认打印到 stdout)")
+    p.add_argument(
+        "--compare",
+        nargs=2,
+        type=Path,
+        metavar=("OLD", "NEW"),
+        default=None,
+        help="对比两份结果 JSON 并打印 speedup 表,不运行 benchmark",
+    )
+    return p
+
+
+def main(argv: list[str]) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    if args.compare is not None:
+        return _compare(*args.compare)
+
+    report = _run_suite(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        args.output.write_text(text, encoding="utf-8")
+        _info(f"report: {args.output}")
+    return 0 if all(c["returncode"] == 0 for c in report["cases"]) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+生成可复现的合成 3DGS PLY 序列,用于 `.sog4d` / `.splat4d` 打包器的 benchmark.
+
+设计目标:
+- 同样的参数 + seed,输出字节级一致(跨机器/跨 commit 可对比).
+- 数值分布贴近 gaussian-splatting 常见导出:
+  - opacity 是 logit, scale 是 log(scale), rot 是未归一化的 wxyz.
+  - `f_rest_*` 按仓库 PLY importer 的 channel-major 顺序写出.
+- 可以单独控制两类“帧间变化率”,它们分别决定 pass2 的主要开销:
+  - motion-rate: 每帧移动的 splat 比例(影响 position/rotation 图).
+  - churn-rate: 每帧换 SH 原型的 splat 比例(直接决定 delta-v1 labels 的 update 数).
+
+SH rest 的生成方式:
+- 先随机生成 `--prototypes` 个 SH 原型.
+- 每个 splat 挂在一个原型上,再叠加小噪声.
+- churn 时把 splat 换到另一个原型上,这样 codebook 的 labels 变化率与 churn-rate 基本一致.
+
+用法示例:
+    python3 Tools~/Benchmarks/synthetic_ply.py --output-dir /tmp/bench_frames \\
+        --splats 200000 --frames 30 --sh-bands 3 --motion-rate 0.2 --churn-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    splats: int
+    frames: int
+    sh_bands: int = 3
+    motion_rate: float = 0.2
+    churn_rate: float = 0.05
+    prototypes: int = 256
+    seed: int = 0
+    fmt: str = "binary_little_endian"
+
+    @property
+    def rest_coeff_count(self) -> int:
+        return (self.sh_bands + 1) * (self.sh_bands + 1) - 1 if self.sh_bands > 0 else 0
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "splats": self.splats,
+            "frames": self.frames,
+            "shBands": self.sh_bands,
+            "motionRate": self.motion_rate,
+            "churnRate": self.churn_rate,
+            "prototypes": self.prototypes,
+            "seed": self.seed,
+            "format": self.fmt,
+        }
+
+
+def _field_names(rest_coeff_count: int) -> list[str]:
+    return [
+        "x", "y", "z",
+        "f_dc_0", "f_dc_1", "f_dc_2",
+        "opacity",
+        "scale_0", "scale_1", "scale_2",
+        "rot_0", "rot_1", "rot_2", "rot_3",
+        *[f"f_rest_{i}" for i in range(rest_coeff_count * 3)],
+    ]
+
+
+def _header_bytes(spec: SyntheticSpec, names: list[str]) -> bytes:
+    fmt_line = "format ascii 1.0" if spec.fmt == "ascii" else f"format {spec.fmt} 1.0"
+    lines = [
+        "ply",
+        fmt_line,
+        "comment synthetic 3DGS sequence for Tools~/Benchmarks",
+        f"element vertex {spec.splats}",
+        *[f"property float {n}" for n in names],
+        "end_header",
+        "",
+    ]
+    return "\n".join(lines).encode("ascii")
+
+
+def _validate_spec(spec: SyntheticSpec) -> None:
+    if spec.splats <= 0 or spec.frames <= 0:
+        raise ValueError(f"splats/frames 必须 >0, got splats={spec.splats}, frames={spec.frames}")
+    if spec.sh_bands < 0 or spec.sh_bands > 3:
+        raise ValueError(f"sh-bands 必须是 0..3, got {spec.sh_bands}")
+    for name, rate in (("motion-rate", spec.motion_rate), ("churn-rate", spec.churn_rate)):
+        if not (0.0 <= rate <= 1.0):
+            raise ValueError(f"{name} 必须在 [0,1], got {rate}")
+    if spec.prototypes <= 0:
+        raise ValueError(f"prototypes 必须 >0, got {spec.prototypes}")
+    if spec.fmt not in ("binary_little_endian", "binary_big_endian", "ascii"):
+        raise ValueError(f"未知 PLY format: {spec.fmt}")
+
+
+def write_synthetic_sequence(out_dir: Path, spec: SyntheticSpec) -> list[Path]:
+    """
+    按 spec 写出 `time_00000.ply ...`,返回按帧序排列的路径.
+    """
+    _validate_spec(spec)
+    rng = np.random.default_rng(spec.seed)
+    n = spec.splats
+    rest_coeff_count = spec.rest_coeff_count
+    names = _field_names(rest_coeff_count)
+
+    # 全部状态用 float32 保存,保证写出的 bytes 与平台无关.
+    positions = rng.normal(0.0, 1.0, (n, 3)).astype(np.float32)
+    velocity = rng.normal(0.0, 0.01, (n, 3)).astype(np.float32)
+    f_dc = rng.normal(0.0, 0.5, (n, 3)).astype(np.float32)
+    opacity = rng.normal(1.0, 1.5, n).astype(np.float32)
+    scale = rng.uniform(-6.0, -2.0, (n, 3)).astype(np.float32)
+    rot = rng.normal(0.0, 1.0, (n, 4)).astype(np.float32)
+
+    rest = None
+    proto_of = None
+    protos = None
+    if rest_coeff_count > 0:
+        # channel-major: [N, 3, coeff] 展平后就是 f_rest_0..f_rest_{3*coeff-1}.
+        protos = rng.normal(0.0, 0.3, (spec.prototypes, 3 * rest_coeff_count)).astype(np.float32)
+        proto_of = rng.integers(0, spec.prototypes, n)
+        noise = rng.normal(0.0, 0.01, (n, 3 * rest_coeff_count)).astype(np.float32)
+        rest = protos[proto_of] + noise
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    header = _header_bytes(spec, names)
+    endian = ">" if spec.fmt == "binary_big_endian" else "<"
+    dtype = np.dtype([(name, f"{endian}f4") for name in names])
+    rec = np.empty(n, dtype=dtype)
+
+    paths: list[Path] = []
+    for fi in range(spec.frames):
+        if fi > 0:
+            moved = rng.random(n) < spec.motion_rate
+            positions[moved] += velocity[moved]
+            rot[moved] += rng.normal(0.0, 0.02, (int(moved.sum()), 4)).astype(np.float32)
+
+            if rest is not None:
+                assert proto_of is not None and protos is not None
+                churned = np.flatnonzero(rng.random(n) < spec.churn_rate)
+                proto_of[churned] = (proto_of[churned] + rng.integers(1, spec.prototypes + 1, churned.size)) % spec.prototypes
+                rest[churned] = protos[proto_of[churned]]
+
+        for j, name in enumerate(("x", "y", "z")):
+            rec[name] = positions[:, j]
+        for j in range(3):
+            rec[f"f_dc_{j}"] = f_dc[:, j]
+            rec[f"scale_{j}"] = scale[:, j]
+        rec["opacity"] = opacity
+        for j in range(4):
+            rec[f"rot_{j}"] = rot[:, j]
+        if rest is not None:
+            for j in range(rest.shape[1]):
+                rec[f"f_rest_{j}"] = rest[:, j]
+
+        path = out_dir / f"time_{fi:05d}.ply"
+        with path.open("wb") as fp:
+            fp.write(header)
+            if spec.fmt == "ascii":
+                table = np.stack([rec[name].astype(np.float32) for name in names], axis=1)
+                np.savetxt(fp, table, fmt="%.9g")
+            else:
+                fp.write(rec.tobytes())
+        paths.append(path)
+    return paths
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Generate a deterministic synthetic 3DGS PLY sequence")
+    p.add_argument("--output-dir", type=Path, required=True, help="输出目录(写 time_00000.ply ...)")
+    p.add_argument("--splats", type=int, required=True, help="每帧 splat 数")
+    p.add_argument("--frames", type=int, required=True, help="帧数")
+    p.add_argument("--sh-bands", type=int, default=3, help="SH bands(0..3),决定 f_rest_* 数量")
+    p.add_argument("--motion-rate", type=float, default=0.2, help="每帧移动的 splat 比例")
+    p.add_argument("--churn-rate", type=float, default=0.05, help="每帧更换 SH 原型的 splat 比例(≈labels 变化率)")
+    p.add_argument("--prototypes", type=int, default=256, help="SH 原型数量")
+    p.add_argument("--seed", type=int, default=0, help="随机种子")
+    p.add_argument(
+        "--format",
+        dest="fmt",
+        default="binary_little_endian",
+        choices=["binary_little_endian", "binary_big_endian", "ascii"],
+        help="PLY body 格式",
+    )
+    return p
+
+
+def main(argv: list[str]) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    spec = SyntheticSpec(
+        splats=args.splats,
+        frames=args.frames,
+        sh_bands=args.sh_bands,
+        motion_rate=args.motion_rate,
+        churn_rate=args.churn_rate,
+        prototypes=args.prototypes,
+        seed=args.seed,
+        fmt=args.fmt,
+    )
+    try:
+        paths = write_synthetic_sequence(args.output_dir, spec)
+    except ValueError as exc:
+        print(f"[bench][error] {exc}", file=sys.stderr)
+        return 2
+    print(f"[bench] wrote {len(paths)} frames -> {args.output_dir}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
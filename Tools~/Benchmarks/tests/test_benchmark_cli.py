@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+BENCH_DIR = Path(__file__).resolve().parents[1]
+GENERATOR_PATH = BENCH_DIR / "synthetic_ply.py"
+RUNNER_PATH = BENCH_DIR / "run_benchmarks.py"
+
+
+def _digest_dir(path: Path) -> dict[str, str]:
+    return {p.name: hashlib.sha256(p.read_bytes()).hexdigest() for p in sorted(path.glob("*.ply"))}
+
+
+class SyntheticGeneratorTests(unittest.TestCase):
+    def _generate(self, out_dir: Path, *extra: str) -> None:
+        cmd = [
+            sys.executable,
+            str(GENERATOR_PATH),
+            "--output-dir",
+            str(out_dir),
+            "--splats",
+            "500",
+            "--frames",
+            "3",
+            *extra,
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+    def test_same_seed_is_byte_identical(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            a = Path(tmp) / "a"
+            b = Path(tmp) / "b"
+            c = Path(tmp) / "c"
+            self._generate(a, "--seed", "7")
+            self._generate(b, "--seed", "7")
+            self._generate(c, "--seed", "8")
+
+            self.assertEqual(sorted(_digest_dir(a)), ["time_00000.ply", "time_00001.ply", "time_00002.ply"])
+            self.assertEqual(_digest_dir(a), _digest_dir(b))
+            self.assertNotEqual(_digest_dir(a), _digest_dir(c))
+
+            header = (a / "time_00000.ply").read_bytes().split(b"end_header\n", 1)[0].decode("ascii")
+            self.assertIn("element vertex 500", header)
+            self.assertIn("property float f_rest_44", header)
+
+    def test_runner_emits_throughput_json(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = Path(tmp) / "bench.json"
+            cmd = [
+                sys.executable,
+                str(RUNNER_PATH),
+                "--preset",
+                "smoke",
+                "--only",
+                "splat4d_average",
+                "--work-dir",
+                tmp,
+                "--output",
+                str(report_path),
+            ]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+            report = json.loads(report_path.read_text(encoding="utf-8"))
+            self.assertEqual(report["dataset"]["splats"], 2000)
+            self.assertEqual([c["name"] for c in report["cases"]], ["splat4d_average"])
+            case = report["cases"][0]
+            self.assertEqual(case["returncode"], 0)
+            self.assertGreater(case["splatsPerSec"], 0)
+            self.assertGreater(case["framesPerSec"], 0)
+            self.assertIn("ply_read", case["profile"]["stages"])
+            # average 模式只读首帧与末帧.
+            self.assertEqual(case["frames"], 2)
+
+    def test_only_validate_also_runs_pack(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = Path(tmp) / "bench.json"
+            cmd = [
+                sys.executable,
+                str(RUNNER_PATH),
+                "--preset",
+                "smoke",
+                "--only",
+                "sog4d_validate_structure",
+                "--work-dir",
+                tmp,
+                "--output",
+                str(report_path),
+            ]
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+            report = json.loads(report_path.read_text(encoding="utf-8"))
+            self.assertEqual([c["name"] for c in report["cases"]], ["sog4d_pack", "sog4d_validate_structure"])
+            self.assertEqual([c["returncode"] for c in report["cases"]], [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,28 +22,37 @@
 from __future__ import annotations
 
 import argparse
+import gzip
+import hashlib
 import io
 import json
 import math
+import os
 import re
 import struct
 import shutil
 import sys
+import tarfile
+import tempfile
+import threading
+import time
 import warnings
 import zipfile
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, BinaryIO, Callable, Iterator, Optional
 
 import numpy as np
 from PIL import Image, features
 
 try:
-    # 说明: 我们用 MiniBatchKMeans 做离线 VQ,它对大样本更稳.
-    # 依赖缺失时会给出可行动的报错提示.
-    from sklearn.cluster import MiniBatchKMeans
-except Exception:  # pragma: no cover - 运行环境缺失时才会走这里
-    MiniBatchKMeans = None  # type: ignore[assignment]
+    # `--profile-json` 用它取峰值 RSS. Windows 没有这个模块,此时峰值 RSS 记为 0.
+    import resource
+except Exception:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
 
 try:
     # scale 的最近邻查询用 cKDTree(3D),比全量 cdist 更省内存.
@@ -51,6 +60,12 @@ try:
 except Exception:  # pragma: no cover - 运行环境缺失时才会走这里
     cKDTree = None  # type: ignore[assignment]
 
+try:
+    # `.ply.zst` 输入需要 zstandard; `.ply.gz` 用标准库 gzip 即可.
+    import zstandard
+except Exception:  # pragma: no cover - 可选依赖
+    zstandard = None  # type: ignore[assignment]
+
 
 # -----------------------------------------------------------------------------
 # 常量与小工具
@@ -66,6 +81,11 @@ def _die(msg: str) -> "NoReturn":
     raise SystemExit(2)
 
 
+class _ValidationError(Exception):
+    # validate 的 task 内部用它报告错误,由主进程按 task 顺序挑第一个再 `_die`.
+    pass
+
+
 def _warn(msg: str) -> None:
     print(f"[sog4d][warn] {msg}", file=sys.stderr)
 
@@ -90,15 +110,16 @@ def _sort_key(p: Path) -> tuple[int, Any]:
 
 
 def _list_ply_files(input_dir: Path) -> list[Path]:
-    files = [p for p in input_dir.iterdir() if p.is_file() and p.suffix.lower() == ".ply"]
+    files = [p for p in input_dir.iterdir() if p.is_file() and _is_ply_name(p.name)]
     files.sort(key=_sort_key)
     return files
 
 
-def _resolve_pack_input_ply_files(args: argparse.Namespace) -> list[Path]:
-    # 统一把 pack 的两种正式入口归一为同一份 ply_files:
+def _resolve_pack_input_ply_files(args: argparse.Namespace) -> list[Path | _PlyArchiveMember]:
+    # 统一把 pack 的三种正式入口归一为同一份 ply_files:
     # - `--input-ply`: 单个 `.ply`
     # - `--input-dir`: 包含一个或多个 `.ply` 的目录
+    # - `--input-archive`: 包含一个或多个 `.ply` 的 tar/zip,不解压到磁盘
     # 这样后续编码/validate/self-check 路径无需分叉.
     input_ply_arg = getattr(args, "input_ply", None)
     if input_ply_arg:
@@ -107,8 +128,8 @@ def _resolve_pack_input_ply_files(args: argparse.Namespace) -> list[Path]:
             _die(f"input-ply 不存在: {input_ply}")
         if not input_ply.is_file():
             _die(f"input-ply 不是文件: {input_ply}")
-        if input_ply.suffix.lower() != ".ply":
-            _die(f"input-ply 必须是 .ply 文件: {input_ply}")
+        if not _is_ply_name(input_ply.name):
+            _die(f"input-ply 必须是 .ply / .ply.gz / .ply.zst 文件: {input_ply}")
         return [input_ply]
 
     input_dir_arg = getattr(args, "input_dir", None)
@@ -124,9 +145,137 @@ def _resolve_pack_input_ply_files(args: argparse.Namespace) -> list[Path]:
             _die(f"input-dir 下未找到 .ply: {input_dir}")
         return ply_files
 
+    input_archive_arg = getattr(args, "input_archive", None)
+    if input_archive_arg:
+        input_archive = Path(input_archive_arg)
+        if not input_archive.is_file():
+            _die(f"input-archive 不存在或不是文件: {input_archive}")
+        members = _list_archive_ply_members(input_archive)
+        if not members:
+            _die(f"input-archive 里未找到 .ply: {input_archive}")
+        return members
+
     # 理论上 argparse 的 required mutually exclusive group 已保证不会走到这里.
     # 这里保留兜底,避免未来有人绕过 parser 直接调用 `_pack_cmd`.
-    _die("pack 需要二选一提供 --input-ply 或 --input-dir")
+    _die("pack 需要三选一提供 --input-ply / --input-dir / --input-archive")
+
+
+# -----------------------------------------------------------------------------
+# 分阶段 profiling(`--profile-json`)
+# -----------------------------------------------------------------------------
+
+
+def _peak_rss_bytes(children: bool = False) -> int:
+    # 进程自启动以来的峰值 RSS.
+    # - Linux 的 ru_maxrss 单位是 KiB,macOS 是 bytes.
+    # - Windows 没有 resource 模块,返回 0.
+    if resource is None:
+        return 0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    rss = int(resource.getrusage(who).ru_maxrss)
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@contextmanager
+def _timed(times: list[tuple[str, float, float]], name: str) -> Iterator[None]:
+    # 轻量计时: 把 (stage, wall 秒, CPU 秒) 追加到 times.
+    # 用于 worker 进程内测量,结果随编码结果一起回传给主进程的 `_StageProfiler`.
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    try:
+        yield
+    finally:
+        times.append((name, time.perf_counter() - t0, time.process_time() - c0))
+
+
+def _frame_histogram(values: list[float], bins: int = 10) -> dict[str, Any]:
+    arr = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(arr, bins=bins)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99]).tolist()
+    return {
+        "count": int(arr.size),
+        "meanSeconds": float(arr.mean()),
+        "minSeconds": float(arr.min()),
+        "p50Seconds": float(p50),
+        "p90Seconds": float(p90),
+        "p99Seconds": float(p99),
+        "maxSeconds": float(arr.max()),
+        "histogram": {"edgesSeconds": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+class _StageProfiler:
+    """
+    分阶段记录 wall/CPU 耗时与峰值 RSS,`--profile-json` 时写成 JSON.
+
+    说明:
+    - 每个 stage 记录调用次数,wall/CPU 累计耗时,以及两种内存数字:
+      - `processPeakRssBytesAtEnd`: stage 结束时进程的峰值 RSS(自进程启动以来的高水位,不是本 stage 自己的峰值).
+      - `peakRssGrowthBytes`: 单次调用期间高水位的最大抬升,即本 stage 把进程峰值推高了多少; 0 表示没超过之前的高水位.
+    - 带 frame 的调用额外保留逐帧 wall 耗时,输出分位数与直方图,便于定位慢帧与回归.
+    - worker 进程里的耗时由 worker 自己测量(`_timed`),再通过 `add` 汇总到这里.
+      此时 CPU 为 worker 进程的 CPU 时间,峰值 RSS 见 `peakRssChildrenBytes`.
+    """
+
+    def __init__(self) -> None:
+        self._stages: dict[str, dict[str, Any]] = {}
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, frame: Optional[int] = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        rss0 = _peak_rss_bytes()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0, time.process_time() - c0, frame, rss0)
+
+    def add(
+        self, name: str, wall: float, cpu: float, frame: Optional[int] = None, rss0: Optional[int] = None
+    ) -> None:
+        # rss0: 调用开始时的峰值 RSS. 外部测得的耗时(worker)没有这个值,不计 `peakRssGrowthBytes`.
+        st = self._stages.get(name)
+        if st is None:
+            st = {
+                "calls": 0,
+                "wallSeconds": 0.0,
+                "cpuSeconds": 0.0,
+                "processPeakRssBytesAtEnd": 0,
+                "peakRssGrowthBytes": 0,
+                "frameWall": [],
+            }
+            self._stages[name] = st
+        st["calls"] += 1
+        st["wallSeconds"] += float(wall)
+        st["cpuSeconds"] += float(cpu)
+        rss = _peak_rss_bytes()
+        st["processPeakRssBytesAtEnd"] = max(st["processPeakRssBytesAtEnd"], rss)
+        if rss0 is not None:
+            st["peakRssGrowthBytes"] = max(st["peakRssGrowthBytes"], rss - rss0)
+        if frame is not None:
+            st["frameWall"].append(float(wall))
+
+    def to_dict(self) -> dict[str, Any]:
+        stages: dict[str, Any] = {}
+        for name, st in self._stages.items():
+            out = {k: v for k, v in st.items() if k != "frameWall"}
+            if st["frameWall"]:
+                out["perFrame"] = _frame_histogram(st["frameWall"])
+            stages[name] = out
+        return {
+            "totalWallSeconds": time.perf_counter() - self._wall0,
+            "totalCpuSeconds": time.process_time() - self._cpu0,
+            "peakRssBytes": _peak_rss_bytes(),
+            "peakRssChildrenBytes": _peak_rss_bytes(children=True),
+            "stages": stages,
+        }
+
+    def write_json(self, path: Path, info: dict[str, Any]) -> None:
+        report = {**info, **self.to_dict()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
 # -----------------------------------------------------------------------------
@@ -247,33 +396,299 @@ def _parse_ply_header(fp) -> _PlyHeader:
     return _PlyHeader(fmt=fmt, endian=endian, vertex_count=vertex_count, vertex_props=vertex_props)
 
 
-def _read_ply_vertices(path: Path) -> np.ndarray:
-    with path.open("rb") as fp:
-        header = _parse_ply_header(fp)
-        dtype = np.dtype(header.vertex_props, align=False)
-
-        if header.fmt in ("binary_little_endian", "binary_big_endian"):
-            data = np.fromfile(fp, dtype=dtype, count=header.vertex_count)
-        elif header.fmt == "ascii":
-            # ascii 模式通常只用于调试或小文件.
-            cols = len(header.vertex_props)
-            data = np.empty(header.vertex_count, dtype=dtype)
-            for i in range(header.vertex_count):
-                line = fp.readline()
-                if not line:
-                    raise ValueError(f"PLY: unexpected EOF while reading vertices: {path}")
-                items = line.decode("ascii", errors="replace").strip().split()
-                if len(items) < cols:
-                    raise ValueError(f"PLY: vertex line has too few columns: {path} line={i}")
-                if len(items) != cols:
-                    raise ValueError(f"PLY: vertex line has unexpected extra columns: {path} line={i}")
-                for (name, dt), token in zip(header.vertex_props, items):
-                    data[name][i] = np.array(token, dtype=dt)
+def _read_ply_header(path: Path | _PlyArchiveMember) -> _PlyHeader:
+    # 只解析 header,不读取 vertex body.
+    # pass 0 只需要 splatCount 与字段列表,没必要为此把整帧读进内存.
+    with _open_ply_stream(path) as fp:
+        return _parse_ply_header(fp)
+
+
+# -----------------------------------------------------------------------------
+# 压缩输入(`.ply.gz` / `.ply.zst`)
+# -----------------------------------------------------------------------------
+#
+# - 压缩文件不能 memmap: header 与 body 都从解压流顺序读取,body 直接 readinto 预分配的 vertex 数组,
+#   不落临时的未压缩文件.
+# - 提前解压交给 `--prefetch-frames`: 预读线程整帧解码(含解压),zlib/zstandard 解压时释放 GIL,
+#   与主线程的编码重叠. 单帧内部再拆一个解压线程只能和 memcpy 重叠,实测反而更慢.
+
+_PLY_SUFFIXES: tuple[str, ...] = (".ply", ".ply.gz", ".ply.zst")
+
+
+def _is_ply_name(name: str) -> bool:
+    return name.lower().endswith(_PLY_SUFFIXES)
+
+
+def _is_compressed_ply(name: str) -> bool:
+    return name.lower().endswith((".ply.gz", ".ply.zst"))
+
+
+def _open_ply_source(path: Path | _PlyArchiveMember) -> BinaryIO:
+    # 打开未解压的原始字节流: 普通文件,或归档里的一个成员.
+    if isinstance(path, _PlyArchiveMember):
+        return path.open()
+    return path.open("rb")
+
+
+@contextmanager
+def _open_ply_stream(path: Path | _PlyArchiveMember) -> Iterator[BinaryIO]:
+    # 按后缀打开(解压)流,只支持顺序读.
+    name = path.name.lower()
+    with _open_ply_source(path) as raw:
+        if name.endswith(".gz"):
+            with gzip.GzipFile(fileobj=raw, mode="rb") as fp:
+                yield fp
+        elif name.endswith(".zst"):
+            if zstandard is None:
+                _die(f"读取 {path.name} 需要 zstandard: pip install zstandard")
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+            # zstandard 的 reader 没有 readline,包一层 BufferedReader 给 header 解析用.
+            with io.BufferedReader(reader) as fp:  # type: ignore[arg-type]
+                yield fp
         else:
+            yield raw
+
+
+# -----------------------------------------------------------------------------
+# 归档输入(`--input-archive`, tar / zip)
+# -----------------------------------------------------------------------------
+#
+# - 每帧在 pass 0/1/2 里会被读 2~3 次,且 `--jobs N` 的 worker 按帧号乱序读取,所以成员必须能随机访问:
+#   - 未压缩 tar 与 zip 里 stored 的成员在归档里是一段连续字节,binary PLY 直接 memmap 归档文件的这段区间,
+#     与 `--input-dir` 一样零拷贝.
+#   - zip 里 deflate 等压缩成员用 `zipfile` 按流解压.
+#   - `.tar.gz` 这类整体压缩的 tar 不支持随机访问,直接报错; 可以改成 tar 里放 `.ply.gz`,或用 zip.
+# - 成员用 (归档路径, 成员名, 数据偏移, 大小) 描述,可以 pickle 给 worker 进程,每次读取时再打开归档.
+
+
+@dataclass(frozen=True)
+class _PlyArchiveMember:
+    archive: Path
+    member: str
+    offset: int  # 成员数据在归档里的起始字节; <0 表示压缩存储的 zip 成员,只能经 `zipfile` 读
+    size: int  # 成员数据字节数(压缩成员是解压后的大小)
+
+    @property
+    def name(self) -> str:
+        return self.member.rsplit("/", 1)[-1]
+
+    def __str__(self) -> str:
+        return f"{self.archive}:{self.member}"
+
+    def open(self) -> BinaryIO:
+        if self.offset >= 0:
+            return io.BufferedReader(_ByteRangeReader(self.archive, self.offset, self.size))
+        return _open_zip_archive(self.archive).open(self.member)
+
+
+class _ByteRangeReader(io.RawIOBase):
+    # 归档文件里 [start, start+size) 这段字节的只读视图,支持 seek/tell(header 解析后要拿 body 偏移).
+
+    def __init__(self, path: Path, start: int, size: int) -> None:
+        self._fp = path.open("rb", buffering=0)
+        self._start = int(start)
+        self._size = int(size)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self._size - self._pos)
+        if n <= 0:
+            return 0
+        self._fp.seek(self._start + self._pos)
+        got = self._fp.readinto(memoryview(b)[:n]) or 0
+        self._pos += got
+        return got
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + int(offset))
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+
+_ZIP_ARCHIVES: dict[tuple[int, Path], zipfile.ZipFile] = {}
+_ZIP_ARCHIVES_LOCK = threading.Lock()
+
+
+def _open_zip_archive(path: Path) -> zipfile.ZipFile:
+    # 每个进程只解析一次 central directory. key 带 pid: fork 出的 worker 不能共用父进程的文件偏移.
+    key = (os.getpid(), path)
+    with _ZIP_ARCHIVES_LOCK:
+        zf = _ZIP_ARCHIVES.get(key)
+        if zf is None:
+            zf = zipfile.ZipFile(path)
+            _ZIP_ARCHIVES[key] = zf
+        return zf
+
+
+def _zip_member_data_offset(fp: BinaryIO, info: zipfile.ZipInfo) -> int:
+    # local file header: 30 字节定长部分 + 文件名 + extra,之后才是数据.
+    fp.seek(info.header_offset)
+    fixed = fp.read(30)
+    if len(fixed) != 30 or fixed[:4] != b"PK\x03\x04":
+        raise ValueError(f"zip local header 损坏: {info.filename}")
+    name_len, extra_len = struct.unpack("<HH", fixed[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def _is_archive_ply_member(name: str) -> bool:
+    # macOS 打的 zip 会带 `__MACOSX/._time_00001.ply` 这类资源分叉文件,不是 PLY.
+    return _is_ply_name(name) and not name.startswith("__MACOSX/") and not name.rsplit("/", 1)[-1].startswith("._")
+
+
+def _list_archive_ply_members(archive: Path) -> list[_PlyArchiveMember]:
+    members: list[_PlyArchiveMember] = []
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf, archive.open("rb") as fp:
+            for info in zf.infolist():
+                if info.is_dir() or not _is_archive_ply_member(info.filename):
+                    continue
+                if info.flag_bits & 0x1:
+                    _die(f"input-archive 不支持加密的 zip 成员: {archive}:{info.filename}")
+                if info.compress_type == zipfile.ZIP_STORED:
+                    offset = _zip_member_data_offset(fp, info)
+                else:
+                    offset = -1
+                members.append(_PlyArchiveMember(archive, info.filename, offset, int(info.file_size)))
+    else:
+        try:
+            tf = tarfile.open(archive, mode="r:")
+        except tarfile.ReadError:
+            _die(f"input-archive 只支持 zip 与未压缩的 tar(成员需要随机访问,整体压缩的 tar 请先解压外层): {archive}")
+        with tf:
+            for info in tf:
+                if not info.isfile() or not _is_archive_ply_member(info.name):
+                    continue
+                if info.issparse():
+                    _die(f"input-archive 不支持 sparse tar 成员: {archive}:{info.name}")
+                members.append(_PlyArchiveMember(archive, info.name, int(info.offset_data), int(info.size)))
+    members.sort(key=lambda m: _sort_key(Path(m.member)))
+    return members
+
+
+def _read_ply_binary_stream(fp: BinaryIO, header: _PlyHeader, path: Path | _PlyArchiveMember) -> np.ndarray:
+    # 从顺序流读取 binary body: 直接 readinto 预分配的结构化数组,没有中间整帧 bytes.
+    data = np.empty(header.vertex_count, dtype=np.dtype(header.vertex_props, align=False))
+    buf = memoryview(data.view(np.uint8))
+    filled = 0
+    while filled < buf.nbytes:
+        n = fp.readinto(buf[filled:])
+        if not n:
+            raise ValueError(f"PLY: vertex body truncated: {path} expected {buf.nbytes} body bytes, got {filled}")
+        filled += n
+    return data
+
+
+def _read_ply_vertices(path: Path | _PlyArchiveMember) -> np.ndarray:
+    if _is_compressed_ply(path.name) or (isinstance(path, _PlyArchiveMember) and path.offset < 0):
+        with _open_ply_stream(path) as fp:
+            header = _parse_ply_header(fp)
+            if header.fmt == "ascii":
+                return _read_ply_ascii_body(fp, header, path)
+            return _read_ply_binary_stream(fp, header, path)
+
+    with _open_ply_source(path) as fp:
+        header = _parse_ply_header(fp)
+
+        if header.fmt == "ascii":
+            return _read_ply_ascii_body(fp, header, path)
+
+        if header.fmt not in ("binary_little_endian", "binary_big_endian"):
             raise ValueError(f"PLY: unsupported format: {header.fmt}")
+        body_offset = fp.tell()
+
+    return _memmap_ply_body(path, header, body_offset)
+
+
+_ASCII_BLOCK_ROWS = 65536
+
+
+def _read_ply_ascii_body(fp, header: _PlyHeader, path: Path) -> np.ndarray:
+    # ascii body 按块交给 `np.loadtxt` 的 C 解析器,避免逐 token 的 Python 循环.
+    # - 列数不对时 loadtxt 会整块失败,此时再逐行扫描该块,给出和以前一致的行号报错.
+    # - 所有列先按 float64 解析再转成目标 dtype,整数列在 2^53 以内是精确的.
+    dtype = np.dtype(header.vertex_props, align=False)
+    cols = len(header.vertex_props)
+    count = header.vertex_count
+    data = np.empty(count, dtype=dtype)
+    if count == 0:
+        return data
+
+    lines = fp.read().split(b"\n", count)
+    if len(lines) < count or (len(lines) == count and lines[-1] == b""):
+        raise ValueError(f"PLY: unexpected EOF while reading vertices: {path}")
+
+    for start in range(0, count, _ASCII_BLOCK_ROWS):
+        end = min(start + _ASCII_BLOCK_ROWS, count)
+        block_lines = lines[start:end]
+        text = b"\n".join(block_lines).decode("ascii", errors="replace")
+        try:
+            with warnings.catch_warnings():
+                # 空块/空行时 loadtxt 会发 UserWarning,这里统一由下面的行数检查兜底.
+                warnings.simplefilter("ignore", UserWarning)
+                block = np.loadtxt(io.StringIO(text), dtype=np.float64, comments=None, ndmin=2)
+        except ValueError:
+            block = None
+        if block is None or block.shape != (end - start, cols):
+            _raise_ascii_column_error(block_lines, start, cols, path)
+            raise ValueError(f"PLY: invalid vertex value in lines {start}..{end - 1}: {path}")
+
+        for i, (name, _dt) in enumerate(header.vertex_props):
+            data[name][start:end] = block[:, i]
     return data
 
 
+def _raise_ascii_column_error(block_lines: list[bytes], start: int, cols: int, path: Path) -> None:
+    for offset, line in enumerate(block_lines):
+        items = line.split()
+        if len(items) < cols:
+            raise ValueError(f"PLY: vertex line has too few columns: {path} line={start + offset}")
+        if len(items) != cols:
+            raise ValueError(f"PLY: vertex line has unexpected extra columns: {path} line={start + offset}")
+
+
+def _memmap_ply_body(path: Path | _PlyArchiveMember, header: _PlyHeader, body_offset: int) -> np.ndarray:
+    # binary body 直接 memmap,不做整帧拷贝.
+    # - 返回的是结构化 memmap,`v["x"]` 这类字段访问都是 strided view.
+    # - 真正的拷贝只发生在 `_gather_columns` 把用到的列转成 float32 时.
+    # - 归档成员 memmap 的是归档文件里该成员的那段区间.
+    dtype = np.dtype(header.vertex_props, align=False)
+    expected_end = body_offset + header.vertex_count * dtype.itemsize
+    if isinstance(path, _PlyArchiveMember):
+        file_path, base, file_size = path.archive, path.offset, path.size
+    else:
+        file_path, base, file_size = path, 0, path.stat().st_size
+    if file_size < expected_end:
+        raise ValueError(
+            f"PLY: vertex body truncated: {path} expected {expected_end} bytes, got {file_size}"
+        )
+    if header.vertex_count == 0:
+        return np.empty((0,), dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode="r", offset=base + body_offset, shape=(header.vertex_count,))
+
+
+def _gather_columns(v: np.ndarray, names: list[str]) -> np.ndarray:
+    # 把若干标量列一次性写进预分配的 [N,len(names)] float32.
+    # 相比 `np.stack([...]).astype(...)`,这里每列只拷贝一次,也不会产生中间数组.
+    out = np.empty((v.shape[0], len(names)), dtype=np.float32)
+    for i, name in enumerate(names):
+        out[:, i] = v[name]
+    return out
+
+
 def _require_fields(v: np.ndarray, path: Path, fields: list[str]) -> None:
     names = set(v.dtype.names or [])
     missing = [f for f in fields if f not in names]
@@ -281,9 +696,8 @@ def _require_fields(v: np.ndarray, path: Path, fields: list[str]) -> None:
         _die(f"PLY 缺少必需字段: {missing}. file={path}")
 
 
-def _find_rest_fields(v: np.ndarray) -> list[str]:
+def _find_rest_field_names(names: list[str]) -> list[str]:
     # 按 f_rest_0,f_rest_1,... 排序输出.
-    names = v.dtype.names or []
     rest: list[tuple[int, str]] = []
     for n in names:
         if not n.startswith("f_rest_"):
@@ -307,8 +721,39 @@ class PlyFrame:
     rot_raw: np.ndarray  # [N,4] (w,x,y,z)但可能未归一化
     rest: Optional[np.ndarray]  # [N,restCoeffCount,3] or None
 
+    def rest_rows(self, idx: np.ndarray) -> np.ndarray:
+        # 与 `_ProjectedPlyFrame.rest_rows` 同接口,pass 1 的采样代码不区分两种帧.
+        assert self.rest is not None
+        return self.rest[idx]
+
 
-def _read_ply_frame(path: Path, rest_field_names: list[str] | None) -> PlyFrame:
+@dataclass(frozen=True)
+class _ProjectedPlyFrame:
+    """
+    pass 1 / train-codebooks 的投影读取结果: 只展开采样与 position range 用到的列.
+
+    - positions/f_dc/opacity_raw/scale_raw 整列转成 float32,数值与 `PlyFrame` 完全一致.
+    - rot 不读; rest 不整列展开,`rest_rows(idx)` 只 gather 被采样到的行.
+    - binary PLY 的 body 按行交错存储(每行含全部属性),memmap 时操作系统仍按页读入整行:
+      省下的是 rot/rest 整列 float32 的拷贝与常驻内存,读盘字节数基本不变.
+    """
+
+    positions: np.ndarray  # [N,3]
+    f_dc: np.ndarray  # [N,3]
+    opacity_raw: np.ndarray  # [N]
+    scale_raw: np.ndarray  # [N,3]
+    vertices: np.ndarray  # 结构化 vertex 数组(binary 时是 memmap)
+    rest_field_names: Optional[list[str]]
+
+    def rest_rows(self, idx: np.ndarray) -> np.ndarray:
+        # 返回 [len(idx),restCoeffCount,3],行顺序与 idx 一致.
+        assert self.rest_field_names
+        flat = _gather_columns(self.vertices[idx], self.rest_field_names)
+        return flat.reshape(idx.shape[0], -1, 3)
+
+
+def _read_ply_columns(path: Path | _PlyArchiveMember, rest_field_names: list[str] | None) -> dict[str, np.ndarray]:
+    # 解析 PLY 并取出用到的列(float32). rest 保持 PLY 字段顺序的 [N,R],reshape 交给 `_read_ply_frame`.
     v = _read_ply_vertices(path)
 
     _require_fields(
@@ -332,32 +777,339 @@ def _read_ply_frame(path: Path, rest_field_names: list[str] | None) -> PlyFrame:
         ],
     )
 
-    positions = np.stack([v["x"], v["y"], v["z"]], axis=1).astype(np.float32, copy=False)
-    f_dc = np.stack([v["f_dc_0"], v["f_dc_1"], v["f_dc_2"]], axis=1).astype(np.float32, copy=False)
-    opacity_raw = v["opacity"].astype(np.float32, copy=False)
-    scale_raw = np.stack([v["scale_0"], v["scale_1"], v["scale_2"]], axis=1).astype(np.float32, copy=False)
-    rot_raw = np.stack([v["rot_0"], v["rot_1"], v["rot_2"], v["rot_3"]], axis=1).astype(np.float32, copy=False)
-
-    rest: Optional[np.ndarray] = None
+    columns = {
+        "positions": _gather_columns(v, ["x", "y", "z"]),
+        "f_dc": _gather_columns(v, ["f_dc_0", "f_dc_1", "f_dc_2"]),
+        "opacity_raw": np.array(v["opacity"], dtype=np.float32),
+        "scale_raw": _gather_columns(v, ["scale_0", "scale_1", "scale_2"]),
+        "rot_raw": _gather_columns(v, ["rot_0", "rot_1", "rot_2", "rot_3"]),
+    }
     if rest_field_names:
         # rest 字段必须齐全,否则视为不合法输入(否则 bands 会变得不确定).
         _require_fields(v, path, rest_field_names)
-        flat = np.stack([v[n] for n in rest_field_names], axis=1).astype(np.float32, copy=False)  # [N, R]
+        columns["rest"] = _gather_columns(v, rest_field_names)  # [N, R]
+    return columns
+
+
+def _read_ply_frame(
+    path: Path | _PlyArchiveMember,
+    rest_field_names: list[str] | None,
+    decode_cache: Optional["_PlyDecodeCache"] = None,
+) -> PlyFrame:
+    if decode_cache is not None:
+        columns = decode_cache.load(path, rest_field_names)
+    else:
+        columns = _read_ply_columns(path, rest_field_names)
+
+    rest: Optional[np.ndarray] = None
+    if rest_field_names:
+        flat = columns["rest"]
         if flat.shape[1] % 3 != 0:
             _die(f"PLY f_rest_* 字段数量不是 3 的倍数: {flat.shape[1]}. file={path}")
         rest_coeff_count = flat.shape[1] // 3
         rest = flat.reshape(flat.shape[0], rest_coeff_count, 3)
 
     return PlyFrame(
-        positions=positions,
-        f_dc=f_dc,
-        opacity_raw=opacity_raw,
-        scale_raw=scale_raw,
-        rot_raw=rot_raw,
+        positions=columns["positions"],
+        f_dc=columns["f_dc"],
+        opacity_raw=columns["opacity_raw"],
+        scale_raw=columns["scale_raw"],
+        rot_raw=columns["rot_raw"],
         rest=rest,
     )
 
 
+def _read_ply_projected(path: Path | _PlyArchiveMember, rest_field_names: list[str] | None) -> _ProjectedPlyFrame:
+    v = _read_ply_vertices(path)
+    _require_fields(
+        v,
+        path,
+        ["x", "y", "z", "f_dc_0", "f_dc_1", "f_dc_2", "opacity", "scale_0", "scale_1", "scale_2"],
+    )
+    if rest_field_names:
+        _require_fields(v, path, rest_field_names)
+        if len(rest_field_names) % 3 != 0:
+            _die(f"PLY f_rest_* 字段数量不是 3 的倍数: {len(rest_field_names)}. file={path}")
+    return _ProjectedPlyFrame(
+        positions=_gather_columns(v, ["x", "y", "z"]),
+        f_dc=_gather_columns(v, ["f_dc_0", "f_dc_1", "f_dc_2"]),
+        opacity_raw=np.array(v["opacity"], dtype=np.float32),
+        scale_raw=_gather_columns(v, ["scale_0", "scale_1", "scale_2"]),
+        vertices=v,
+        rest_field_names=rest_field_names or None,
+    )
+
+
+# -----------------------------------------------------------------------------
+# 跨运行的逐帧解码缓存(`--decode-cache-dir`)
+# -----------------------------------------------------------------------------
+
+_DECODE_CACHE_LAYOUT = "v1"
+_DECODE_CACHE_COLUMNS: tuple[str, ...] = ("positions", "f_dc", "opacity_raw", "scale_raw", "rot_raw", "rest")
+_DECODE_CACHE_HASH_CHUNK = 1 << 20
+
+
+class _PlyDecodeCache:
+    """
+    把 `_read_ply_columns` 的结果按帧落盘为一组 `.npy`,下次运行命中时直接 memmap 读回.
+
+    布局(`<root>/v1/`):
+    - `keys/<路径+size+mtime_ns 的 hash>.json`: 该文件当时的内容 hash. stat 不变就不再重新读文件算 hash.
+    - `frames/<内容 hash>-<rest 字段签名>/<列名>.npy`: numpy 的 `.npy` header 按 64 字节对齐,memmap 读回的数据也是对齐的.
+    - 条目目录的 mtime 即 LRU 时间戳: 命中时 touch,总大小超过预算时从最旧的条目开始删.
+      淘汰后,内容已没有任何条目的 key 记录一并删除,`keys/` 不会随输入文件的改动无限增长.
+
+    说明:
+    - 条目按内容 hash 寻址: 文件被复制/改名后仍然命中,内容变了自然不命中.
+    - 存的是未解释的原始列(rest 是 PLY 字段顺序的 [N,R]),`.splat4d` 导出工具可以共用同一个缓存目录.
+    - 写入先落到临时目录再 rename,`--jobs N` 的多个进程同时读写也不会读到半个条目.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root / _DECODE_CACHE_LAYOUT
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None
+        for sub in ("keys", "frames", "tmp"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _content_hash(self, path: Path | _PlyArchiveMember) -> str:
+        # 归档成员用归档文件的 stat 加成员名做 key,内容 hash 算的是成员本身的字节.
+        stat_path = path.archive if isinstance(path, _PlyArchiveMember) else path
+        st = stat_path.stat()
+        resolved = str(stat_path.resolve())
+        if isinstance(path, _PlyArchiveMember):
+            resolved = f"{resolved}:{path.member}"
+        key = hashlib.blake2b(f"{resolved}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"), digest_size=16).hexdigest()
+        key_path = self.root / "keys" / f"{key}.json"
+        try:
+            return str(json.loads(key_path.read_text(encoding="utf-8"))["content"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        h = hashlib.blake2b(digest_size=16)
+        with _open_ply_source(path) as fp:
+            for chunk in iter(lambda: fp.read(_DECODE_CACHE_HASH_CHUNK), b""):
+                h.update(chunk)
+        content = h.hexdigest()
+        # hash 期间文件被改写时不记 key,下次重新算.
+        st2 = stat_path.stat()
+        if (st2.st_size, st2.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            record = {"path": resolved, "size": st.st_size, "mtimeNs": st.st_mtime_ns, "content": content}
+            tmp = self.root / "tmp" / f"{key}.{os.getpid()}.json"
+            tmp.write_text(json.dumps(record), encoding="utf-8")
+            os.replace(tmp, key_path)
+        return content
+
+    def _entry_dir(self, content: str, rest_field_names: list[str] | None) -> Path:
+        if rest_field_names:
+            sig = hashlib.blake2b(",".join(rest_field_names).encode("utf-8"), digest_size=6).hexdigest()
+        else:
+            sig = "norest"
+        return self.root / "frames" / f"{content}-{sig}"
+
+    def _load_entry(self, entry: Path, with_rest: bool) -> Optional[dict[str, np.ndarray]]:
+        columns: dict[str, np.ndarray] = {}
+        try:
+            for name in _DECODE_CACHE_COLUMNS:
+                if name == "rest" and not with_rest:
+                    continue
+                columns[name] = np.load(entry / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            os.utime(entry)
+        except (OSError, ValueError):
+            # 条目缺文件/被并发淘汰/损坏: 当作未命中,重新解码覆盖.
+            return None
+        return columns
+
+    def load(self, path: Path | _PlyArchiveMember, rest_field_names: list[str] | None) -> dict[str, np.ndarray]:
+        entry = self._entry_dir(self._content_hash(path), rest_field_names)
+        columns = self._load_entry(entry, bool(rest_field_names))
+        if columns is not None:
+            self.hits += 1
+            return columns
+        self.misses += 1
+        columns = _read_ply_columns(path, rest_field_names)
+        self._store(entry, columns)
+        return columns
+
+    def _store(self, entry: Path, columns: dict[str, np.ndarray]) -> None:
+        tmp = Path(tempfile.mkdtemp(prefix=f"{entry.name}.", dir=self.root / "tmp"))
+        size = 0
+        for name, arr in columns.items():
+            p = tmp / f"{name}.npy"
+            np.save(p, np.ascontiguousarray(arr), allow_pickle=False)
+            size += p.stat().st_size
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # 另一个进程刚写好同一条目: 用它的即可.
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        if self._bytes is not None:
+            self._bytes += size
+        if self._bytes is None or self._bytes > self.max_bytes:
+            self.evict(keep=entry)
+
+    def _scan(self) -> tuple[list[tuple[float, int, Path]], int]:
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        for entry in (self.root / "frames").iterdir():
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except OSError:
+                continue
+            total += size
+        return entries, total
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        # 按条目目录 mtime 从旧到新删,直到总大小不超过预算. 刚写入的条目(keep)不删.
+        entries, total = self._scan()
+        entries.sort(key=lambda e: e[0])
+        for _mtime, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        self._bytes = total
+        self._prune_keys()
+
+    def _prune_keys(self) -> None:
+        # key 记录只是 "路径+stat -> 内容 hash" 的索引,内容的所有条目都没了就没有保留的意义.
+        live = {entry.name.rsplit("-", 1)[0] for entry in (self.root / "frames").iterdir()}
+        for key_path in (self.root / "keys").glob("*.json"):
+            try:
+                content = str(json.loads(key_path.read_text(encoding="utf-8"))["content"])
+            except (OSError, ValueError, KeyError):
+                content = ""
+            if content not in live:
+                try:
+                    key_path.unlink()
+                except OSError:
+                    continue
+
+    def summary(self) -> str:
+        _, total = self._scan()
+        return (
+            f"decode cache: hits={self.hits}, misses={self.misses}, "
+            f"size={total / (1 << 20):.1f} MiB / budget {self.max_bytes / (1 << 20):.1f} MiB ({self.root})"
+        )
+
+
+# -----------------------------------------------------------------------------
+# 后台预读(`--prefetch-frames`)
+# -----------------------------------------------------------------------------
+
+
+def _ply_frame_nbytes(frame: PlyFrame | _ProjectedPlyFrame) -> int:
+    # 只统计常驻内存的数组: memmap(binary body,解码缓存)由页缓存按需换入,不计入预读上限.
+    return sum(
+        int(a.nbytes) for a in vars(frame).values() if isinstance(a, np.ndarray) and not isinstance(a, np.memmap)
+    )
+
+
+class _PlyPrefetcher:
+    """
+    后台线程按帧序读取并解码 PLY,放进有界队列,让读盘与主线程的计算重叠.
+
+    - 最多领先 `depth` 帧; 队列里的数组总字节数达到 `max_bytes` 时也暂停预读.
+      队列为空时总会再读一帧,所以单帧超过上限也能推进,峰值最多多出一帧.
+    - 读取线程里的异常(包括 `_die` 的 SystemExit)在主线程取到该帧时原样抛出.
+    - 用线程而不是进程: 读盘与 numpy 的列拷贝基本都会释放 GIL,解码结果也不用跨进程序列化.
+    """
+
+    def __init__(
+        self,
+        ply_files: list[Path | _PlyArchiveMember],
+        read: Callable[[Path | _PlyArchiveMember], PlyFrame | _ProjectedPlyFrame],
+        depth: int,
+        max_bytes: int,
+    ) -> None:
+        self.ply_files = ply_files
+        self.read = read
+        self.depth = max(1, int(depth))
+        self.max_bytes = int(max_bytes)
+        self._cond = threading.Condition()
+        self._queue: deque[tuple[Optional[PlyFrame | _ProjectedPlyFrame], Optional[BaseException], int]] = deque()
+        self._queued_bytes = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ply-prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        for ply in self.ply_files:
+            with self._cond:
+                while not self._closed and (
+                    len(self._queue) >= self.depth or (self._queue and self._queued_bytes >= self.max_bytes)
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+            frame: Optional[PlyFrame | _ProjectedPlyFrame] = None
+            error: Optional[BaseException] = None
+            size = 0
+            try:
+                frame = self.read(ply)
+                size = _ply_frame_nbytes(frame)
+            except BaseException as e:  # 包括 `_die` 的 SystemExit,交给主线程抛出
+                error = e
+            with self._cond:
+                self._queue.append((frame, error, size))
+                self._queued_bytes += size
+                self._cond.notify_all()
+            if error is not None:
+                return
+
+    def __iter__(self) -> Iterator[PlyFrame | _ProjectedPlyFrame]:
+        for _ in self.ply_files:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                frame, error, size = self._queue.popleft()
+                self._queued_bytes -= size
+                self._cond.notify_all()
+            if error is not None:
+                raise error
+            assert frame is not None
+            yield frame
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def _iter_ply_frames(
+    ply_files: list[Path | _PlyArchiveMember],
+    read: Callable[[Path | _PlyArchiveMember], Any],
+    depth: int,
+    max_bytes: int,
+) -> Iterator[Any]:
+    # 按帧序产出解码后的帧. depth<=0 时在当前线程逐帧读取(旧行为),否则交给 `_PlyPrefetcher`.
+    if depth <= 0:
+        for ply in ply_files:
+            yield read(ply)
+        return
+    prefetcher = _PlyPrefetcher(ply_files, read, depth, max_bytes)
+    try:
+        yield from prefetcher
+    finally:
+        prefetcher.close()
+
+
+def _open_decode_cache(args: argparse.Namespace) -> Optional[_PlyDecodeCache]:
+    if not args.decode_cache_dir:
+        return None
+    if float(args.decode_cache_max_gb) <= 0:
+        _die(f"--decode-cache-max-gb 必须 >0, got {args.decode_cache_max_gb}")
+    return _PlyDecodeCache(Path(args.decode_cache_dir), int(float(args.decode_cache_max_gb) * (1 << 30)))
+
+
 # -----------------------------------------------------------------------------
 # 数值与量化
 # -----------------------------------------------------------------------------
@@ -436,7 +1188,16 @@ def _quantize_0_1_to_u8(x: np.ndarray) -> np.ndarray:
     return np.clip(np.round(x * 255.0), 0, 255).astype(np.uint8)
 
 
-def _weighted_choice_no_replace(rng: np.random.Generator, n: int, size: int, weights: np.ndarray) -> np.ndarray:
+_WEIGHTED_SAMPLERS = ("numpy", "a-es")
+
+
+def _weighted_choice_no_replace(
+    rng: np.random.Generator,
+    n: int,
+    size: int,
+    weights: np.ndarray,
+    method: str = "numpy",
+) -> np.ndarray:
     # ---------------------------------------------------------------------
     # numpy 的 `Generator.choice(..., replace=False, p=...)` 有一个硬约束:
     # - `p` 中非零项数量必须 >= `size`.
@@ -450,6 +1211,11 @@ def _weighted_choice_no_replace(rng: np.random.Generator, n: int, size: int, wei
     # 这里统一做“稳态采样”:
     # 1) 若权重总和无效/为 0,回退到均匀采样.
     # 2) 若非零权重不足,自动把 size clamp 到非零数量.
+    #
+    # method:
+    # - "numpy": `rng.choice(..., p=p)`,与旧版本输出一致.
+    #   但它每抽一轮都要重做 cumsum,在 2M 里抽 200k 时会成为热点.
+    # - "a-es": Efraimidis-Spirakis 指数 key 采样,见 `_a_es_choice`.
     # ---------------------------------------------------------------------
     size = int(min(size, n))
     if size <= 0:
@@ -470,9 +1236,102 @@ def _weighted_choice_no_replace(rng: np.random.Generator, n: int, size: int, wei
     if size <= 0:
         return np.empty((0,), dtype=np.int32)
 
+    if method == "a-es":
+        return _a_es_choice(rng, w, size)
     return rng.choice(n, size=size, replace=False, p=p)
 
 
+def _a_es_choice(rng: np.random.Generator, weights: np.ndarray, size: int) -> np.ndarray:
+    # A-ES(Efraimidis-Spirakis)的指数 key 形式:
+    # - key_i = E_i / w_i, E_i ~ Exp(1).
+    # - key 最小的 size 个,就是一次按权重、不放回的抽样.
+    # argpartition 是 O(n),只对选中的 size 个排序.返回顺序即“被抽中的先后”.
+    # 权重 <=0 的项 key=inf,不会被选中,因此 size 还要 clamp 到正权重数量.
+    w = np.asarray(weights, dtype=np.float64)
+    size = min(size, int(np.count_nonzero(w > 0.0)))
+    keys = rng.standard_exponential(w.shape[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = np.where(w > 0.0, keys / w, np.inf)
+    if size < keys.shape[0]:
+        idx = np.argpartition(keys, size - 1)[:size]
+    else:
+        idx = np.arange(keys.shape[0])
+    return idx[np.argsort(keys[idx], kind="stable")]
+
+
+class _WeightedReservoir:
+    """
+    跨帧的固定容量、按权重不放回的流式样本池(A-ES 指数 key).
+
+    - 每个候选的 key = Exp(1) / w,全序列里 key 最小的 capacity 个就是一次全局加权抽样.
+    - 每帧只需要生成 key,再把可能进入样本池的候选 gather 出来,内存只与 capacity 有关.
+    - 回退语义与 `_weighted_choice_no_replace` 一致:
+      - 权重 <=0 或非有限的项只在整个 stream 都没有正权重时才参与(此时退化为均匀采样).
+    """
+
+    def __init__(self, capacity: int, rng: np.random.Generator) -> None:
+        self.capacity = max(0, int(capacity))
+        self.rng = rng
+        self.keys = np.empty((0,), dtype=np.float64)
+        self.fallback = np.empty((0,), dtype=bool)
+        self.values = np.empty((0, 0), dtype=np.float32)
+        self.weights = np.empty((0,), dtype=np.float32)
+
+    def _smallest(self, keys: np.ndarray, fallback: np.ndarray, k: int) -> np.ndarray:
+        # 按 (fallback, key) 取最小的 k 个: 先取正权重项,不足时再用回退项补齐.
+        if keys.shape[0] <= k:
+            return np.arange(keys.shape[0])
+        primary = np.flatnonzero(~fallback)
+        if primary.shape[0] >= k:
+            return primary[np.argpartition(keys[primary], k - 1)[:k]]
+        rest = np.flatnonzero(fallback)
+        need = k - primary.shape[0]
+        return np.concatenate([primary, rest[np.argpartition(keys[rest], need - 1)[:need]]])
+
+    def offer(self, weights: np.ndarray, gather: Callable[[np.ndarray], np.ndarray]) -> None:
+        """
+        提交一帧的候选. `gather(idx)` 返回选中项的特征 [M,D],只会对可能入池的项调用.
+        """
+        if self.capacity <= 0:
+            return
+        w = np.asarray(weights, dtype=np.float64)
+        positive = np.isfinite(w) & (w > 0.0)
+        keys = self.rng.standard_exponential(w.shape[0])
+        keys[positive] /= w[positive]
+        fallback = ~positive
+
+        # 样本池已满且全是正权重项时,key 不小于当前最大 key 的候选不可能入池.
+        if self.keys.shape[0] >= self.capacity and not self.fallback.any():
+            cand = np.flatnonzero(positive & (keys < float(np.max(self.keys))))
+        else:
+            cand = np.arange(w.shape[0])
+        cand = cand[self._smallest(keys[cand], fallback[cand], self.capacity)]
+        if cand.shape[0] == 0:
+            return
+
+        feat = np.asarray(gather(cand), dtype=np.float32).reshape(cand.shape[0], -1)
+        if self.values.shape[0] == 0:
+            self.values = np.empty((0, feat.shape[1]), dtype=np.float32)
+
+        keys_all = np.concatenate([self.keys, keys[cand]])
+        fallback_all = np.concatenate([self.fallback, fallback[cand]])
+        keep = self._smallest(keys_all, fallback_all, self.capacity)
+        self.keys = keys_all[keep]
+        self.fallback = fallback_all[keep]
+        self.values = np.concatenate([self.values, feat], axis=0)[keep]
+        self.weights = np.concatenate([self.weights, w[cand].astype(np.float32)])[keep]
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        返回 (values[M,D], weights[M]),按被抽中的先后排序. 有正权重项时丢弃回退项.
+        """
+        sel = np.flatnonzero(~self.fallback)
+        if sel.shape[0] == 0:
+            sel = np.arange(self.keys.shape[0])
+        sel = sel[np.argsort(self.keys[sel], kind="stable")]
+        return self.values[sel], self.weights[sel]
+
+
 def _quantize_position_u16(positions: np.ndarray, range_min: np.ndarray, range_max: np.ndarray) -> np.ndarray:
     # position 量化规则(对齐 spec):
     # - per-frame rangeMin/rangeMax.
@@ -496,6 +1355,37 @@ def _quantize_position_u16(positions: np.ndarray, range_min: np.ndarray, range_m
     return q
 
 
+@dataclass(frozen=True)
+class _PreparedFrame:
+    # pass 2 真正需要的逐帧输入: decode/归一化/position 量化都已完成.
+    # 剩下的工作只有 codebook 最近邻 + labels + WebP 编码.
+    position_q: np.ndarray  # [N,3] u16
+    scale_log: np.ndarray  # [N,3] f32, log(max(scale_lin,1e-8))
+    rot_q8: np.ndarray  # [N,4] u8, 归一化后的 quat 再量化
+    f_dc: np.ndarray  # [N,3] f32
+    opacity_a8: np.ndarray  # [N] u8
+    rest: Optional[np.ndarray]  # [N,restCoeffCount,3] f32 or None
+
+
+def _prepare_frame(
+    frame: PlyFrame,
+    range_min: np.ndarray,
+    range_max: np.ndarray,
+    opacity_mode: str,
+    scale_mode: str,
+) -> _PreparedFrame:
+    opacity = _decode_opacity(frame.opacity_raw, opacity_mode)
+    scale_lin = _decode_scale(frame.scale_raw, scale_mode)
+    return _PreparedFrame(
+        position_q=_quantize_position_u16(frame.positions, range_min, range_max),
+        scale_log=np.log(np.maximum(scale_lin, 1e-8)).astype(np.float32, copy=False),
+        rot_q8=_quantize_quat_to_u8(_normalize_quat_wxyz(frame.rot_raw)),
+        f_dc=frame.f_dc,
+        opacity_a8=_quantize_0_1_to_u8(opacity),
+        rest=frame.rest,
+    )
+
+
 def _pack_u16_to_rgba(u16: np.ndarray, splat_count: int, width: int, height: int) -> np.ndarray:
     # 把 u16 label/index 写入 RG(小端),并输出 RGBA8 图.
     # - R = low8
@@ -510,15 +1400,39 @@ def _pack_u16_to_rgba(u16: np.ndarray, splat_count: int, width: int, height: int
     return flat.reshape(height, width, 4)
 
 
-def _save_webp_lossless_rgba(zf: zipfile.ZipFile, path: str, rgba: np.ndarray) -> None:
+# WebP lossless 的 effort 档位: (method, quality).
+# - lossless 下 quality 表示压缩力度,不影响像素值,三档解码结果完全一致.
+# - 取值对应 libwebp lossless preset(`cwebp -z 1/6/9`).
+# - max 最慢(大 layout 时 pass2 的主要耗时),fast 通常快一个数量级,体积略大.
+_WEBP_EFFORT_PROFILES: dict[str, tuple[int, int]] = {
+    "fast": (1, 20),
+    "balanced": (4, 75),
+    "max": (6, 100),
+}
+
+
+def _encode_webp_lossless_rgba(rgba: np.ndarray, effort: str = "max") -> bytes:
     # 关键: 这些是“数据图”,必须 lossless,否则 importer 读出来的 byte 会被破坏.
     # Pillow 未来会移除 `mode=` 参数,这里依赖数组形状(H,W,4)让它自动推导为 RGBA.
+    method, quality = _WEBP_EFFORT_PROFILES[effort]
     img = Image.fromarray(rgba)
     if img.mode != "RGBA":
         img = img.convert("RGBA")
     with io.BytesIO() as bio:
-        img.save(bio, format="WEBP", lossless=True, quality=100, method=6, exact=True)
-        zf.writestr(path, bio.getvalue())
+        img.save(bio, format="WEBP", lossless=True, quality=quality, method=method, exact=True)
+        return bio.getvalue()
+
+
+# ZIP entry 的时间戳固定为 DOS 纪元.
+# 这样同样的输入与参数总能得到字节级一致的 bundle(也是 `--jobs` 并行与串行可对比的前提).
+_ZIP_FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def _zip_writestr(zf: zipfile.ZipFile, name: str, data: bytes | str) -> None:
+    info = zipfile.ZipInfo(name, date_time=_ZIP_FIXED_DATE_TIME)
+    info.compress_type = zf.compression
+    info.external_attr = 0o600 << 16
+    zf.writestr(info, data)
 
 
 # -----------------------------------------------------------------------------
@@ -550,18 +1464,486 @@ def _weighted_quantile(values: np.ndarray, weights: np.ndarray, quantiles: np.nd
     return np.interp(quantiles, cw, v).astype(np.float32)
 
 
+# -----------------------------------------------------------------------------
+# 内置 k-means(float32, 真实 sample weight)
+# -----------------------------------------------------------------------------
+#
+# 替代 sklearn MiniBatchKMeans:
+# - 初始化: 加权 greedy k-means++(每个中心 `2 + log(k)` 个候选,逐个更新 D^2),候选距离走 GEMM.
+#   k >= 4096 时先粗分块,块内各自做 greedy k-means++,避免 O(k^2).
+# - 迭代: lloyd(全量 E/M 步) 或 minibatch(sklearn 同款按簇学习率的小批量更新,带低计数中心重分配).
+# - 距离: `_CentroidAssigner`(行块 x 中心块的分块 GEMM + running argmin,线程池并行).
+# - BLAS 固定 1 线程: 结果与线程数无关,可复现.
+
+_KMEANS_ALGORITHMS = ("lloyd", "minibatch")
+_KMEANS_REASSIGN_RATIO = 0.01  # minibatch: counts 低于最大值该比例的中心会被重分配
+_KMEANS_INIT_CELL_K = 1024  # k-means++: k >= 4 倍该值时先分块,每块约这么多个中心
+_ASSIGN_ROW_BLOCK = 2048  # 分配时每个行块的样本数
+_ASSIGN_CENTROID_BLOCK = 1024  # 分配时每个中心块的中心数
+_IVF_ROW_BLOCK = 16384  # IVF 查询时每个行块的样本数
+
+
+@dataclass(frozen=True)
+class _KMeansConfig:
+    algorithm: str = "minibatch"
+    max_iter: int = 100
+    tol: float = 1e-4
+    threads: int = 0
+    batch_size: int = 4096
+
+    @property
+    def thread_count(self) -> int:
+        return int(self.threads) if self.threads > 0 else max(1, os.cpu_count() or 1)
+
+
+@dataclass
+class _KMeansModel:
+    centroids: np.ndarray  # [K,D] float32
+    inertia: float
+    n_iter: int
+    _assigner: Optional[_CentroidAssigner] = field(default=None, init=False, repr=False, compare=False)
+
+    def predict(self, x: np.ndarray, threads: int = 1) -> np.ndarray:
+        # assigner 延迟构建并缓存: 逐帧 predict 复用同一份中心范数与分块.
+        if self._assigner is None:
+            self._assigner = _CentroidAssigner(self.centroids)
+        with _blas_single_thread():
+            labels, _ = self._assigner.assign(x, threads)
+        return labels
+
+
+@contextmanager
+def _blas_single_thread() -> Iterator[None]:
+    # 线程池按行块并行时 BLAS 只用 1 线程: 既避免超订,也让结果不随线程数变化.
+    try:
+        from threadpoolctl import threadpool_limits
+    except Exception:  # pragma: no cover - 缺失时沿用 BLAS 默认线程数
+        yield
+        return
+    with threadpool_limits(1):
+        yield
+
+
+class _CentroidAssigner:
+    """
+    最近中心分配引擎(k-means 迭代与逐帧 labels 共用).
+
+    - 中心按 `_ASSIGN_CENTROID_BLOCK` 分块,预先存成 [-2c | ||c||^2] 的转置.
+      中心范数只算一次,同一个 codebook 跨帧复用.
+    - 行块补一列 1 后与各中心块做 GEMM,直接得到 ||c||^2 - 2x·c;逐块做 running argmin,
+      不会生成完整的 [B,K] 距离矩阵,单块内存约 `_ASSIGN_ROW_BLOCK * _ASSIGN_CENTROID_BLOCK * 4` 字节.
+    - 行块在线程池里并行. 调用方应在 `_blas_single_thread()` 内调用,结果与线程数无关.
+    """
+
+    def __init__(self, centroids: np.ndarray) -> None:
+        c = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_count = int(c.shape[0])
+        self.dim = int(c.shape[1])
+        c_norm2 = np.einsum("ij,ij->i", c, c)
+        aug = np.concatenate([-2.0 * c, c_norm2[:, None]], axis=1).astype(np.float32, copy=False)
+        self.blocks: list[tuple[int, np.ndarray]] = [
+            (start, np.ascontiguousarray(aug[start : start + _ASSIGN_CENTROID_BLOCK].T))
+            for start in range(0, self.centroid_count, _ASSIGN_CENTROID_BLOCK)
+        ]
+
+    def assign(self, x: np.ndarray, threads: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        返回 (labels[N] int64, dist2[N] float32).
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n = x.shape[0]
+        labels = np.empty((n,), dtype=np.int64)
+        dist2 = np.empty((n,), dtype=np.float32)
+
+        def run(start: int) -> None:
+            end = min(start + _ASSIGN_ROW_BLOCK, n)
+            rows = end - start
+            xa = np.empty((rows, self.dim + 1), dtype=np.float32)
+            xa[:, : self.dim] = x[start:end]
+            xa[:, self.dim] = 1.0
+            best = np.full((rows,), np.inf, dtype=np.float32)
+            best_label = np.zeros((rows,), dtype=np.int64)
+            row_ids = np.arange(rows)
+            for c_start, block_t in self.blocks:
+                d = xa @ block_t  # [rows,Kb]
+                arg = np.argmin(d, axis=1)
+                val = d[row_ids, arg]
+                # 严格小于: 并列时保留更早的中心,与一次性 argmin 的结果一致.
+                better = val < best
+                best[better] = val[better]
+                best_label[better] = arg[better] + c_start
+            labels[start:end] = best_label
+            xb = x[start:end]
+            dist2[start:end] = np.maximum(best + np.einsum("ij,ij->i", xb, xb), 0.0)
+
+        starts = range(0, n, _ASSIGN_ROW_BLOCK)
+        if threads <= 1 or n <= _ASSIGN_ROW_BLOCK:
+            for start in starts:
+                run(start)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(run, starts))
+        return labels, dist2
+
+
+class _IvfCentroidIndex:
+    """
+    SH centroids 上的 IVF(倒排表)近似最近邻索引,`--sh-label-search ivf` 时使用.
+
+    - 构建(每个 codebook 一次): 对 centroids 自身再做 k-means 得到 `lists` 个粗中心,
+      每个 centroid 挂到最近的粗中心下.
+    - 查询: 每行先找最近的 `nprobe` 个粗中心,只在这些倒排表里做精确距离比较.
+      (row, cell) 对按 cell 分组,每个 cell 一次 GEMM.
+    - `nprobe` 是精度旋钮: 越大越接近精确搜索,`nprobe == lists` 时就是全量比较.
+    - 与 `_CentroidAssigner` 一样按行块并行、BLAS 单线程,结果与线程数无关.
+    """
+
+    def __init__(self, centroids: np.ndarray, lists: int, nprobe: int, seed: int, cfg: _KMeansConfig) -> None:
+        c = np.ascontiguousarray(centroids, dtype=np.float32)
+        k = int(c.shape[0])
+        if lists <= 0:
+            lists = int(round(math.sqrt(k)))
+        self.lists = int(min(max(1, lists), k))
+        self.nprobe = int(min(max(1, nprobe), self.lists))
+        self.dim = int(c.shape[1])
+
+        coarse = _kmeans_fit(c, None, self.lists, seed, cfg)
+        self.coarse = _CentroidAssigner(coarse.centroids)
+        with _blas_single_thread():
+            owner, _ = self.coarse.assign(c)
+        used = np.unique(owner)
+        if used.shape[0] < self.lists:
+            # 粗 k-means 可能留下空 cell(例如 centroids 有大量重复). 查询时只探测到空 cell 的行会找不到任何候选,
+            # 所以这里去掉空 cell,在非空的粗中心上重建粗量化. 被去掉的粗中心不是任何 centroid 的最近中心,owner 不变.
+            self.lists = int(used.shape[0])
+            self.nprobe = int(min(self.nprobe, self.lists))
+            self.coarse = _CentroidAssigner(coarse.centroids[used])
+            owner = np.searchsorted(used, owner)
+        order = np.argsort(owner, kind="stable")
+        bounds = np.searchsorted(owner[order], np.arange(self.lists + 1))
+        # 每个倒排表: (全局 centroid id, 转置后的 [-2c | ||c||^2]).
+        self.cells: list[tuple[np.ndarray, np.ndarray]] = []
+        for j in range(self.lists):
+            ids = order[bounds[j] : bounds[j + 1]]
+            cj = c[ids]
+            aug = np.concatenate([-2.0 * cj, np.einsum("ij,ij->i", cj, cj)[:, None]], axis=1)
+            self.cells.append((ids, np.ascontiguousarray(aug.T, dtype=np.float32)))
+
+    @property
+    def largest_list(self) -> int:
+        return max(int(ids.shape[0]) for ids, _ in self.cells)
+
+    def _search(self, x: np.ndarray) -> np.ndarray:
+        rows = x.shape[0]
+        xa = np.empty((rows, self.dim + 1), dtype=np.float32)
+        xa[:, : self.dim] = x
+        xa[:, self.dim] = 1.0
+
+        # 1) 粗量化: 每行取最近的 nprobe 个倒排表.
+        dc = np.empty((rows, self.lists), dtype=np.float32)
+        for c_start, block_t in self.coarse.blocks:
+            np.matmul(xa, block_t, out=dc[:, c_start : c_start + block_t.shape[1]])
+        if self.nprobe < self.lists:
+            probe = np.argpartition(dc, self.nprobe - 1, axis=1)[:, : self.nprobe]
+        else:
+            probe = np.broadcast_to(np.arange(self.lists), (rows, self.lists))
+
+        # 2) (row, cell) 对按 cell 排序,逐个倒排表做 GEMM + running argmin.
+        flat_cell = probe.reshape(-1)
+        order = np.argsort(flat_cell, kind="stable")
+        flat_row = np.repeat(np.arange(rows), self.nprobe)[order]
+        bounds = np.searchsorted(flat_cell[order], np.arange(self.lists + 1))
+
+        best = np.full((rows,), np.inf, dtype=np.float32)
+        labels = np.zeros((rows,), dtype=np.int64)
+        for j, (ids, cell_t) in enumerate(self.cells):
+            lo, hi = int(bounds[j]), int(bounds[j + 1])
+            if lo == hi or ids.shape[0] == 0:
+                continue
+            r = flat_row[lo:hi]  # 同一个 cell 内 row 不重复
+            d = xa[r] @ cell_t
+            arg = np.argmin(d, axis=1)
+            val = d[np.arange(r.shape[0]), arg]
+            better = val < best[r]
+            rb = r[better]
+            best[rb] = val[better]
+            labels[rb] = ids[arg[better]]
+        return labels
+
+    def predict(self, x: np.ndarray, threads: int = 1) -> np.ndarray:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n = x.shape[0]
+        labels = np.empty((n,), dtype=np.int64)
+
+        def run(start: int) -> None:
+            end = min(start + _IVF_ROW_BLOCK, n)
+            labels[start:end] = self._search(x[start:end])
+
+        starts = range(0, n, _IVF_ROW_BLOCK)
+        with _blas_single_thread():
+            if threads <= 1 or n <= _IVF_ROW_BLOCK:
+                for start in starts:
+                    run(start)
+            else:
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    list(pool.map(run, starts))
+        return labels
+
+
+def _kmeans_plusplus(x: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    # 加权 greedy k-means++(与 sklearn `kmeans_plusplus` 同一算法):
+    # - 每选一个中心前按 w*D^2 抽 `2 + log(k)` 个候选,取能让总势能 sum(w*D^2) 最小的那个.
+    # - 每选一个中心就更新一次 D^2. 一批中心共用同一份旧 D^2 时会扎堆落进同一个密集簇,后续迭代也救不回来.
+    # - 候选到全部点的距离是一次 [trials,D]x[D,N] 的 GEMM,x 预先转置成行连续.
+    n = x.shape[0]
+    if not float(w.sum()) > 0.0:
+        # 子集里没有正权重的点(权重大多为 0 时可能抽到): 退化为等权.
+        w = np.ones_like(w)
+    trials = 2 + int(math.log(k))
+    xt = np.ascontiguousarray(x.T)
+    x_norm2 = np.einsum("ij,ij->i", x, x)
+    w32 = w.astype(np.float32)
+    chosen = np.empty((k,), dtype=np.int64)
+    chosen[0] = int(rng.choice(n, p=w / w.sum()))
+    c0 = x[chosen[0]]
+    d2 = np.maximum(x_norm2 + np.float32(c0 @ c0) - 2.0 * (c0 @ xt), 0.0).astype(np.float32)
+    for i in range(1, k):
+        cum = np.cumsum(w * d2, dtype=np.float64)
+        # 势能为 0: 不同的点已经不足 k 个,剩下的中心随便取(之后按空簇处理).
+        cand = np.searchsorted(cum, rng.random(trials) * cum[-1])
+        np.clip(cand, 0, n - 1, out=cand)
+        c = x[cand]  # [T,D]
+        dc = c @ xt  # [T,N]
+        dc *= -2.0
+        dc += x_norm2[None, :]
+        dc += np.einsum("ij,ij->i", c, c)[:, None]
+        np.maximum(dc, 0.0, out=dc)
+        np.minimum(dc, d2[None, :], out=dc)
+        best = int(np.argmin(dc @ w32))
+        chosen[i] = cand[best]
+        d2 = dc[best].copy()
+    return x[chosen].astype(np.float32, copy=True)
+
+
+def _kmeans_init(x: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    # greedy k-means++ 是 O(k * N * trials),子集又随 k 增长(N >= 3k),整体 O(k^2): k=8192 要十几秒,65535 要十几分钟.
+    # k 大时先用 k-means++ 把子集粗分成 k/_KMEANS_INIT_CELL_K 块,按块内权重分配中心数,再在每块里做 greedy k-means++.
+    # 代价降到 O(k * cell_k),之后 Lloyd/mini-batch 会修正块边界附近的中心.
+    cells = k // _KMEANS_INIT_CELL_K
+    if cells < 4:
+        return _kmeans_plusplus(x, w, k, rng)
+    coarse = _kmeans_plusplus(x, w, cells, rng)
+    owner, _ = _CentroidAssigner(coarse).assign(x)
+    rows = np.bincount(owner, minlength=cells)
+    mass = np.bincount(owner, weights=w, minlength=cells)
+    share = k * mass / mass.sum() if float(mass.sum()) > 0.0 else k * rows / rows.sum()
+    # 按份额取整,每块不超过块内点数; 余下的中心按小数部分从大到小补齐.
+    alloc = np.minimum(np.floor(share).astype(np.int64), rows)
+    while int(alloc.sum()) < k:
+        priority = np.where(alloc < rows, share - alloc, -np.inf)
+        top = np.argsort(-priority, kind="stable")[: k - int(alloc.sum())]
+        alloc[top[np.isfinite(priority[top])]] += 1
+    centers = []
+    for j in np.flatnonzero(alloc):
+        ids = np.flatnonzero(owner == j)
+        centers.append(_kmeans_plusplus(x[ids], w[ids], int(alloc[j]), rng))
+    return np.concatenate(centers, axis=0)
+
+
+def _kmeans_weighted_sums(
+    x: np.ndarray, w: np.ndarray, labels: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    wsum = np.bincount(labels, weights=w, minlength=k)
+    sums = np.empty((k, x.shape[1]), dtype=np.float64)
+    for j in range(x.shape[1]):
+        sums[:, j] = np.bincount(labels, weights=w * x[:, j], minlength=k)
+    return wsum, sums
+
+
+def _kmeans_lloyd(
+    x: np.ndarray, w: np.ndarray, centers: np.ndarray, cfg: _KMeansConfig, tol_abs: float, threads: int
+) -> tuple[np.ndarray, float, int]:
+    k = centers.shape[0]
+    prev_labels: Optional[np.ndarray] = None
+    inertia = float("inf")
+    it = 0
+    for it in range(1, int(cfg.max_iter) + 1):
+        labels, d2 = _CentroidAssigner(centers).assign(x, threads)
+        inertia = float(np.dot(w, d2))
+        wsum, sums = _kmeans_weighted_sums(x, w, labels, k)
+
+        new = centers.astype(np.float64, copy=True)
+        filled = wsum > 0.0
+        new[filled] = sums[filled] / wsum[filled, None]
+        empty = np.flatnonzero(~filled)
+        if empty.shape[0] > 0:
+            # 空簇: 搬到当前加权误差最大的点上.
+            far = np.argpartition(-(w * d2), empty.shape[0] - 1)[: empty.shape[0]]
+            new[empty] = x[far]
+        new32 = new.astype(np.float32)
+
+        shift = float(np.sum((new32 - centers) ** 2, dtype=np.float64))
+        centers = new32
+        if prev_labels is not None and np.array_equal(labels, prev_labels):
+            break
+        if shift <= tol_abs:
+            break
+        prev_labels = labels
+    return centers, inertia, it
+
+
+def _kmeans_minibatch(
+    x: np.ndarray,
+    w: np.ndarray,
+    centers: np.ndarray,
+    cfg: _KMeansConfig,
+    tol_abs: float,
+    rng: np.random.Generator,
+    threads: int,
+) -> tuple[np.ndarray, float, int]:
+    # sklearn 同款: 每个中心有累计权重 counts,步长 = 本批权重 / counts.
+    # 停止条件: 一个 epoch 内中心平方位移 <= tol,或批 inertia 的 EWA 连续 10 步没有改善.
+    # 低计数中心重分配(同 sklearn `reassignment_ratio=0.01`): 每看过约 10*k 个样本(或有中心从未命中)时,
+    # counts 低于最大值 1% 的中心搬到本批随机抽的样本上,避免中心永久困在稀疏区域.
+    n, _ = x.shape
+    k = centers.shape[0]
+    batch = int(min(max(1, cfg.batch_size), n))
+    steps_per_epoch = max(1, -(-n // batch))
+    centers = centers.astype(np.float64, copy=True)
+    counts = np.zeros((k,), dtype=np.float64)
+    alpha = min(1.0, 2.0 * batch / (n + 1))
+    ewa: Optional[float] = None
+    best = float("inf")
+    no_improve = 0
+    epoch_shift = 0.0
+    epoch = 0
+    since_reassign = 0
+    for step in range(int(cfg.max_iter) * steps_per_epoch):
+        idx = rng.integers(0, n, batch)
+        xb = x[idx]
+        wb = w[idx]
+        labels, d2 = _CentroidAssigner(centers).assign(xb, threads)
+        batch_inertia = float(np.dot(wb, d2)) / batch
+
+        wsum, sums = _kmeans_weighted_sums(xb, wb, labels, k)
+        hit = wsum > 0.0
+        counts[hit] += wsum[hit]
+        delta = (sums[hit] - wsum[hit, None] * centers[hit]) / counts[hit, None]
+        centers[hit] += delta
+        epoch_shift += float(np.sum(delta * delta))
+
+        since_reassign += batch
+        if (counts == 0.0).any() or since_reassign >= 10 * k:
+            since_reassign = 0
+            low = np.flatnonzero(counts < _KMEANS_REASSIGN_RATIO * counts.max())
+            # 新位置只从本批正权重的行里抽; 一个都没有时这次跳过.
+            pos = np.flatnonzero(wb > 0.0)
+            cap = min(batch // 2, pos.shape[0])
+            if low.shape[0] > cap:
+                low = low[np.argsort(counts[low], kind="stable")[:cap]]
+            if low.shape[0] > 0:
+                pick = rng.choice(pos, size=low.shape[0], replace=False, p=wb[pos] / wb[pos].sum())
+                centers[low] = xb[pick]
+                kept = np.ones((k,), dtype=bool)
+                kept[low] = False
+                counts[low] = counts[kept].min() if kept.any() else 0.0
+
+        ewa = batch_inertia if ewa is None else ewa * (1.0 - alpha) + batch_inertia * alpha
+        if ewa < best:
+            best = ewa
+            no_improve = 0
+        else:
+            no_improve += 1
+        if no_improve >= 10:
+            break
+        if (step + 1) % steps_per_epoch == 0:
+            epoch += 1
+            if epoch_shift <= tol_abs:
+                break
+            epoch_shift = 0.0
+
+    c32 = centers.astype(np.float32)
+    _, d2 = _CentroidAssigner(c32).assign(x, threads)
+    return c32, float(np.dot(w, d2)), epoch + 1
+
+
+def _kmeans_fit(
+    x: np.ndarray,
+    weights: Optional[np.ndarray],
+    k: int,
+    seed: int,
+    cfg: _KMeansConfig,
+    init: Optional[np.ndarray] = None,
+) -> _KMeansModel:
+    """
+    加权 k-means. x: [N,D], weights: [N] 或 None(等权). 要求 1 <= k <= N.
+    init: 可选的初始中心 [k,D](例如复用已有 bundle 的 codebook),给出时跳过 k-means++.
+    """
+    if cfg.algorithm not in _KMEANS_ALGORITHMS:
+        raise ValueError(f"未知 k-means 算法: {cfg.algorithm}")
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    n = x.shape[0]
+    w = np.ones((n,), dtype=np.float64) if weights is None else np.asarray(weights, dtype=np.float64)
+    w = np.where(np.isfinite(w) & (w > 0.0), w, 0.0)
+    s = float(w.sum())
+    if not (math.isfinite(s) and s > 0.0):
+        w = np.ones((n,), dtype=np.float64)
+    else:
+        # 归一到均值 1,避免 importance 很小时 float 累加失真.
+        w = w * (n / s)
+
+    rng = np.random.default_rng(seed)
+    threads = cfg.thread_count
+    # 与 sklearn 的 tol 语义一致: 相对于数据各维方差的均值.
+    tol_abs = float(cfg.tol) * float(np.mean(np.var(x, axis=0, dtype=np.float64)))
+    with _blas_single_thread():
+        # 与 sklearn 一样只在子集上做 k-means++,子集大小 max(3*batch, 3*k).
+        init_n = min(n, max(3 * int(cfg.batch_size), 3 * k))
+        if init is not None:
+            centers = np.array(init, dtype=np.float32, copy=True)
+            if centers.shape != (k, x.shape[1]):
+                raise ValueError(f"k-means init 形状不匹配: got {centers.shape}, expected {(k, x.shape[1])}")
+        elif init_n < n:
+            init_idx = np.sort(rng.choice(n, size=init_n, replace=False))
+            centers = _kmeans_init(x[init_idx], w[init_idx], k, rng)
+        else:
+            centers = _kmeans_init(x, w, k, rng)
+        if cfg.algorithm == "lloyd":
+            centers, inertia, n_iter = _kmeans_lloyd(x, w, centers, cfg, tol_abs, threads)
+        else:
+            centers, inertia, n_iter = _kmeans_minibatch(x, w, centers, cfg, tol_abs, rng, threads)
+    return _KMeansModel(centroids=centers, inertia=inertia, n_iter=n_iter)
+
+
+def _sampling_weights(
+    frame: PlyFrame | _ProjectedPlyFrame, opacity_mode: str, scale_mode: str
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # 返回 (opacity, 线性 scale, importance). pack 的 pass 1 与 train-codebooks 共用.
+    # importance 权重用于采样(拟合 codebook/palette).
+    # - volume = scale.x * scale.y * scale.z.
+    # - 这个乘积对小尺度非常敏感,在 float32 下容易下溢为 0,进而导致“权重全 0”的采样失败.
+    # - 因此这里用 float64 计算,再在写入权重缓存时转回 float32.
+    opacity = _decode_opacity(frame.opacity_raw, opacity_mode)
+    scale_lin = _decode_scale(frame.scale_raw, scale_mode)
+    volume_f64 = np.prod(scale_lin.astype(np.float64, copy=False), axis=1)
+    importance = np.maximum(opacity.astype(np.float64, copy=False) * volume_f64, 0.0)
+    return opacity, scale_lin, importance
+
+
 def _build_sh0_codebook(
     samples: np.ndarray,
     weights: np.ndarray,
     method: str,
     seed: int,
+    kmeans_cfg: _KMeansConfig,
+    init: Optional[np.ndarray] = None,
 ) -> np.ndarray:
     # sh0Codebook 固定 256 项(按 spec).
     # - method=base-rgb: 直接对齐 `.splat4d` 的 baseRgb(0..255) 量化语义.
     #   这样 `sh0.webp` 的 RGB byte 可以和 `.splat4d` 的 baseRgb 完全同构,
     #   避免 learned codebook 在真实单帧 PLY 上把大量暗色/负值 f_dc 挤没.
     # - method=quantile: 快速且对长尾更稳.
-    # - method=kmeans: 误差更小,但需要 sklearn.
+    # - method=kmeans: 误差更小,1D 加权 k-means(内置引擎).
     if method == "base-rgb":
         codes = np.arange(256, dtype=np.float32)
         return (((codes / 255.0) - 0.5) / SH_C0).astype(np.float32, copy=False)
@@ -578,27 +1960,17 @@ def _build_sh0_codebook(
     if method != "kmeans":
         _die(f"未知 sh0Codebook 生成方法: {method}")
 
-    if MiniBatchKMeans is None:
-        _die("选择了 sh0Codebook=kmeans,但当前环境缺少 scikit-learn. 请改用 --sh0-codebook-method quantile.")
-
-    # 1D k-means 的 sample_weight 在不同 sklearn 版本里行为可能变化.
-    # 这里用“按权重采样”的方式近似,稳定且可复现.
-    rng = np.random.default_rng(seed)
-    probs = weights.astype(np.float64, copy=False)
-    probs = np.maximum(probs, 0.0)
-    s = float(probs.sum())
-    if s <= 0:
-        probs = None
-    else:
-        probs /= s
-
-    n = int(min(samples.shape[0], 500_000))
-    idx = rng.choice(samples.shape[0], size=n, replace=False if probs is None else True, p=probs)
-    x = samples[idx].astype(np.float32).reshape(-1, 1)
-
-    km = MiniBatchKMeans(n_clusters=256, random_state=seed, batch_size=4096, n_init=3)
-    km.fit(x)
-    codebook = km.cluster_centers_.reshape(-1).astype(np.float32, copy=False)
+    km = _fit_kmeans(
+        "sh0Codebook",
+        samples.reshape(-1, 1),
+        weights,
+        256,
+        seed,
+        500_000,
+        kmeans_cfg,
+        init=init.reshape(-1, 1) if init is not None else None,
+    )
+    codebook = km.centroids.reshape(-1).astype(np.float32, copy=True)
     codebook.sort()
     return codebook
 
@@ -610,59 +1982,182 @@ def _fit_kmeans(
     k: int,
     seed: int,
     max_samples: int,
-) -> Any:
-    # 通用 k-means 拟合:
-    # - 用权重采样近似 sample_weight,避免版本差异.
-    if MiniBatchKMeans is None:
-        _die(f"{name}: 当前环境缺少 scikit-learn,无法执行 k-means. 请安装 sklearn.")
-
+    cfg: _KMeansConfig,
+    init: Optional[np.ndarray] = None,
+) -> _KMeansModel:
+    # 通用加权 k-means 拟合(内置引擎,真实 sample weight):
+    # - 样本数 <= max_samples: 全量样本 + 原始权重.
+    # - 超过时: 按权重有放回采样 max_samples 次,重复项合并成计数权重(无偏,且控制拟合规模).
+    # - init: 复用已有 codebook 作为初始中心(`--reuse-codebooks-mode init`),k 以 init 为准.
     if x.ndim != 2:
         _die(f"{name}: x 必须是 2D, got {x.shape}")
 
     if x.shape[0] == 0:
         _die(f"{name}: x 为空,无法拟合")
 
-    eff_k = int(min(k, x.shape[0]))
+    w = np.maximum(weights.astype(np.float64, copy=False), 0.0)
+    s = float(w.sum())
+    if not math.isfinite(s) or s <= 0.0:
+        w = np.ones((x.shape[0],), dtype=np.float64)
+
+    xs = x
+    if x.shape[0] > max_samples:
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(x.shape[0], size=int(max_samples), replace=True, p=w / w.sum())
+        idx, counts = np.unique(idx, return_counts=True)
+        xs = x[idx]
+        w = counts.astype(np.float64)
+    xs = xs.astype(np.float32, copy=False)
+
+    if init is not None:
+        init = np.ascontiguousarray(init, dtype=np.float32)
+        if init.shape[0] != k:
+            _warn(f"{name}: 复用的 codebook 有 {init.shape[0]} 项,忽略请求的 k={k}")
+        k = int(init.shape[0])
+        if xs.shape[0] < k:
+            _warn(f"{name}: 样本数 {xs.shape[0]} < k={k},直接使用复用的 codebook")
+            return _KMeansModel(centroids=init, inertia=float("nan"), n_iter=0)
+
+    eff_k = int(min(k, xs.shape[0]))
     if eff_k < k:
-        _warn(f"{name}: 样本数 {x.shape[0]} < k={k},自动降级为 k={eff_k}")
+        _warn(f"{name}: 样本数 {xs.shape[0]} < k={k},自动降级为 k={eff_k}")
     k = eff_k
 
-    rng = np.random.default_rng(seed)
-    probs = weights.astype(np.float64, copy=False)
-    probs = np.maximum(probs, 0.0)
-    s = float(probs.sum())
-    if not math.isfinite(s) or s <= 0.0:
-        probs = None
-    else:
-        probs /= s
+    _info(
+        f"{name}: fitting k-means(k={k}, sample={xs.shape[0]}, dim={xs.shape[1]}, "
+        f"algorithm={cfg.algorithm}, threads={cfg.thread_count}"
+        + (", init=reused) ..." if init is not None else ") ...")
+    )
+    km = _kmeans_fit(xs, w, k, seed, cfg, init=init)
+    _info(f"{name}: k-means done (iter={km.n_iter}, inertia={km.inertia:.6g})")
+    return km
 
-    n = int(min(x.shape[0], max_samples))
-    idx = rng.choice(x.shape[0], size=n, replace=False if probs is None else True, p=probs)
-    xs = x[idx].astype(np.float32, copy=False)
 
-    _info(f"{name}: fitting MiniBatchKMeans(k={k}, sample={xs.shape[0]}, dim={xs.shape[1]}) ...")
-    km = MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=4096, n_init=3)
-    km.fit(xs)
-    return km
+@dataclass(frozen=True)
+class _CodebookFitJob:
+    # 一个独立的 codebook 拟合任务(scale / shN / sh1..sh3),可以整体 pickle 给 worker 进程.
+    name: str
+    samples: np.ndarray
+    weights: np.ndarray
+    k: int
+    max_samples: int
+    init: Optional[np.ndarray] = None
+
+
+def _fit_codebook_job(job: _CodebookFitJob, seed: int, cfg: _KMeansConfig) -> tuple[_KMeansModel, float, float]:
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    model = _fit_kmeans(job.name, job.samples, job.weights, job.k, seed, job.max_samples, cfg, job.init)
+    return model, time.perf_counter() - t0, time.process_time() - c0
+
+
+def _fit_codebooks(
+    jobs: list[_CodebookFitJob], seed: int, cfg: _KMeansConfig, workers: int, profiler: _StageProfiler
+) -> dict[str, _KMeansModel]:
+    """
+    拟合一组互相独立的 codebook,返回 name -> model.
 
+    - 每个任务都用同一个 `seed` 初始化自己的 rng,不共享随机状态: 串行/并行、完成顺序都不影响结果.
+    - workers>1 时用进程池并行,每个 worker 分到 `thread_count // workers` 个分配线程
+      (k-means 结果与线程数无关).
+    """
+    models: dict[str, _KMeansModel] = {}
+    workers = min(max(1, workers), len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            with profiler.stage(f"kmeans_fit:{job.name}"):
+                models[job.name] = _fit_kmeans(
+                    job.name, job.samples, job.weights, job.k, seed, job.max_samples, cfg, job.init
+                )
+        return models
 
-def _nearest_u16_labels_bruteforce(x: np.ndarray, centroids: np.ndarray, batch: int) -> np.ndarray:
-    # 说明: 这是兜底的最近邻实现.
-    # - 对 scale(3D)我们优先用 KDTree,这个主要用于高维 SH rest.
-    # - x: [N,D], centroids: [K,D]
-    x = x.astype(np.float32, copy=False)
-    c = centroids.astype(np.float32, copy=False)
-    c_norm2 = np.sum(c * c, axis=1, keepdims=False)  # [K]
-
-    out = np.empty((x.shape[0],), dtype=np.uint16)
-    for start in range(0, x.shape[0], batch):
-        end = min(start + batch, x.shape[0])
-        xb = x[start:end]
-        x_norm2 = np.sum(xb * xb, axis=1, keepdims=True)  # [B,1]
-        # dist2 = ||x||^2 + ||c||^2 - 2 x·c
-        dist2 = x_norm2 + c_norm2.reshape(1, -1) - 2.0 * (xb @ c.T)
-        out[start:end] = np.argmin(dist2, axis=1).astype(np.uint16)
-    return out
+    worker_cfg = replace(cfg, threads=max(1, cfg.thread_count // workers))
+    _info(f"codebooks: fitting {len(jobs)} codebooks with {workers} worker processes")
+
+    def cost(job: _CodebookFitJob) -> int:
+        n = min(job.max_samples, job.samples.shape[0])
+        return min(job.k, n) * n * job.samples.shape[1]
+
+    # 大任务先提交,避免最后只剩一个长任务在跑.
+    with profiler.stage("kmeans_fit:parallel"):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (job.name, executor.submit(_fit_codebook_job, job, seed, worker_cfg))
+                for job in sorted(jobs, key=cost, reverse=True)
+            ]
+            for name, fut in futures:
+                model, wall, cpu = fut.result()
+                profiler.add(f"kmeans_fit:{name}", wall, cpu)
+                models[name] = model
+    return models
+
+
+@dataclass(frozen=True)
+class _ReusedCodebooks:
+    # `--reuse-codebooks` 从已有 `.sog4d` 读回的 codebook.
+    # - centroids 的 key 与 `_CodebookFitJob.name` 一致: scaleCodebook(log) / shN_centroids / sh1..sh3_centroids.
+    # - scale_codebook 保留 meta.json 里的原值,direct 模式下原样写回,避免 exp(log(x)) 的舍入误差.
+    source: Path
+    scale_codebook: np.ndarray  # [K,3] float32, 线性 scale
+    sh0_codebook: np.ndarray  # [256] float32
+    centroids: dict[str, np.ndarray]
+
+
+def _load_reused_codebooks(path: Path) -> _ReusedCodebooks:
+    if not path.exists():
+        _die(f"--reuse-codebooks 文件不存在: {path}")
+    try:
+        zf = zipfile.ZipFile(path, "r")
+    except zipfile.BadZipFile:
+        _die(f"--reuse-codebooks 不是合法的 .sog4d(ZIP): {path}")
+    with zf:
+        meta = _read_zip_json(zf, "meta.json")
+        if meta.get("format") not in ("sog4d", _CODEBOOK_LIBRARY_FORMAT):
+            _die(f"--reuse-codebooks: meta.format 不是 sog4d 或 {_CODEBOOK_LIBRARY_FORMAT}: {meta.get('format')}")
+        streams = meta.get("streams") or {}
+        scale = np.array(
+            [[v["x"], v["y"], v["z"]] for v in (streams.get("scale") or {}).get("codebook") or []], dtype=np.float32
+        ).reshape(-1, 3)
+        if scale.shape[0] == 0 or not np.all(np.isfinite(scale) & (scale > 0.0)):
+            _die(f"--reuse-codebooks: scale.codebook 为空或含非正数: {path}")
+        sh = streams.get("sh") or {}
+        sh0 = np.array(sh.get("sh0Codebook") or [], dtype=np.float32)
+        if sh0.shape[0] != 256:
+            _die(f"--reuse-codebooks: sh0Codebook 长度必须为 256, got {sh0.shape[0]}")
+
+        def read_centroids(count: int, ctype: str, entry: Optional[str], key: str) -> np.ndarray:
+            if not entry:
+                _die(f"--reuse-codebooks: meta.json 缺少 {key}: {path}")
+            dtype = "<f2" if ctype == "f16" else "<f4"
+            try:
+                arr = np.frombuffer(zf.read(entry), dtype=dtype).astype(np.float32)
+            except KeyError:
+                _die(f"--reuse-codebooks: bundle 里缺少 {entry}: {path}")
+            except ValueError:
+                _die(f"--reuse-codebooks: {entry} 字节数不是 {ctype} 的整数倍")
+            if count <= 0 or arr.shape[0] % count != 0:
+                _die(f"--reuse-codebooks: {entry} 大小与 count={count} 不匹配")
+            return arr.reshape(count, -1)
+
+        centroids: dict[str, np.ndarray] = {"scaleCodebook(log)": np.log(scale).astype(np.float32)}
+        bands = int(sh.get("bands", 0))
+        if bands > 0 and int(meta.get("version", 1)) == 1:
+            centroids["shN_centroids"] = read_centroids(
+                int(sh.get("shNCount", 0)),
+                sh.get("shNCentroidsType", "f16"),
+                sh.get("shNCentroidsPath"),
+                "sh.shNCentroidsPath",
+            )
+        elif bands > 0:
+            for band_key in ("sh1", "sh2", "sh3")[:bands]:
+                band = sh.get(band_key) or {}
+                centroids[f"{band_key}_centroids"] = read_centroids(
+                    int(band.get("count", 0)),
+                    band.get("centroidsType", "f16"),
+                    band.get("centroidsPath"),
+                    f"sh.{band_key}.centroidsPath",
+                )
+    return _ReusedCodebooks(source=path, scale_codebook=scale, sh0_codebook=sh0, centroids=centroids)
 
 
 def _quantize_scalar_to_codebook_u8(values: np.ndarray, codebook_sorted: np.ndarray) -> np.ndarray:
@@ -691,7 +2186,504 @@ def _quantize_sh0_to_u8(values: np.ndarray, codebook_sorted: np.ndarray, method:
         base_rgb = 0.5 + SH_C0 * values.astype(np.float32, copy=False)
         return _quantize_0_1_to_u8(base_rgb)
 
-    return _quantize_scalar_to_codebook_u8(values, codebook_sorted)
+    return _quantize_scalar_to_codebook_u8(values, codebook_sorted)
+
+
+# -----------------------------------------------------------------------------
+# single-read 模式的逐帧 scratch store
+# -----------------------------------------------------------------------------
+
+_SCRATCH_FIELDS: tuple[str, ...] = ("position_q", "scale_log", "rot_q8", "f_dc", "opacity_a8", "rest")
+
+
+class _ScratchFrameStore:
+    """
+    把 `_PreparedFrame` 按帧落盘为一组 `.npy`,供 pass 2 直接 memmap 读回.
+
+    说明:
+    - 这样每个 PLY 只在 pass 1 解析一次,pass 2 不再碰原始输入.
+    - 存的是已经量化/归一化后的数组,pass 2 的编码结果与“重新读 PLY”完全一致.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _path(self, fi: int, field: str) -> Path:
+        return self.root / f"{fi:05d}_{field}.npy"
+
+    def save(self, fi: int, prepared: _PreparedFrame) -> None:
+        for field in _SCRATCH_FIELDS:
+            arr = getattr(prepared, field)
+            if arr is None:
+                continue
+            np.save(self._path(fi, field), np.ascontiguousarray(arr), allow_pickle=False)
+
+    def load(self, fi: int) -> _PreparedFrame:
+        arrays: dict[str, Optional[np.ndarray]] = {}
+        for field in _SCRATCH_FIELDS:
+            p = self._path(fi, field)
+            if field == "rest" and not p.exists():
+                arrays[field] = None
+                continue
+            try:
+                arrays[field] = np.load(p, mmap_mode="r", allow_pickle=False)
+            except FileNotFoundError:
+                _die(f"scratch 缺少文件: {p}")
+        return _PreparedFrame(**arrays)  # type: ignore[arg-type]
+
+
+# -----------------------------------------------------------------------------
+# pass 2: 逐帧编码(可在 worker 进程里并行执行)
+# -----------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class _LabelStream:
+    # 一套 SH rest palette 对应的 labels 流.
+    # - v1: 只有 `shN`,覆盖全部 rest coeff.
+    # - v2: `sh1/sh2/sh3` 各自覆盖一个 band 的 coeff 区间.
+    key: str
+    coeff_start: int
+    coeff_count: int
+    count: int
+    segments: Optional[list[dict[str, Any]]]  # delta-v1 时非空
+
+
+@dataclass
+class _EncodedFrame:
+    # worker 返回给主进程的逐帧结果.
+    # - image_entries: 该帧固定的 5 张数据图.
+    # - label_entries: full labels,或 delta-v1 segment 首帧的 base labels.
+    # - labels: delta-v1 时每个 label stream 的 u16 labels,供主进程按顺序生成 update block.
+    # - webp_stats: 每张 WebP 的 (stream 名, 字节数, 编码耗时秒),用于 effort 档位的体积/耗时报告.
+    # - stage_times: 该帧各阶段的 (stage, wall 秒, CPU 秒),汇总进 `--profile-json`.
+    # - ann_audit: `--sh-label-search ivf` 时每个 stream 的 (stream 名, 抽查数, 与精确搜索不同的数,
+    #   近似 labels 的距离和, 精确 labels 的距离和).
+    # - label_reuse: `--sh-label-reuse-tol` 时每个 stream 的 (stream 名, 重新分配的行数, 总行数).
+    fi: int
+    image_entries: list[tuple[str, bytes]]
+    label_entries: list[tuple[str, bytes]]
+    labels: list[Optional[np.ndarray]]
+    webp_stats: list[tuple[str, int, float]]
+    stage_times: list[tuple[str, float, float]]
+    ann_audit: list[tuple[str, int, int, float, float]]
+    label_reuse: list[tuple[str, int, int]]
+
+
+class _FrameEncoder:
+    """
+    pass 2 的逐帧编码器.
+
+    说明:
+    - 只依赖已经拟合好的 codebook/palette 与 pass 1 的统计结果,帧与帧之间互不依赖.
+      例外: `--sh-label-reuse-tol` 时 labels 沿用上一帧的结果,帧按 reuse chain 顺序编码(见 `_assign_labels`).
+    - delta-v1 的 update block 依赖前一帧 labels,所以留在主进程按帧序生成.
+    - 对象本身可 pickle,`--jobs N` 时会整体发给每个 worker 进程.
+    """
+
+    def __init__(
+        self,
+        *,
+        width: int,
+        height: int,
+        splat_count: int,
+        pos_range_min: np.ndarray,
+        pos_range_max: np.ndarray,
+        opacity_mode: str,
+        scale_mode: str,
+        scale_centers_log: np.ndarray,
+        sh0_codebook: np.ndarray,
+        sh0_method: str,
+        rest_fields: Optional[list[str]],
+        label_streams: list[_LabelStream],
+        label_models: list[_KMeansModel],
+        labels_encoding: str,
+        webp_effort: str,
+        scratch: Optional[_ScratchFrameStore],
+        assign_threads: int,
+        decode_cache: Optional[_PlyDecodeCache] = None,
+        label_indexes: Optional[list[Optional[_IvfCentroidIndex]]] = None,
+        ann_audit_count: int = 0,
+        label_reuse_tol: Optional[float] = None,
+        label_reuse_interval: int = 0,
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.splat_count = splat_count
+        self.pos_range_min = pos_range_min
+        self.pos_range_max = pos_range_max
+        self.opacity_mode = opacity_mode
+        self.scale_mode = scale_mode
+        self.scale_centers_log = scale_centers_log
+        self.sh0_codebook = sh0_codebook
+        self.sh0_method = sh0_method
+        self.rest_fields = rest_fields
+        self.label_streams = label_streams
+        self.label_models = label_models
+        self.labels_encoding = labels_encoding
+        self.webp_effort = webp_effort
+        self.scratch = scratch
+        self.decode_cache = decode_cache
+        self.assign_threads = assign_threads
+        self.label_indexes = label_indexes if label_indexes is not None else [None] * len(label_models)
+        self.ann_audit_count = ann_audit_count
+        self.label_reuse_tol = label_reuse_tol
+        self.label_reuse_interval = label_reuse_interval
+        self._scale_tree: Any = None
+        # stream key -> (帧号, 每行最近一次分配时的 features, labels)
+        self._reuse_state: dict[str, tuple[int, np.ndarray, np.ndarray]] = {}
+
+    def __getstate__(self) -> dict[str, Any]:
+        # KDTree 在每个进程里按需重建,不随对象 pickle; labels 复用状态也只属于当前进程.
+        state = self.__dict__.copy()
+        state["_scale_tree"] = None
+        state["_reuse_state"] = {}
+        return state
+
+    def _assign_labels(
+        self, fi: int, key: str, search: Any, features: np.ndarray
+    ) -> tuple[np.ndarray, int]:
+        """
+        逐帧 labels 分配. 返回 (labels[N] u16, 实际做最近中心搜索的行数).
+
+        `--sh-label-reuse-tol` 时:
+        - 每个 reuse chain(`label_reuse_interval` 帧)的首帧全量分配.
+        - 其余帧只对 features 相对“该行最近一次分配时的值”变化超过 tol(逐分量最大绝对差)的行重新搜索,
+          其它行沿用上一帧的 label. 与“只和上一帧比较”相比,缓慢漂移不会无限累积.
+        - tol=0 时只复用完全相同的行,结果与全量分配一致.
+        """
+        n = features.shape[0]
+        if self.label_reuse_tol is None:
+            return search.predict(features, self.assign_threads).astype(np.uint16, copy=False), n
+
+        state = self._reuse_state.get(key)
+        if fi % self.label_reuse_interval == 0 or state is None or state[0] != fi - 1:
+            labels = search.predict(features, self.assign_threads).astype(np.uint16, copy=False)
+            self._reuse_state[key] = (fi, features.copy(), labels)
+            return labels, n
+
+        _, ref, prev = state
+        diff = np.max(np.abs(features - ref), axis=1)
+        # NaN 也当作变化.
+        changed = np.flatnonzero(~(diff <= self.label_reuse_tol))
+        labels = prev.copy()
+        if changed.shape[0] > 0:
+            x = features[changed]
+            labels[changed] = search.predict(x, self.assign_threads).astype(np.uint16, copy=False)
+            ref[changed] = x
+        self._reuse_state[key] = (fi, ref, labels)
+        return labels, int(changed.shape[0])
+
+    def _get_scale_tree(self) -> Any:
+        if self._scale_tree is None:
+            if cKDTree is None:
+                _die("当前环境缺少 scipy(cKDTree),无法进行 scale 量化. 请安装 scipy.")
+            self._scale_tree = cKDTree(self.scale_centers_log.astype(np.float32, copy=False))
+        return self._scale_tree
+
+    def read_ply_frame(self, ply: Path | _PlyArchiveMember) -> PlyFrame:
+        return _read_ply_frame(ply, self.rest_fields, self.decode_cache)
+
+    def _load(
+        self,
+        times: list[tuple[str, float, float]],
+        fi: int,
+        ply: Path | _PlyArchiveMember,
+        prefetched: Optional[Iterator[PlyFrame]],
+    ) -> _PreparedFrame:
+        if self.scratch is not None:
+            with _timed(times, "scratch_read"):
+                return self.scratch.load(fi)
+        with _timed(times, "ply_read"):
+            ply_frame = next(prefetched) if prefetched is not None else self.read_ply_frame(ply)
+        with _timed(times, "prepare"):
+            return _prepare_frame(
+                ply_frame,
+                self.pos_range_min[fi],
+                self.pos_range_max[fi],
+                self.opacity_mode,
+                self.scale_mode,
+            )
+
+    def _rgba(self, channels: np.ndarray, alpha: Optional[np.ndarray] = None) -> np.ndarray:
+        flat = np.zeros((self.width * self.height, 4), dtype=np.uint8)
+        flat[: self.splat_count, 0 : channels.shape[1]] = channels
+        flat[: self.splat_count, 3] = 255 if alpha is None else alpha
+        return flat.reshape(self.height, self.width, 4)
+
+    def _encode_webp(
+        self,
+        stats: list[tuple[str, int, float]],
+        times: list[tuple[str, float, float]],
+        path: str,
+        rgba: np.ndarray,
+    ) -> tuple[str, bytes]:
+        stream = path.rsplit("/", 1)[-1].removesuffix(".webp")
+        with _timed(times, f"webp_encode:{stream}"):
+            data = _encode_webp_lossless_rgba(rgba, self.webp_effort)
+        stats.append((stream, len(data), times[-1][1]))
+        return path, data
+
+    def encode(self, fi: int, ply: Path | _PlyArchiveMember, prefetched: Optional[Iterator[PlyFrame]] = None) -> _EncodedFrame:
+        # prefetched: 串行编码时由 `_iter_ply_frames` 按帧序预读的 PLY,下一项就是本帧.
+        times: list[tuple[str, float, float]] = []
+        frame = self._load(times, fi, ply, prefetched)
+        splat_count = self.splat_count
+        frame_dir = f"frames/{fi:05d}/"
+        images: list[tuple[str, bytes]] = []
+        stats: list[tuple[str, int, float]] = []
+
+        # -----------------------------
+        # position_hi / position_lo
+        # -----------------------------
+        q = frame.position_q  # [N,3] u16
+        hi = (q >> 8).astype(np.uint8, copy=False)
+        lo = (q & 0xFF).astype(np.uint8, copy=False)
+        images.append(self._encode_webp(stats, times, frame_dir + "position_hi.webp", self._rgba(hi)))
+        images.append(self._encode_webp(stats, times, frame_dir + "position_lo.webp", self._rgba(lo)))
+
+        # -----------------------------
+        # scale_indices
+        # -----------------------------
+        # KDTree 查询最近的 codebook entry.
+        with _timed(times, "predict:scale"):
+            _, idx_scale = self._get_scale_tree().query(frame.scale_log, k=1)
+        idx_scale = idx_scale.astype(np.uint16, copy=False)
+        rgba_scale = _pack_u16_to_rgba(idx_scale, splat_count, self.width, self.height)
+        images.append(self._encode_webp(stats, times, frame_dir + "scale_indices.webp", rgba_scale))
+
+        # -----------------------------
+        # rotation.webp (quat u8)
+        # -----------------------------
+        flat_rot = np.zeros((self.width * self.height, 4), dtype=np.uint8)
+        flat_rot[:splat_count, :] = frame.rot_q8
+        rgba_rot = flat_rot.reshape(self.height, self.width, 4)
+        images.append(self._encode_webp(stats, times, frame_dir + "rotation.webp", rgba_rot))
+
+        # -----------------------------
+        # sh0.webp (RGB=codebook index, A=opacity)
+        # -----------------------------
+        # `base-rgb` 模式下:
+        # - RGB byte 会直接等于 `.splat4d` 的 baseRgb 量化结果.
+        # - `sh0Codebook` 则是与 0..255 byte 一一对应的固定 f_dc 反解表.
+        idx_sh0 = _quantize_sh0_to_u8(frame.f_dc, self.sh0_codebook, self.sh0_method)  # [N,3] u8
+        rgba_sh0 = self._rgba(idx_sh0, frame.opacity_a8)
+        images.append(self._encode_webp(stats, times, frame_dir + "sh0.webp", rgba_sh0))
+
+        # -----------------------------
+        # SH rest labels
+        # -----------------------------
+        label_entries: list[tuple[str, bytes]] = []
+        labels_out: list[Optional[np.ndarray]] = []
+        ann_audit: list[tuple[str, int, int, float, float]] = []
+        label_reuse: list[tuple[str, int, int]] = []
+        for stream, model, index in zip(self.label_streams, self.label_models, self.label_indexes):
+            assert frame.rest is not None
+            rest_sel = frame.rest[:, stream.coeff_start : stream.coeff_start + stream.coeff_count, :]
+            features = rest_sel.reshape(splat_count, -1).astype(np.float32, copy=False)
+
+            with _timed(times, f"predict:{stream.key}"):
+                labels, searched = self._assign_labels(fi, stream.key, model if index is None else index, features)
+            if self.label_reuse_tol is not None:
+                label_reuse.append((stream.key, searched, splat_count))
+
+            if index is not None and self.ann_audit_count > 0:
+                with _timed(times, f"ann_audit:{stream.key}"):
+                    ann_audit.append(_audit_ann_labels(stream.key, model, features, labels, self.ann_audit_count))
+
+            if self.labels_encoding == "full":
+                rgba_labels = _pack_u16_to_rgba(labels, splat_count, self.width, self.height)
+                label_entries.append(self._encode_webp(stats, times, frame_dir + f"{stream.key}_labels.webp", rgba_labels))
+                labels_out.append(None)
+                continue
+
+            # delta-v1: segment 首帧写 base labels WebP,其余帧交给主进程写 update block.
+            assert stream.segments is not None
+            for seg in stream.segments:
+                if int(seg["startFrame"]) == fi:
+                    rgba_labels = _pack_u16_to_rgba(labels, splat_count, self.width, self.height)
+                    label_entries.append(self._encode_webp(stats, times, seg["baseLabelsPath"], rgba_labels))
+                    break
+            labels_out.append(labels)
+
+        return _EncodedFrame(
+            fi=fi,
+            image_entries=images,
+            label_entries=label_entries,
+            labels=labels_out,
+            webp_stats=stats,
+            stage_times=times,
+            ann_audit=ann_audit,
+            label_reuse=label_reuse,
+        )
+
+
+def _audit_ann_labels(
+    key: str, model: _KMeansModel, features: np.ndarray, labels: np.ndarray, count: int
+) -> tuple[str, int, int, float, float]:
+    # 等间隔抽查 count 行,与精确搜索比较: 返回 (stream, 抽查数, 不同数, 近似距离和, 精确距离和).
+    n = features.shape[0]
+    rows = np.unique(np.linspace(0, n - 1, num=min(count, n)).astype(np.int64))
+    x = features[rows]
+    approx = labels[rows].astype(np.int64)
+    exact = model.predict(x)
+    c = model.centroids
+    d_approx = float(np.sum((x - c[approx]) ** 2, dtype=np.float64))
+    d_exact = float(np.sum((x - c[exact]) ** 2, dtype=np.float64))
+    return key, int(rows.shape[0]), int(np.count_nonzero(approx != exact)), d_approx, d_exact
+
+
+def _log_sh_ann_report(indexes: dict[str, _IvfCentroidIndex], totals: dict[str, list[float]]) -> None:
+    # `--sh-label-search ivf` 的精度报告: 抽查行里有多少 labels 与精确搜索不同,以及量化误差增加了多少.
+    for key, index in indexes.items():
+        acc = totals.get(key)
+        if acc is None or acc[0] <= 0:
+            _info(f"sh ann {key}: ivf(lists={index.lists}, nprobe={index.nprobe}), audit disabled")
+            continue
+        audited, differing, d_approx, d_exact = int(acc[0]), int(acc[1]), acc[2], acc[3]
+        extra = (d_approx / d_exact - 1.0) * 100.0 if d_exact > 0.0 else 0.0
+        _info(
+            f"sh ann {key}: ivf(lists={index.lists}, nprobe={index.nprobe}) "
+            f"audited={audited} differing={differing} ({differing / audited * 100.0:.3f}%) "
+            f"dist2 +{extra:.3f}% vs exact"
+        )
+
+
+_WORKER_FRAME_ENCODER: Optional[_FrameEncoder] = None
+
+
+def _init_frame_encoder_worker(encoder: _FrameEncoder) -> None:
+    global _WORKER_FRAME_ENCODER
+    _WORKER_FRAME_ENCODER = encoder
+    _limit_worker_threads()
+
+
+def _encode_frame_in_worker(fi: int, ply: Path | _PlyArchiveMember) -> _EncodedFrame:
+    assert _WORKER_FRAME_ENCODER is not None
+    return _WORKER_FRAME_ENCODER.encode(fi, ply)
+
+
+def _encode_chain_in_worker(start: int, plys: list[Path | _PlyArchiveMember]) -> list[_EncodedFrame]:
+    # labels 复用时一个 reuse chain 必须在同一个进程里按帧序编码.
+    assert _WORKER_FRAME_ENCODER is not None
+    return [_WORKER_FRAME_ENCODER.encode(start + i, ply) for i, ply in enumerate(plys)]
+
+
+def _limit_worker_threads() -> None:
+    # 多进程时每个 worker 只用 1 个 BLAS/OpenMP 线程,避免 N 个进程 x M 个线程的超订.
+    try:
+        from threadpoolctl import threadpool_limits
+    except Exception:  # pragma: no cover - threadpoolctl 是可选依赖,缺失时直接跳过
+        return
+    threadpool_limits(1)
+
+
+def _iter_encoded_frames(
+    encoder: _FrameEncoder,
+    ply_files: list[Path | _PlyArchiveMember],
+    jobs: int,
+    chain_length: int = 0,
+    prefetch_depth: int = 0,
+    prefetch_bytes: int = 0,
+) -> Iterator[_EncodedFrame]:
+    # 按帧序产出编码结果.
+    # - jobs<=1: 当前进程串行编码. prefetch_depth>0 且不走 scratch 时,PLY 由后台线程预读.
+    # - jobs>1: 进程池并行编码,但始终按帧序 yield,保证 ZIP 写入顺序与串行一致.
+    #   在途任务数限制为 2*jobs,避免编码结果在内存里堆积.
+    # - chain_length>0(labels 复用): 每个 chain 作为一个任务交给同一个 worker 按帧序编码,
+    #   在途 chain 数限制为 jobs,结果与串行一致.
+    if jobs <= 1:
+        prefetched: Optional[Iterator[PlyFrame]] = None
+        if prefetch_depth > 0 and encoder.scratch is None:
+            prefetched = _iter_ply_frames(ply_files, encoder.read_ply_frame, prefetch_depth, prefetch_bytes)
+        for fi, ply in enumerate(ply_files):
+            yield encoder.encode(fi, ply, prefetched)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_frame_encoder_worker,
+        initargs=(encoder,),
+    ) as executor:
+        if chain_length > 0:
+            chains: deque[Future[list[_EncodedFrame]]] = deque()
+            next_fi = 0
+            while next_fi < len(ply_files) or chains:
+                while next_fi < len(ply_files) and len(chains) < jobs:
+                    plys = ply_files[next_fi : next_fi + chain_length]
+                    chains.append(executor.submit(_encode_chain_in_worker, next_fi, plys))
+                    next_fi += len(plys)
+                yield from chains.popleft().result()
+            return
+
+        pending: deque[Future[_EncodedFrame]] = deque()
+        next_fi = 0
+        while next_fi < len(ply_files) or pending:
+            while next_fi < len(ply_files) and len(pending) < jobs * 2:
+                pending.append(executor.submit(_encode_frame_in_worker, next_fi, ply_files[next_fi]))
+                next_fi += 1
+            yield pending.popleft().result()
+
+
+def _log_webp_effort_report(effort: str, totals: dict[str, list[float]]) -> None:
+    # 按 stream 汇总 WebP 体积与编码耗时,用来对比不同 `--webp-effort` 档位.
+    # 说明: 耗时是各帧编码耗时之和(并行时为所有 worker 的累计 CPU 侧耗时),不是墙钟时间.
+    method, quality = _WEBP_EFFORT_PROFILES[effort]
+    _info(f"webp effort={effort} (method={method}, quality={quality}):")
+    _info(f"  {'stream':<16} {'images':>7} {'bytes':>14} {'encode_s':>10}")
+    all_count = 0
+    all_bytes = 0
+    all_seconds = 0.0
+    for stream in sorted(totals):
+        count, size, seconds = totals[stream]
+        all_count += int(count)
+        all_bytes += int(size)
+        all_seconds += seconds
+        _info(f"  {stream:<16} {int(count):>7} {int(size):>14} {seconds:>10.3f}")
+    _info(f"  {'total':<16} {all_count:>7} {all_bytes:>14} {all_seconds:>10.3f}")
+
+
+class _DeltaV1SegmentWriter:
+    # 单个 label stream 的 delta-v1 segment 状态机(只在主进程里使用).
+
+    def __init__(self, stream: _LabelStream, splat_count: int) -> None:
+        assert stream.segments is not None
+        self.stream = stream
+        self.splat_count = splat_count
+        self.seg_idx = -1
+        self.bio: Optional[io.BytesIO] = None
+        self.prev_labels: Optional[np.ndarray] = None
+
+    def start_next(self) -> None:
+        assert self.stream.segments is not None
+        self.seg_idx += 1
+        seg = self.stream.segments[self.seg_idx]
+        self.bio = io.BytesIO()
+        _write_delta_v1_header(
+            self.bio,
+            int(seg["startFrame"]),
+            int(seg["frameCount"]),
+            int(self.splat_count),
+            int(self.stream.count),
+        )
+        self.prev_labels = None
+
+    def flush(self, zf: zipfile.ZipFile) -> None:
+        assert self.stream.segments is not None
+        assert self.bio is not None
+        _zip_writestr(zf, self.stream.segments[self.seg_idx]["deltaPath"], self.bio.getvalue())
+        self.bio.close()
+        self.bio = None
+
+    def add_frame(self, labels: np.ndarray) -> None:
+        # segment 首帧: base labels 已由 encoder 写成 WebP,这里只记录 prev.
+        if self.prev_labels is None:
+            self.prev_labels = labels
+            return
+
+        assert self.bio is not None
+        _write_delta_v1_updates(self.bio, labels, self.prev_labels)
+        self.prev_labels = labels
 
 
 # -----------------------------------------------------------------------------
@@ -795,6 +2787,47 @@ def _write_delta_v1_header(
     # 注意: Unity importer 当前严格按 spec 读取 5 个 u32,不要在这里加 padding 字段.
 
 
+# delta-v1 update block 里的单条记录: u32 splatId + u16 label + u16 reserved(=0), little-endian, 共 8 bytes.
+_DELTA_V1_UPDATE_DTYPE = np.dtype([("sid", "<u4"), ("label", "<u2"), ("reserved", "<u2")])
+
+
+def _write_delta_v1_updates(bio: io.BytesIO, labels: np.ndarray, prev_labels: np.ndarray) -> None:
+    # 一帧的 update block: u32 updateCount + updateCount 条记录(splatId 严格递增).
+    # 记录用结构化数组一次性构造,再整体 tobytes(),避免高 churn 帧上的逐条 struct.pack.
+    splat_ids = np.flatnonzero(labels != prev_labels)
+    updates = np.zeros(splat_ids.shape[0], dtype=_DELTA_V1_UPDATE_DTYPE)
+    updates["sid"] = splat_ids
+    updates["label"] = labels[splat_ids]
+    bio.write(struct.pack("<I", int(splat_ids.shape[0])))
+    bio.write(updates.tobytes())
+
+
+def _check_delta_v1_updates(updates: np.ndarray, splat_count: int, count: int, where: str) -> None:
+    # 校验一帧的 update records(结构化数组,dtype=_DELTA_V1_UPDATE_DTYPE).
+    # 所有检查一次性向量化完成;出错时报告第一条坏记录,检查优先级与逐条校验一致:
+    # reserved -> splatId 越界 -> label 越界 -> splatId 严格递增.
+    sid = updates["sid"]
+    lab = updates["label"]
+    res_bad = updates["reserved"] != 0
+    sid_bad = sid >= splat_count
+    lab_bad = lab >= count
+    order_bad = np.zeros(sid.shape[0], dtype=bool)
+    order_bad[1:] = sid[1:] <= sid[:-1]
+
+    bad = np.flatnonzero(res_bad | sid_bad | lab_bad | order_bad)
+    if bad.size == 0:
+        return
+
+    u = int(bad[0])
+    if res_bad[u]:
+        raise _ValidationError(f"delta-v1 reserved!=0: {where} update={u}")
+    if sid_bad[u]:
+        raise _ValidationError(f"delta-v1 splatId 越界: {where} sid={int(sid[u])}")
+    if lab_bad[u]:
+        raise _ValidationError(f"delta-v1 label 越界: {where} lab={int(lab[u])}")
+    raise _ValidationError(f"delta-v1 splatId 非严格递增: {where} sid={int(sid[u])} prev={int(sid[u - 1])}")
+
+
 def _pack_cmd(args: argparse.Namespace) -> None:
     _ensure_webp_available()
 
@@ -807,12 +2840,16 @@ def _pack_cmd(args: argparse.Namespace) -> None:
     # ---------------------------------------------------------------------
     # Pass 0: 先用第 0 帧确定 splatCount 与 rest/bands,并建立 rest 字段列表.
     # ---------------------------------------------------------------------
-    v0 = _read_ply_vertices(ply_files[0])
-    splat_count = int(v0.shape[0])
+    # 这里只解析 header: splatCount 与字段列表都在 header 里,不需要读 vertex body.
+    try:
+        header0 = _read_ply_header(ply_files[0])
+    except ValueError as e:
+        _die(f"{e}. file={ply_files[0]}")
+    splat_count = int(header0.vertex_count)
     if splat_count <= 0:
         _die("splatCount 必须 >0")
 
-    rest_fields = _find_rest_fields(v0)
+    rest_fields = _find_rest_field_names([name for name, _ in header0.vertex_props])
     rest_prop_count = len(rest_fields)
     if rest_prop_count % 3 != 0:
         _die(f"f_rest_* 字段数量必须是 3 的倍数,got {rest_prop_count}")
@@ -847,16 +2884,116 @@ def _pack_cmd(args: argparse.Namespace) -> None:
 
     _info(f"splats: {splat_count}, shBands: {sh_bands}")
 
+    # single-read: pass 1 顺手把 pass 2 需要的逐帧数组落到 scratch,pass 2 不再读 PLY.
+    scratch: Optional[_ScratchFrameStore] = None
+    scratch_root: Optional[Path] = None
+    if args.single_read:
+        scratch_parent = Path(args.scratch_dir) if args.scratch_dir else None
+        if scratch_parent is not None:
+            scratch_parent.mkdir(parents=True, exist_ok=True)
+        scratch_root = Path(tempfile.mkdtemp(prefix="sog4d_scratch_", dir=scratch_parent))
+        scratch = _ScratchFrameStore(scratch_root)
+        _info(f"single-read: scratch={scratch_root}")
+
+    profiler = _StageProfiler()
+    try:
+        _pack_from_ply_files(
+            args, output_path, ply_files, splat_count, sh_bands, rest_fields, rest_coeff_count, scratch, profiler
+        )
+    finally:
+        if scratch_root is not None:
+            shutil.rmtree(scratch_root, ignore_errors=True)
+
+    # 可选: 打包后自检(避免把明显坏包交给 Unity importer).
+    if args.self_check:
+        with profiler.stage("validate"):
+            _validate_cmd(
+                argparse.Namespace(
+                    input=str(output_path), verbose=False, jobs=args.jobs, level="full", sample_count=0, seed=0
+                )
+            )
+
+    if args.profile_json:
+        profile_path = Path(args.profile_json)
+        profiler.write_json(
+            profile_path,
+            {
+                "tool": "ply_sequence_to_sog4d",
+                "command": "pack",
+                "frameCount": int(frame_count),
+                "splatCount": int(splat_count),
+                "shBands": int(sh_bands),
+                "jobs": int(args.jobs),
+                "singleRead": bool(args.single_read),
+                "webpEffort": args.webp_effort,
+            },
+        )
+        _info(f"profile: {profile_path}")
+
+
+def _pack_from_ply_files(
+    args: argparse.Namespace,
+    output_path: Path,
+    ply_files: list[Path | _PlyArchiveMember],
+    splat_count: int,
+    sh_bands: int,
+    rest_fields: list[str],
+    rest_coeff_count: int,
+    scratch: Optional[_ScratchFrameStore],
+    profiler: _StageProfiler,
+) -> None:
+    frame_count = len(ply_files)
+
     # v2: SH rest 按 band 拆分的开关.
     # - 仅在 shBands>0 时有意义.
     # - 不开启时保持 v1 的单 palette(shN) 行为,以保证兼容与可对比实验.
     use_sh_split_by_band = bool(args.sh_split_by_band) and sh_bands > 0
 
+    kmeans_cfg = _KMeansConfig(
+        algorithm=args.kmeans_algorithm,
+        max_iter=int(args.kmeans_max_iter),
+        tol=float(args.kmeans_tol),
+        threads=int(args.kmeans_threads),
+    )
+    if int(args.codebook_jobs) <= 0:
+        _die(f"--codebook-jobs 必须 >0, got {args.codebook_jobs}")
+    decode_cache = _open_decode_cache(args)
+    prefetch_depth = int(args.prefetch_frames)
+    if prefetch_depth < 0:
+        _die(f"--prefetch-frames 必须 >=0, got {args.prefetch_frames}")
+    if float(args.prefetch_max_mb) <= 0:
+        _die(f"--prefetch-max-mb 必须 >0, got {args.prefetch_max_mb}")
+    prefetch_bytes = int(float(args.prefetch_max_mb) * (1 << 20))
+    if prefetch_depth > 0:
+        _info(f"prefetch: up to {prefetch_depth} frames ahead, cap {float(args.prefetch_max_mb):.0f} MiB")
+    if int(args.sh_ann_lists) < 0:
+        _die(f"--sh-ann-lists 必须 >=0, got {args.sh_ann_lists}")
+    if int(args.sh_ann_nprobe) <= 0:
+        _die(f"--sh-ann-nprobe 必须 >0, got {args.sh_ann_nprobe}")
+    if int(args.sh_ann_audit) < 0:
+        _die(f"--sh-ann-audit 必须 >=0, got {args.sh_ann_audit}")
+    label_reuse_tol: Optional[float] = None
+    if args.sh_label_reuse_tol is not None:
+        label_reuse_tol = float(args.sh_label_reuse_tol)
+        if not (math.isfinite(label_reuse_tol) and label_reuse_tol >= 0.0):
+            _die(f"--sh-label-reuse-tol 必须是 >=0 的有限值, got {args.sh_label_reuse_tol}")
+    if int(args.sh_label_reuse_interval) <= 0:
+        _die(f"--sh-label-reuse-interval 必须 >0, got {args.sh_label_reuse_interval}")
+
     # ---------------------------------------------------------------------
     # Pass 1: 逐帧统计 range,并采样用于 codebook/palette 拟合.
     # ---------------------------------------------------------------------
     rng = np.random.default_rng(int(args.seed))
 
+    # `--reuse-codebooks` direct 模式下 codebook 全部来自文件,pass 1 只统计 range,不采样.
+    reused: Optional[_ReusedCodebooks] = None
+    reuse_direct = args.reuse_codebooks_mode == "direct"
+    if args.reuse_codebooks is not None:
+        with profiler.stage("reuse_codebooks:load"):
+            reused = _load_reused_codebooks(Path(args.reuse_codebooks))
+        _info(f"reuse codebooks: {reused.source} (mode={args.reuse_codebooks_mode})")
+    skip_sampling = reused is not None and reuse_direct
+
     # position per-frame range
     pos_range_min = np.empty((frame_count, 3), dtype=np.float32)
     pos_range_max = np.empty((frame_count, 3), dtype=np.float32)
@@ -881,15 +3018,44 @@ def _pack_cmd(args: argparse.Namespace) -> None:
     scale_target = int(args.scale_sample_count)
     shn_target = int(args.shn_sample_count)
 
-    # 平均分配每帧采样预算,避免某帧独占样本.
+    # 采样预算的分配方式(--codebook-sampling):
+    # - per-frame: 平均分配每帧采样预算,避免某帧独占样本.
+    # - reservoir: 每个 stream 一个固定容量的流式样本池,在整个序列上按权重抽样.
+    #   帧数再多,每帧也不会被压到只剩 1 个样本;内存只与 --*-sample-count 有关.
     # sh0 的采样参数按“标量总量”计数,但每个 splat 会贡献 3 个标量(f_dc.r/g/b).
-    sh0_needs_sampling = args.sh0_codebook_method != "base-rgb"
-    sh0_per_frame = max(1, sh0_target // (frame_count * 3)) if sh0_needs_sampling else 0
-    scale_per_frame = max(1, scale_target // frame_count)
-    shn_per_frame = max(1, shn_target // frame_count) if sh_bands > 0 else 0
-
+    sh0_needs_sampling = args.sh0_codebook_method != "base-rgb" and not skip_sampling
+    sh0_reservoir: Optional[_WeightedReservoir] = None
+    scale_reservoir: Optional[_WeightedReservoir] = None
+    shn_reservoir: Optional[_WeightedReservoir] = None
+    if skip_sampling:
+        sh0_per_frame = scale_per_frame = shn_per_frame = 0
+    elif args.codebook_sampling == "reservoir":
+        if sh0_needs_sampling:
+            sh0_reservoir = _WeightedReservoir(max(1, sh0_target // 3), rng)
+        scale_reservoir = _WeightedReservoir(scale_target, rng)
+        if sh_bands > 0:
+            shn_reservoir = _WeightedReservoir(shn_target, rng)
+        sh0_per_frame = scale_per_frame = shn_per_frame = 0
+    else:
+        sh0_per_frame = max(1, sh0_target // (frame_count * 3)) if sh0_needs_sampling else 0
+        scale_per_frame = max(1, scale_target // frame_count)
+        shn_per_frame = max(1, shn_target // frame_count) if sh_bands > 0 else 0
+
+    # `--prefetch-frames` 时 ply_read 记录的是主线程等待预读结果的时间.
+    # 默认用投影读取: pass 1 不展开 rot,rest 只 gather 采样到的行.
+    # - single-read 要把整帧写进 scratch,必须整帧读.
+    # - 解码缓存命中时各列本身就是按需换入的 memmap,整帧读也不会展开 rest.
+    rest_arg = rest_fields if sh_bands > 0 else None
+    projected = scratch is None and decode_cache is None
+    pass1_frames = _iter_ply_frames(
+        ply_files,
+        lambda p: _read_ply_projected(p, rest_arg) if projected else _read_ply_frame(p, rest_arg, decode_cache),
+        prefetch_depth,
+        prefetch_bytes,
+    )
     for fi, ply in enumerate(ply_files):
-        frame = _read_ply_frame(ply, rest_fields if sh_bands > 0 else None)
+        with profiler.stage("pass1:ply_read", fi):
+            frame = next(pass1_frames)
 
         if frame.positions.shape[0] != splat_count:
             _die(f"frame splatCount 不一致: frame {fi} got {frame.positions.shape[0]} expected {splat_count}. file={ply}")
@@ -897,70 +3063,117 @@ def _pack_cmd(args: argparse.Namespace) -> None:
         pos_range_min[fi] = np.min(frame.positions, axis=0)
         pos_range_max[fi] = np.max(frame.positions, axis=0)
 
-        opacity = _decode_opacity(frame.opacity_raw, args.opacity_mode)
-        scale_lin = _decode_scale(frame.scale_raw, args.scale_mode)
-
-        # importance 权重用于采样(拟合 codebook/palette).
-        # - volume = scale.x * scale.y * scale.z.
-        # - 这个乘积对小尺度非常敏感,在 float32 下容易下溢为 0,进而导致“权重全 0”的采样失败.
-        # - 因此这里用 float64 计算,再在写入权重缓存时转回 float32.
-        volume_f64 = np.prod(scale_lin.astype(np.float64, copy=False), axis=1)
-        importance = np.maximum(opacity.astype(np.float64, copy=False) * volume_f64, 0.0)
-
-        # ---- sh0 采样(1D)
-        # 每个 splat 提供 3 个样本(f_dc.r/g/b),权重一致.
-        if sh0_per_frame > 0:
-            idx = _weighted_choice_no_replace(rng, splat_count, min(sh0_per_frame, splat_count), importance)
-
-            vals = frame.f_dc[idx].reshape(-1).astype(np.float32, copy=False)  # 3x
-            w = importance[idx].repeat(3).astype(np.float32, copy=False)
-            sh0_values.append(vals)
-            sh0_weights.append(w)
-
-        # ---- scale 采样(3D,在 log 空间聚类)
-        if scale_per_frame > 0:
-            idx = _weighted_choice_no_replace(rng, splat_count, min(scale_per_frame, splat_count), opacity)
-
-            sl = np.maximum(scale_lin[idx], 1e-8)
-            feat = np.log(sl).astype(np.float32, copy=False)
-            w = opacity[idx].astype(np.float32, copy=False)
-            scale_feat.append(feat)
-            scale_w.append(w)
-
-        # ---- shN 采样(高维,importance 权重)
-        if sh_bands > 0 and shn_per_frame > 0:
-            assert frame.rest is not None
-            idx = _weighted_choice_no_replace(rng, splat_count, min(shn_per_frame, splat_count), importance)
-
-            # v1: rest: [N,restCoeffCount,3] -> [N,D]
-            # v2: 按 band 切片:
-            # - sh1: rest[0:3]
-            # - sh2: rest[3:8]
-            # - sh3: rest[8:15]
-            w = importance[idx].astype(np.float32, copy=False)
-            if not use_sh_split_by_band:
-                d = frame.rest[idx].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
-                shn_feat.append(d)
-                shn_w.append(w)
-            else:
-                rest_sel = frame.rest[idx]  # [M,restCoeffCount,3]
-                d1 = rest_sel[:, 0:3, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
-                sh1_feat.append(d1)
-                sh1_w.append(w)
+        if scratch is not None:
+            assert isinstance(frame, PlyFrame)
+            with profiler.stage("pass1:scratch_write", fi):
+                scratch.save(
+                    fi,
+                    _prepare_frame(frame, pos_range_min[fi], pos_range_max[fi], args.opacity_mode, args.scale_mode),
+                )
 
-                if sh_bands >= 2:
-                    d2 = rest_sel[:, 3:8, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
-                    sh2_feat.append(d2)
-                    sh2_w.append(w)
+        if skip_sampling:
+            if (fi & 0x7) == 0:
+                _info(f"pass1: {fi+1}/{frame_count} frames")
+            continue
 
-                if sh_bands >= 3:
-                    d3 = rest_sel[:, 8:15, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
-                    sh3_feat.append(d3)
-                    sh3_w.append(w)
+        with profiler.stage("pass1:decode", fi):
+            opacity, scale_lin, importance = _sampling_weights(frame, args.opacity_mode, args.scale_mode)
+
+        with profiler.stage("pass1:sampling", fi):
+            # ---- reservoir 模式: 只提交候选,gather 只对可能入池的项执行.
+            if sh0_reservoir is not None:
+                sh0_reservoir.offer(importance, lambda idx: frame.f_dc[idx])
+            if scale_reservoir is not None:
+                scale_reservoir.offer(opacity, lambda idx: np.log(np.maximum(scale_lin[idx], 1e-8)))
+            if shn_reservoir is not None:
+                shn_reservoir.offer(importance, lambda idx: frame.rest_rows(idx).reshape(idx.shape[0], -1))
+
+            # ---- sh0 采样(1D)
+            # 每个 splat 提供 3 个样本(f_dc.r/g/b),权重一致.
+            if sh0_per_frame > 0:
+                idx = _weighted_choice_no_replace(
+                    rng, splat_count, min(sh0_per_frame, splat_count), importance, args.weighted_sampler
+                )
+
+                vals = frame.f_dc[idx].reshape(-1).astype(np.float32, copy=False)  # 3x
+                w = importance[idx].repeat(3).astype(np.float32, copy=False)
+                sh0_values.append(vals)
+                sh0_weights.append(w)
+
+            # ---- scale 采样(3D,在 log 空间聚类)
+            if scale_per_frame > 0:
+                idx = _weighted_choice_no_replace(
+                    rng, splat_count, min(scale_per_frame, splat_count), opacity, args.weighted_sampler
+                )
+
+                sl = np.maximum(scale_lin[idx], 1e-8)
+                feat = np.log(sl).astype(np.float32, copy=False)
+                w = opacity[idx].astype(np.float32, copy=False)
+                scale_feat.append(feat)
+                scale_w.append(w)
+
+            # ---- shN 采样(高维,importance 权重)
+            if sh_bands > 0 and shn_per_frame > 0:
+                idx = _weighted_choice_no_replace(
+                    rng, splat_count, min(shn_per_frame, splat_count), importance, args.weighted_sampler
+                )
+
+                # v1: rest: [N,restCoeffCount,3] -> [N,D]
+                # v2: 按 band 切片:
+                # - sh1: rest[0:3]
+                # - sh2: rest[3:8]
+                # - sh3: rest[8:15]
+                w = importance[idx].astype(np.float32, copy=False)
+                rest_sel = frame.rest_rows(idx)  # [M,restCoeffCount,3]
+                if not use_sh_split_by_band:
+                    d = rest_sel.reshape(idx.shape[0], -1).astype(np.float32, copy=False)
+                    shn_feat.append(d)
+                    shn_w.append(w)
+                else:
+                    d1 = rest_sel[:, 0:3, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
+                    sh1_feat.append(d1)
+                    sh1_w.append(w)
+
+                    if sh_bands >= 2:
+                        d2 = rest_sel[:, 3:8, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
+                        sh2_feat.append(d2)
+                        sh2_w.append(w)
+
+                    if sh_bands >= 3:
+                        d3 = rest_sel[:, 8:15, :].reshape(idx.shape[0], -1).astype(np.float32, copy=False)
+                        sh3_feat.append(d3)
+                        sh3_w.append(w)
 
         if (fi & 0x7) == 0:
             _info(f"pass1: {fi+1}/{frame_count} frames")
 
+    pass1_frames.close()
+
+    # reservoir 的结果放回与 per-frame 相同的缓存,后面的拟合代码不区分两种模式.
+    if sh0_reservoir is not None:
+        vals, w = sh0_reservoir.result()
+        sh0_values.append(vals.reshape(-1))
+        sh0_weights.append(w.repeat(3))
+    if scale_reservoir is not None:
+        vals, w = scale_reservoir.result()
+        scale_feat.append(vals)
+        scale_w.append(w)
+    if shn_reservoir is not None:
+        vals, w = shn_reservoir.result()
+        if not use_sh_split_by_band:
+            shn_feat.append(vals)
+            shn_w.append(w)
+        else:
+            rest_sel = vals.reshape(vals.shape[0], rest_coeff_count, 3)
+            sh1_feat.append(rest_sel[:, 0:3, :].reshape(vals.shape[0], -1))
+            sh1_w.append(w)
+            if sh_bands >= 2:
+                sh2_feat.append(rest_sel[:, 3:8, :].reshape(vals.shape[0], -1))
+                sh2_w.append(w)
+            if sh_bands >= 3:
+                sh3_feat.append(rest_sel[:, 8:15, :].reshape(vals.shape[0], -1))
+                sh3_w.append(w)
+
     sh0_samples = np.concatenate(sh0_values, axis=0) if sh0_values else np.empty((0,), dtype=np.float32)
     sh0_w_all = np.concatenate(sh0_weights, axis=0) if sh0_weights else np.empty((0,), dtype=np.float32)
     scale_samples = np.concatenate(scale_feat, axis=0) if scale_feat else np.empty((0, 3), dtype=np.float32)
@@ -971,45 +3184,40 @@ def _pack_cmd(args: argparse.Namespace) -> None:
 
     if sh0_needs_sampling:
         _info(f"sh0 samples: {sh0_samples.shape[0]}")
+    elif skip_sampling:
+        _info("codebook sampling: skipped (reuse codebooks, direct)")
     else:
         _info("sh0 samples: skipped (base-rgb mode)")
-    sh0_codebook = _build_sh0_codebook(sh0_samples, sh0_w_all, args.sh0_codebook_method, int(args.seed))
+
+    sh0_method = args.sh0_codebook_method
+    with profiler.stage("sh0_codebook"):
+        if reused is not None and reuse_direct:
+            sh0_codebook = reused.sh0_codebook
+            # 逐帧量化方式跟着复用的表走: 是 base-rgb 表就按 baseRgb 语义量化,否则找最近 codebook scalar.
+            base_rgb = _build_sh0_codebook(sh0_samples, sh0_w_all, "base-rgb", int(args.seed), kmeans_cfg)
+            sh0_method = "base-rgb" if np.array_equal(base_rgb, sh0_codebook) else "kmeans"
+        else:
+            sh0_init = reused.sh0_codebook if reused is not None and sh0_method == "kmeans" else None
+            sh0_codebook = _build_sh0_codebook(
+                sh0_samples, sh0_w_all, sh0_method, int(args.seed), kmeans_cfg, init=sh0_init
+            )
 
     # scale codebook
-    if scale_samples.shape[0] == 0:
+    if scale_samples.shape[0] == 0 and not skip_sampling:
         _die("scale codebook: 采样结果为空")
 
-    scale_codebook_size = int(args.scale_codebook_size)
-    scale_km = _fit_kmeans("scaleCodebook(log)", scale_samples, scale_w_all, scale_codebook_size, int(args.seed), 200_000)
-    scale_centers_log = scale_km.cluster_centers_.astype(np.float32, copy=False)
-    scale_codebook = np.exp(scale_centers_log).astype(np.float32, copy=False)
+    # 各 codebook 的拟合互相独立: 先收集任务,再串行或用 `--codebook-jobs` 个进程并行拟合.
+    fit_jobs: list[_CodebookFitJob] = [
+        _CodebookFitJob("scaleCodebook(log)", scale_samples, scale_w_all, int(args.scale_codebook_size), 200_000)
+    ]
 
-    # shN centroids/palette
-    shn_km = None
-    shn_centroids = None
-    shn_count = 0
-
-    # v2: sh1/sh2/sh3 centroids/palette
-    sh1_km = None
-    sh2_km = None
-    sh3_km = None
-    sh1_centroids = None
-    sh2_centroids = None
-    sh3_centroids = None
-    sh1_count = 0
-    sh2_count = 0
-    sh3_count = 0
     if sh_bands > 0:
         if not use_sh_split_by_band:
             shn_samples = np.concatenate(shn_feat, axis=0) if shn_feat else np.empty((0, rest_coeff_count * 3), dtype=np.float32)
             shn_w_all = np.concatenate(shn_w, axis=0) if shn_w else np.empty((0,), dtype=np.float32)
-            if shn_samples.shape[0] == 0:
+            if shn_samples.shape[0] == 0 and not skip_sampling:
                 _die("shN centroids: 采样结果为空")
-
-            shn_count_req = int(args.shn_count)
-            shn_km = _fit_kmeans("shN_centroids", shn_samples, shn_w_all, shn_count_req, int(args.seed), 200_000)
-            shn_centroids = shn_km.cluster_centers_.astype(np.float32, copy=False)  # [K,D]
-            shn_count = int(shn_centroids.shape[0])
+            fit_jobs.append(_CodebookFitJob("shN_centroids", shn_samples, shn_w_all, int(args.shn_count), 200_000))
         else:
             # v2: 分别拟合 sh1/sh2/sh3 三套 codebook.
             # - sh1: 3 coeff * RGB => D=9
@@ -1017,32 +3225,67 @@ def _pack_cmd(args: argparse.Namespace) -> None:
             # - sh3: 7 coeff * RGB => D=21
             sh1_samples = np.concatenate(sh1_feat, axis=0) if sh1_feat else np.empty((0, 9), dtype=np.float32)
             sh1_w_all = np.concatenate(sh1_w, axis=0) if sh1_w else np.empty((0,), dtype=np.float32)
-            if sh1_samples.shape[0] == 0:
+            if sh1_samples.shape[0] == 0 and not skip_sampling:
                 _die("sh1 centroids: 采样结果为空")
             sh1_count_req = int(args.sh1_count) if args.sh1_count is not None else int(args.shn_count)
-            sh1_km = _fit_kmeans("sh1_centroids", sh1_samples, sh1_w_all, sh1_count_req, int(args.seed), 200_000)
-            sh1_centroids = sh1_km.cluster_centers_.astype(np.float32, copy=False)  # [K,9]
-            sh1_count = int(sh1_centroids.shape[0])
+            fit_jobs.append(_CodebookFitJob("sh1_centroids", sh1_samples, sh1_w_all, sh1_count_req, 200_000))
 
             if sh_bands >= 2:
                 sh2_samples = np.concatenate(sh2_feat, axis=0) if sh2_feat else np.empty((0, 15), dtype=np.float32)
                 sh2_w_all = np.concatenate(sh2_w, axis=0) if sh2_w else np.empty((0,), dtype=np.float32)
-                if sh2_samples.shape[0] == 0:
+                if sh2_samples.shape[0] == 0 and not skip_sampling:
                     _die("sh2 centroids: 采样结果为空")
                 sh2_count_req = int(args.sh2_count) if args.sh2_count is not None else int(args.shn_count)
-                sh2_km = _fit_kmeans("sh2_centroids", sh2_samples, sh2_w_all, sh2_count_req, int(args.seed), 200_000)
-                sh2_centroids = sh2_km.cluster_centers_.astype(np.float32, copy=False)  # [K,15]
-                sh2_count = int(sh2_centroids.shape[0])
+                fit_jobs.append(_CodebookFitJob("sh2_centroids", sh2_samples, sh2_w_all, sh2_count_req, 200_000))
 
             if sh_bands >= 3:
                 sh3_samples = np.concatenate(sh3_feat, axis=0) if sh3_feat else np.empty((0, 21), dtype=np.float32)
                 sh3_w_all = np.concatenate(sh3_w, axis=0) if sh3_w else np.empty((0,), dtype=np.float32)
-                if sh3_samples.shape[0] == 0:
+                if sh3_samples.shape[0] == 0 and not skip_sampling:
                     _die("sh3 centroids: 采样结果为空")
                 sh3_count_req = int(args.sh3_count) if args.sh3_count is not None else int(args.shn_count)
-                sh3_km = _fit_kmeans("sh3_centroids", sh3_samples, sh3_w_all, sh3_count_req, int(args.seed), 200_000)
-                sh3_centroids = sh3_km.cluster_centers_.astype(np.float32, copy=False)  # [K,21]
-                sh3_count = int(sh3_centroids.shape[0])
+                fit_jobs.append(_CodebookFitJob("sh3_centroids", sh3_samples, sh3_w_all, sh3_count_req, 200_000))
+
+    if reused is not None:
+        for job in fit_jobs:
+            c = reused.centroids.get(job.name)
+            if c is None:
+                _die(f"--reuse-codebooks: {reused.source} 里没有 {job.name}(SH bands 或 --sh-split-by-band 与本次打包不一致)")
+            if c.shape[1] != job.samples.shape[1]:
+                _die(f"--reuse-codebooks: {job.name} 维度不匹配: bundle={c.shape[1]}, 本次={job.samples.shape[1]}")
+
+    if reused is not None and reuse_direct:
+        fitted = {}
+        for job in fit_jobs:
+            _info(f"{job.name}: reusing {reused.centroids[job.name].shape[0]} centroids, skip k-means")
+            fitted[job.name] = _KMeansModel(centroids=reused.centroids[job.name], inertia=float("nan"), n_iter=0)
+    else:
+        if reused is not None:
+            fit_jobs = [replace(job, init=reused.centroids[job.name]) for job in fit_jobs]
+        fitted = _fit_codebooks(fit_jobs, int(args.seed), kmeans_cfg, int(args.codebook_jobs), profiler)
+
+    scale_km = fitted["scaleCodebook(log)"]
+    scale_centers_log = scale_km.centroids
+    if reused is not None and reuse_direct:
+        scale_codebook = reused.scale_codebook
+    else:
+        scale_codebook = np.exp(scale_centers_log).astype(np.float32, copy=False)
+
+    # shN centroids/palette
+    shn_km: Optional[_KMeansModel] = fitted.get("shN_centroids")
+    shn_centroids = shn_km.centroids if shn_km is not None else None  # [K,D]
+    shn_count = int(shn_centroids.shape[0]) if shn_centroids is not None else 0
+
+    # v2: sh1/sh2/sh3 centroids/palette, [K,9] / [K,15] / [K,21]
+    sh1_km: Optional[_KMeansModel] = fitted.get("sh1_centroids")
+    sh2_km: Optional[_KMeansModel] = fitted.get("sh2_centroids")
+    sh3_km: Optional[_KMeansModel] = fitted.get("sh3_centroids")
+    sh1_centroids = sh1_km.centroids if sh1_km is not None else None
+    sh2_centroids = sh2_km.centroids if sh2_km is not None else None
+    sh3_centroids = sh3_km.centroids if sh3_km is not None else None
+    sh1_count = int(sh1_centroids.shape[0]) if sh1_centroids is not None else 0
+    sh2_count = int(sh2_centroids.shape[0]) if sh2_centroids is not None else 0
+    sh3_count = int(sh3_centroids.shape[0]) if sh3_centroids is not None else 0
 
     # layout
     width, height = _auto_layout(splat_count, args.layout_width, args.layout_height)
@@ -1185,7 +3428,7 @@ def _pack_cmd(args: argparse.Namespace) -> None:
     _info(f"writing bundle: {output_path}")
     with zipfile.ZipFile(output_path, "w", compression=compression) as zf:
         # meta.json
-        zf.writestr("meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+        _zip_writestr(zf, "meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
 
         # SH rest centroids.bin
         if sh_bands > 0:
@@ -1199,14 +3442,14 @@ def _pack_cmd(args: argparse.Namespace) -> None:
                     data = centroids3.astype("<f4").tobytes(order="C")
                 else:
                     _die(f"未知 shN centroids type: {args.shn_centroids_type}")
-                zf.writestr("shN_centroids.bin", data)
+                _zip_writestr(zf, "shN_centroids.bin", data)
             else:
                 assert sh1_centroids is not None
                 c1 = sh1_centroids.reshape(sh1_count, 3, 3)
                 if args.shn_centroids_type == "f16":
-                    zf.writestr("sh1_centroids.bin", c1.astype("<f2").tobytes(order="C"))
+                    _zip_writestr(zf, "sh1_centroids.bin", c1.astype("<f2").tobytes(order="C"))
                 elif args.shn_centroids_type == "f32":
-                    zf.writestr("sh1_centroids.bin", c1.astype("<f4").tobytes(order="C"))
+                    _zip_writestr(zf, "sh1_centroids.bin", c1.astype("<f4").tobytes(order="C"))
                 else:
                     _die(f"未知 sh centroids type: {args.shn_centroids_type}")
 
@@ -1214,9 +3457,9 @@ def _pack_cmd(args: argparse.Namespace) -> None:
                     assert sh2_centroids is not None
                     c2 = sh2_centroids.reshape(sh2_count, 5, 3)
                     if args.shn_centroids_type == "f16":
-                        zf.writestr("sh2_centroids.bin", c2.astype("<f2").tobytes(order="C"))
+                        _zip_writestr(zf, "sh2_centroids.bin", c2.astype("<f2").tobytes(order="C"))
                     elif args.shn_centroids_type == "f32":
-                        zf.writestr("sh2_centroids.bin", c2.astype("<f4").tobytes(order="C"))
+                        _zip_writestr(zf, "sh2_centroids.bin", c2.astype("<f4").tobytes(order="C"))
                     else:
                         _die(f"未知 sh centroids type: {args.shn_centroids_type}")
 
@@ -1224,334 +3467,145 @@ def _pack_cmd(args: argparse.Namespace) -> None:
                     assert sh3_centroids is not None
                     c3 = sh3_centroids.reshape(sh3_count, 7, 3)
                     if args.shn_centroids_type == "f16":
-                        zf.writestr("sh3_centroids.bin", c3.astype("<f2").tobytes(order="C"))
+                        _zip_writestr(zf, "sh3_centroids.bin", c3.astype("<f2").tobytes(order="C"))
                     elif args.shn_centroids_type == "f32":
-                        zf.writestr("sh3_centroids.bin", c3.astype("<f4").tobytes(order="C"))
+                        _zip_writestr(zf, "sh3_centroids.bin", c3.astype("<f4").tobytes(order="C"))
                     else:
                         _die(f"未知 sh centroids type: {args.shn_centroids_type}")
 
-        # 为 scale 最近邻准备 KDTree(3D)
-        if cKDTree is None:
-            _die("当前环境缺少 scipy(cKDTree),无法进行 scale 量化. 请安装 scipy.")
-        scale_tree = cKDTree(scale_centers_log.astype(np.float32, copy=False))
-
-        # delta-v1 的状态机
-        seg_idx = 0
-        seg_end = 0
-
-        # v1: 单 palette 的 delta
-        segs = sh_delta_segments or []
-        delta_bio: Optional[io.BytesIO] = None
-        prev_labels: Optional[np.ndarray] = None  # u16 [splatCount]
-
-        # v2: 分 band 的 delta
-        segs1 = sh1_delta_segments or []
-        segs2 = sh2_delta_segments or []
-        segs3 = sh3_delta_segments or []
-        delta_bio1: Optional[io.BytesIO] = None
-        delta_bio2: Optional[io.BytesIO] = None
-        delta_bio3: Optional[io.BytesIO] = None
-        prev1: Optional[np.ndarray] = None
-        prev2: Optional[np.ndarray] = None
-        prev3: Optional[np.ndarray] = None
-
-        def start_segment_v1(seg: dict[str, Any]) -> None:
-            nonlocal delta_bio, prev_labels, seg_end
-            delta_bio = io.BytesIO()
-            _write_delta_v1_header(
-                delta_bio,
-                int(seg["startFrame"]),
-                int(seg["frameCount"]),
-                int(splat_count),
-                int(shn_count),
-            )
-            prev_labels = None
-            seg_end = int(seg["startFrame"]) + int(seg["frameCount"])
-
-        def flush_segment_v1(seg: dict[str, Any]) -> None:
-            nonlocal delta_bio
-            assert delta_bio is not None
-            zf.writestr(seg["deltaPath"], delta_bio.getvalue())
-            delta_bio.close()
-            delta_bio = None
-
-        def start_segment_v2() -> None:
-            nonlocal delta_bio1, delta_bio2, delta_bio3, prev1, prev2, prev3, seg_end
-            seg1 = segs1[seg_idx]
-            delta_bio1 = io.BytesIO()
-            _write_delta_v1_header(
-                delta_bio1,
-                int(seg1["startFrame"]),
-                int(seg1["frameCount"]),
-                int(splat_count),
-                int(sh1_count),
-            )
-            prev1 = None
-            seg_end = int(seg1["startFrame"]) + int(seg1["frameCount"])
-
-            if sh_bands >= 2:
-                seg2 = segs2[seg_idx]
-                delta_bio2 = io.BytesIO()
-                _write_delta_v1_header(
-                    delta_bio2,
-                    int(seg2["startFrame"]),
-                    int(seg2["frameCount"]),
-                    int(splat_count),
-                    int(sh2_count),
-                )
-                prev2 = None
-
-            if sh_bands >= 3:
-                seg3 = segs3[seg_idx]
-                delta_bio3 = io.BytesIO()
-                _write_delta_v1_header(
-                    delta_bio3,
-                    int(seg3["startFrame"]),
-                    int(seg3["frameCount"]),
-                    int(splat_count),
-                    int(sh3_count),
-                )
-                prev3 = None
-
-        def flush_segment_v2() -> None:
-            nonlocal delta_bio1, delta_bio2, delta_bio3
-            seg1 = segs1[seg_idx]
-            assert delta_bio1 is not None
-            zf.writestr(seg1["deltaPath"], delta_bio1.getvalue())
-            delta_bio1.close()
-            delta_bio1 = None
-
-            if sh_bands >= 2:
-                seg2 = segs2[seg_idx]
-                assert delta_bio2 is not None
-                zf.writestr(seg2["deltaPath"], delta_bio2.getvalue())
-                delta_bio2.close()
-                delta_bio2 = None
-
-            if sh_bands >= 3:
-                seg3 = segs3[seg_idx]
-                assert delta_bio3 is not None
-                zf.writestr(seg3["deltaPath"], delta_bio3.getvalue())
-                delta_bio3.close()
-                delta_bio3 = None
-
-        if sh_bands > 0 and shn_labels_encoding == "delta-v1":
+        # 逐帧编码并写入 WebP
+        label_streams: list[_LabelStream] = []
+        label_models: list[_KMeansModel] = []
+        if sh_bands > 0:
             if not use_sh_split_by_band:
-                start_segment_v1(segs[0])
+                label_streams.append(_LabelStream("shN", 0, rest_coeff_count, shn_count, sh_delta_segments))
+                label_models.append(shn_km)
             else:
-                start_segment_v2()
-
-        # 逐帧编码并写入 WebP
-        for fi, ply in enumerate(ply_files):
-            frame = _read_ply_frame(ply, rest_fields if sh_bands > 0 else None)
-
-            # -----------------------------
-            # position_hi / position_lo
-            # -----------------------------
-            q = _quantize_position_u16(frame.positions, pos_range_min[fi], pos_range_max[fi])  # [N,3] u16
-            hi = (q >> 8).astype(np.uint8, copy=False)
-            lo = (q & 0xFF).astype(np.uint8, copy=False)
-
-            flat_hi = np.zeros((width * height, 4), dtype=np.uint8)
-            flat_lo = np.zeros((width * height, 4), dtype=np.uint8)
-            flat_hi[:splat_count, 0:3] = hi
-            flat_lo[:splat_count, 0:3] = lo
-            flat_hi[:splat_count, 3] = 255
-            flat_lo[:splat_count, 3] = 255
-            rgba_hi = flat_hi.reshape(height, width, 4)
-            rgba_lo = flat_lo.reshape(height, width, 4)
-
-            frame_dir = f"frames/{fi:05d}/"
-            _save_webp_lossless_rgba(zf, frame_dir + "position_hi.webp", rgba_hi)
-            _save_webp_lossless_rgba(zf, frame_dir + "position_lo.webp", rgba_lo)
-
-            # -----------------------------
-            # scale_indices
-            # -----------------------------
-            opacity = _decode_opacity(frame.opacity_raw, args.opacity_mode)
-            scale_lin = _decode_scale(frame.scale_raw, args.scale_mode)
-            scale_log = np.log(np.maximum(scale_lin, 1e-8)).astype(np.float32, copy=False)
-
-            # KDTree 查询最近的 codebook entry.
-            _, idx_scale = scale_tree.query(scale_log, k=1)
-            idx_scale = idx_scale.astype(np.uint16, copy=False)
-            rgba_scale = _pack_u16_to_rgba(idx_scale, splat_count, width, height)
-            _save_webp_lossless_rgba(zf, frame_dir + "scale_indices.webp", rgba_scale)
-
-            # -----------------------------
-            # rotation.webp (quat u8)
-            # -----------------------------
-            qn = _normalize_quat_wxyz(frame.rot_raw)
-            q8 = _quantize_quat_to_u8(qn)
-            flat_rot = np.zeros((width * height, 4), dtype=np.uint8)
-            flat_rot[:splat_count, :] = q8
-            rgba_rot = flat_rot.reshape(height, width, 4)
-            _save_webp_lossless_rgba(zf, frame_dir + "rotation.webp", rgba_rot)
-
-            # -----------------------------
-            # sh0.webp (RGB=codebook index, A=opacity)
-            # -----------------------------
-            # `base-rgb` 模式下:
-            # - RGB byte 会直接等于 `.splat4d` 的 baseRgb 量化结果.
-            # - `sh0Codebook` 则是与 0..255 byte 一一对应的固定 f_dc 反解表.
-            idx_sh0 = _quantize_sh0_to_u8(frame.f_dc, sh0_codebook, args.sh0_codebook_method)  # [N,3] u8
-            a8 = _quantize_0_1_to_u8(opacity)  # [N] u8
-            flat_sh0 = np.zeros((width * height, 4), dtype=np.uint8)
-            flat_sh0[:splat_count, 0:3] = idx_sh0
-            flat_sh0[:splat_count, 3] = a8
-            rgba_sh0 = flat_sh0.reshape(height, width, 4)
-            _save_webp_lossless_rgba(zf, frame_dir + "sh0.webp", rgba_sh0)
-
-            # -----------------------------
-            # shN labels
-            # -----------------------------
-            if sh_bands > 0:
-                assert frame.rest is not None
-                if not use_sh_split_by_band:
-                    assert shn_km is not None
-                    rest_flat = frame.rest.reshape(splat_count, -1).astype(np.float32, copy=False)
-
-                    # sklearn 的 predict 会在 C 侧做距离计算,比 Python 循环更稳.
-                    labels = shn_km.predict(rest_flat).astype(np.uint16, copy=False)
-
-                    if shn_labels_encoding == "full":
-                        rgba_labels = _pack_u16_to_rgba(labels, splat_count, width, height)
-                        _save_webp_lossless_rgba(zf, frame_dir + "shN_labels.webp", rgba_labels)
-                    else:
-                        # delta-v1
-                        assert sh_delta_segments is not None
-                        seg = segs[seg_idx]
-
-                        # segment 边界: flush 上一个,开启下一个.
-                        if fi >= seg_end:
-                            flush_segment_v1(seg)
-                            seg_idx += 1
-                            start_segment_v1(segs[seg_idx])
-                            seg = segs[seg_idx]
-
-                        # segment 首帧: 写 base labels WebP,不写 update block.
-                        if prev_labels is None:
-                            rgba_labels = _pack_u16_to_rgba(labels, splat_count, width, height)
-                            _save_webp_lossless_rgba(zf, seg["baseLabelsPath"], rgba_labels)
-                            prev_labels = labels
-                        else:
-                            assert delta_bio is not None
-                            diff = labels != prev_labels
-                            splat_ids = np.nonzero(diff)[0].astype(np.uint32, copy=False)
-                            delta_bio.write(struct.pack("<I", int(splat_ids.shape[0])))
-                            for sid in splat_ids.tolist():
-                                lab = int(labels[int(sid)])
-                                delta_bio.write(struct.pack("<IHH", int(sid), int(lab), 0))
-                            prev_labels = labels
-                else:
-                    # v2: sh1/sh2/sh3 三套 labels.
-                    assert sh1_km is not None
-
-                    sh1_flat = frame.rest[:, 0:3, :].reshape(splat_count, -1).astype(np.float32, copy=False)
-                    labels1 = sh1_km.predict(sh1_flat).astype(np.uint16, copy=False)
+                label_streams.append(_LabelStream("sh1", 0, 3, sh1_count, sh1_delta_segments))
+                label_models.append(sh1_km)
+                if sh_bands >= 2:
+                    label_streams.append(_LabelStream("sh2", 3, 5, sh2_count, sh2_delta_segments))
+                    label_models.append(sh2_km)
+                if sh_bands >= 3:
+                    label_streams.append(_LabelStream("sh3", 8, 7, sh3_count, sh3_delta_segments))
+                    label_models.append(sh3_km)
+
+        # 可选: 每个 SH codebook 建一次 IVF 索引,逐帧 labels 走近似搜索.
+        label_indexes: list[Optional[_IvfCentroidIndex]] = [None] * len(label_models)
+        ann_indexes: dict[str, _IvfCentroidIndex] = {}
+        if args.sh_label_search == "ivf":
+            for i, (stream, model) in enumerate(zip(label_streams, label_models)):
+                with profiler.stage(f"ann_build:{stream.key}"):
+                    index = _IvfCentroidIndex(
+                        model.centroids, int(args.sh_ann_lists), int(args.sh_ann_nprobe), int(args.seed), kmeans_cfg
+                    )
+                _info(
+                    f"{stream.key}: ivf index (centroids={stream.count}, lists={index.lists}, "
+                    f"nprobe={index.nprobe}, largest list={index.largest_list})"
+                )
+                label_indexes[i] = index
+                ann_indexes[stream.key] = index
+
+        encoder = _FrameEncoder(
+            width=width,
+            height=height,
+            splat_count=splat_count,
+            pos_range_min=pos_range_min,
+            pos_range_max=pos_range_max,
+            opacity_mode=args.opacity_mode,
+            scale_mode=args.scale_mode,
+            scale_centers_log=scale_centers_log,
+            sh0_codebook=sh0_codebook,
+            sh0_method=sh0_method,
+            rest_fields=rest_fields if sh_bands > 0 else None,
+            label_streams=label_streams,
+            label_models=label_models,
+            labels_encoding=shn_labels_encoding,
+            webp_effort=args.webp_effort,
+            scratch=scratch,
+            decode_cache=decode_cache,
+            # --jobs N 时每个 worker 单线程分配,避免 N 个进程 x M 个线程的超订.
+            assign_threads=kmeans_cfg.thread_count if int(args.jobs) <= 1 else 1,
+            label_indexes=label_indexes,
+            ann_audit_count=int(args.sh_ann_audit),
+            label_reuse_tol=label_reuse_tol if label_streams else None,
+            label_reuse_interval=int(args.sh_label_reuse_interval),
+        )
 
-                    labels2 = None
-                    labels3 = None
-                    if sh_bands >= 2:
-                        assert sh2_km is not None
-                        sh2_flat = frame.rest[:, 3:8, :].reshape(splat_count, -1).astype(np.float32, copy=False)
-                        labels2 = sh2_km.predict(sh2_flat).astype(np.uint16, copy=False)
-                    if sh_bands >= 3:
-                        assert sh3_km is not None
-                        sh3_flat = frame.rest[:, 8:15, :].reshape(splat_count, -1).astype(np.float32, copy=False)
-                        labels3 = sh3_km.predict(sh3_flat).astype(np.uint16, copy=False)
-
-                    if shn_labels_encoding == "full":
-                        rgba1 = _pack_u16_to_rgba(labels1, splat_count, width, height)
-                        _save_webp_lossless_rgba(zf, frame_dir + "sh1_labels.webp", rgba1)
-
-                        if sh_bands >= 2:
-                            assert labels2 is not None
-                            rgba2 = _pack_u16_to_rgba(labels2, splat_count, width, height)
-                            _save_webp_lossless_rgba(zf, frame_dir + "sh2_labels.webp", rgba2)
-
-                        if sh_bands >= 3:
-                            assert labels3 is not None
-                            rgba3 = _pack_u16_to_rgba(labels3, splat_count, width, height)
-                            _save_webp_lossless_rgba(zf, frame_dir + "sh3_labels.webp", rgba3)
-                    else:
-                        # delta-v1: 三套 delta 同步推进(segments 边界一致).
-                        assert sh1_delta_segments is not None
-                        seg1 = segs1[seg_idx]
-
-                        if fi >= seg_end:
-                            flush_segment_v2()
-                            seg_idx += 1
-                            start_segment_v2()
-                            seg1 = segs1[seg_idx]
-
-                        # sh1
-                        if prev1 is None:
-                            rgba1 = _pack_u16_to_rgba(labels1, splat_count, width, height)
-                            _save_webp_lossless_rgba(zf, seg1["baseLabelsPath"], rgba1)
-                            prev1 = labels1
-                        else:
-                            assert delta_bio1 is not None
-                            diff = labels1 != prev1
-                            splat_ids = np.nonzero(diff)[0].astype(np.uint32, copy=False)
-                            delta_bio1.write(struct.pack("<I", int(splat_ids.shape[0])))
-                            for sid in splat_ids.tolist():
-                                lab = int(labels1[int(sid)])
-                                delta_bio1.write(struct.pack("<IHH", int(sid), int(lab), 0))
-                            prev1 = labels1
-
-                        if sh_bands >= 2:
-                            assert labels2 is not None
-                            seg2 = segs2[seg_idx]
-                            if prev2 is None:
-                                rgba2 = _pack_u16_to_rgba(labels2, splat_count, width, height)
-                                _save_webp_lossless_rgba(zf, seg2["baseLabelsPath"], rgba2)
-                                prev2 = labels2
-                            else:
-                                assert delta_bio2 is not None
-                                diff = labels2 != prev2
-                                splat_ids = np.nonzero(diff)[0].astype(np.uint32, copy=False)
-                                delta_bio2.write(struct.pack("<I", int(splat_ids.shape[0])))
-                                for sid in splat_ids.tolist():
-                                    lab = int(labels2[int(sid)])
-                                    delta_bio2.write(struct.pack("<IHH", int(sid), int(lab), 0))
-                                prev2 = labels2
-
-                        if sh_bands >= 3:
-                            assert labels3 is not None
-                            seg3 = segs3[seg_idx]
-                            if prev3 is None:
-                                rgba3 = _pack_u16_to_rgba(labels3, splat_count, width, height)
-                                _save_webp_lossless_rgba(zf, seg3["baseLabelsPath"], rgba3)
-                                prev3 = labels3
-                            else:
-                                assert delta_bio3 is not None
-                                diff = labels3 != prev3
-                                splat_ids = np.nonzero(diff)[0].astype(np.uint32, copy=False)
-                                delta_bio3.write(struct.pack("<I", int(splat_ids.shape[0])))
-                                for sid in splat_ids.tolist():
-                                    lab = int(labels3[int(sid)])
-                                    delta_bio3.write(struct.pack("<IHH", int(sid), int(lab), 0))
-                                prev3 = labels3
+        # delta-v1 的状态机: 每个 label stream 一个 writer,segments 边界一致.
+        delta_writers: list[_DeltaV1SegmentWriter] = []
+        if shn_labels_encoding == "delta-v1":
+            delta_writers = [_DeltaV1SegmentWriter(s, splat_count) for s in label_streams]
+
+        jobs = max(1, int(args.jobs))
+        if jobs > 1:
+            _info(f"pass2: encoding with {jobs} worker processes")
+
+        webp_totals: dict[str, list[float]] = {}
+        ann_totals: dict[str, list[float]] = {}
+        reuse_totals: dict[str, list[int]] = {}
+        chain_length = int(args.sh_label_reuse_interval) if encoder.label_reuse_tol is not None else 0
+        for encoded in _iter_encoded_frames(
+            encoder, ply_files, jobs, chain_length, prefetch_depth, prefetch_bytes
+        ):
+            fi = encoded.fi
+            for key, searched, total in encoded.label_reuse:
+                acc_reuse = reuse_totals.setdefault(key, [0, 0])
+                acc_reuse[0] += searched
+                acc_reuse[1] += total
+            for key, audited, differing, d_approx, d_exact in encoded.ann_audit:
+                acc = ann_totals.setdefault(key, [0, 0, 0.0, 0.0])
+                acc[0] += audited
+                acc[1] += differing
+                acc[2] += d_approx
+                acc[3] += d_exact
+            for stream, size, seconds in encoded.webp_stats:
+                acc = webp_totals.setdefault(stream, [0, 0, 0.0])
+                acc[0] += 1
+                acc[1] += size
+                acc[2] += seconds
+            for stage, wall, cpu in encoded.stage_times:
+                profiler.add(f"pass2:{stage}", wall, cpu, fi)
+
+            with profiler.stage("pass2:zip_write", fi):
+                for name, data in encoded.image_entries:
+                    _zip_writestr(zf, name, data)
+
+                # segment 边界: 先 flush 上一个 segment 的 delta,再写新 segment 的 base labels.
+                for writer in delta_writers:
+                    assert writer.stream.segments is not None
+                    next_idx = writer.seg_idx + 1
+                    if next_idx < len(writer.stream.segments) and int(writer.stream.segments[next_idx]["startFrame"]) == fi:
+                        if writer.seg_idx >= 0:
+                            writer.flush(zf)
+                        writer.start_next()
+
+                for name, data in encoded.label_entries:
+                    _zip_writestr(zf, name, data)
+
+                for writer, labels in zip(delta_writers, encoded.labels):
+                    assert labels is not None
+                    writer.add_frame(labels)
 
             if (fi & 0x7) == 0:
                 _info(f"pack: {fi+1}/{frame_count} frames")
 
         # delta 最后一个 segment flush
-        if sh_bands > 0 and shn_labels_encoding == "delta-v1":
-            if not use_sh_split_by_band:
-                assert seg_idx < len(segs)
-                flush_segment_v1(segs[seg_idx])
-            else:
-                assert seg_idx < len(segs1)
-                flush_segment_v2()
-
+        for writer in delta_writers:
+            writer.flush(zf)
+
+    _log_webp_effort_report(args.webp_effort, webp_totals)
+    _log_sh_ann_report(ann_indexes, ann_totals)
+    if decode_cache is not None:
+        # 只统计主进程: pass 1,以及 `--jobs 1` 时的 pass 2. worker 进程里的命中不计入.
+        _info(decode_cache.summary())
+    for key, (searched, total) in reuse_totals.items():
+        _info(
+            f"sh label reuse {key}: searched {searched}/{total} rows ({searched / max(1, total) * 100.0:.2f}%), "
+            f"tol={args.sh_label_reuse_tol}, interval={args.sh_label_reuse_interval}"
+        )
     _info("pack done.")
 
-    # 可选: 打包后自检(避免把明显坏包交给 Unity importer).
-    if args.self_check:
-        _validate_cmd(argparse.Namespace(input=str(output_path), verbose=False))
-
 
 def _read_zip_json(zf: zipfile.ZipFile, name: str) -> Any:
     try:
@@ -1572,16 +3626,16 @@ def _read_zip_webp_rgba(zf: zipfile.ZipFile, name: str) -> np.ndarray:
             arr = np.array(img, dtype=np.uint8)
             return arr
     except KeyError:
-        _die(f"bundle 缺少文件: {name}")
+        raise _ValidationError(f"bundle 缺少文件: {name}") from None
     except Exception as e:
-        _die(f"WebP 解码失败: {name}: {e}")
+        raise _ValidationError(f"WebP 解码失败: {name}: {e}") from None
 
 
 def _validate_u16_map_rg(
     rgba: np.ndarray, splat_count: int, width: int, height: int, max_exclusive: int, field: str
 ) -> None:
     if rgba.shape[0] != height or rgba.shape[1] != width or rgba.shape[2] != 4:
-        _die(f"{field}: 图像尺寸不匹配: got {rgba.shape}, expected ({height},{width},4)")
+        raise _ValidationError(f"{field}: 图像尺寸不匹配: got {rgba.shape}, expected ({height},{width},4)")
 
     flat = rgba.reshape(-1, 4)
     rg = flat[:splat_count, 0].astype(np.uint16) + (flat[:splat_count, 1].astype(np.uint16) << 8)
@@ -1589,7 +3643,251 @@ def _validate_u16_map_rg(
     if bad.size > 0:
         i = int(bad[0])
         v = int(rg[i])
-        _die(f"{field}: 发现越界值: splatId={i}, value={v}, maxExclusive={max_exclusive}")
+        raise _ValidationError(f"{field}: 发现越界值: splatId={i}, value={v}, maxExclusive={max_exclusive}")
+
+
+@dataclass(frozen=True)
+class _LabelsCheck:
+    # 一套 SH rest labels 的校验参数(v1: shN; v2: sh1/sh2/sh3).
+    tag: str
+    count: int
+    labels_path: Optional[str]  # full labels 的模板
+    segments: Optional[list[dict[str, Any]]]  # delta-v1
+
+
+@dataclass(frozen=True)
+class _BundleChecker:
+    """
+    `.sog4d` 中需要解码的部分(逐帧 WebP 与 delta-v1 segment)的校验器.
+
+    说明:
+    - meta.json / centroids / segments 连续性这类便宜的结构校验在 `_validate_cmd` 里串行完成.
+    - 剩下的工作拆成互相独立的 task: ("frame", f) 与 ("delta", stream, seg).
+      task 之间没有依赖,可以串行,也可以交给 `--jobs N` 的 worker 进程.
+    - 出错时抛 `_ValidationError`,由调用方按 task 顺序挑出第一个错误再 `_die`.
+    """
+
+    bundle: Path
+    splat_count: int
+    frame_count: int
+    width: int
+    height: int
+    position_hi_path: str
+    position_lo_path: str
+    scale_indices_path: str
+    scale_count: int
+    rotation_path: str
+    sh0_path: str
+    labels: list[_LabelsCheck]
+
+    def tasks(self, level: str = "full", sample_count: int = 0, seed: int = 0) -> list[tuple[Any, ...]]:
+        # 需要解码的 task 列表(顺序固定: 先逐帧,再逐 stream 的 segments).
+        # - full: 全部帧与全部 segments.
+        # - sample: 用 seed 抽 sample_count 帧,以及每个 stream 抽 sample_count 个 segments.
+        # - structure: 不解码.
+        if level == "structure":
+            return []
+
+        frames = list(range(self.frame_count))
+        segs_per_stream = [list(range(len(lc.segments or []))) for lc in self.labels]
+        if level == "sample":
+            rng = np.random.default_rng(seed)
+
+            def pick(items: list[int]) -> list[int]:
+                if len(items) <= sample_count:
+                    return items
+                return sorted(rng.choice(len(items), size=sample_count, replace=False).tolist())
+
+            frames = pick(frames)
+            segs_per_stream = [pick(segs) for segs in segs_per_stream]
+
+        out: list[tuple[Any, ...]] = [("frame", f) for f in frames]
+        for li, segs in enumerate(segs_per_stream):
+            out.extend(("delta", li, si) for si in segs)
+        return out
+
+    def check_structure(self, zf: zipfile.ZipFile) -> None:
+        # 不解码图像的结构校验: 所有 ZIP entry 是否存在,以及每个 delta-v1 header 是否与 meta 一致.
+        names = set(zf.namelist())
+
+        def require(name: str) -> None:
+            if name not in names:
+                raise _ValidationError(f"bundle 缺少文件: {name}")
+
+        templates = [
+            self.position_hi_path,
+            self.position_lo_path,
+            self.scale_indices_path,
+            self.rotation_path,
+            self.sh0_path,
+            *[lc.labels_path for lc in self.labels if lc.labels_path is not None],
+        ]
+        for f in range(self.frame_count):
+            for template in templates:
+                require(_resolve_frame_path(template, f))
+
+        for lc in self.labels:
+            for i, seg in enumerate(lc.segments or []):
+                require(seg["baseLabelsPath"])
+                require(seg["deltaPath"])
+                with zf.open(seg["deltaPath"]) as fp:
+                    head = fp.read(28)
+                _check_delta_v1_header(head, seg, self.splat_count, lc.count, lc.tag, i)
+
+    def run(self, zf: zipfile.ZipFile, task: tuple[Any, ...]) -> None:
+        if task[0] == "frame":
+            self.check_frame(zf, int(task[1]))
+        else:
+            self.check_delta_segment(zf, int(task[1]), int(task[2]))
+
+    def check_frame(self, zf: zipfile.ZipFile, f: int) -> None:
+        w = self.width
+        h = self.height
+        n = self.splat_count
+        _read_zip_webp_rgba(zf, _resolve_frame_path(self.position_hi_path, f))
+        _read_zip_webp_rgba(zf, _resolve_frame_path(self.position_lo_path, f))
+
+        rgba = _read_zip_webp_rgba(zf, _resolve_frame_path(self.scale_indices_path, f))
+        _validate_u16_map_rg(rgba, n, w, h, self.scale_count, f"scale_indices frame={f}")
+
+        _read_zip_webp_rgba(zf, _resolve_frame_path(self.rotation_path, f))
+        _read_zip_webp_rgba(zf, _resolve_frame_path(self.sh0_path, f))
+
+        for lc in self.labels:
+            if lc.labels_path is None:
+                continue
+            rgba = _read_zip_webp_rgba(zf, _resolve_frame_path(lc.labels_path, f))
+            _validate_u16_map_rg(rgba, n, w, h, lc.count, f"{lc.tag}_labels frame={f}")
+
+    def check_delta_segment(self, zf: zipfile.ZipFile, li: int, i: int) -> None:
+        lc = self.labels[li]
+        assert lc.segments is not None
+        seg = lc.segments[i]
+        tag = lc.tag
+        count = lc.count
+        splat_count = self.splat_count
+
+        base_rgba = _read_zip_webp_rgba(zf, seg["baseLabelsPath"])
+        _validate_u16_map_rg(base_rgba, splat_count, self.width, self.height, count, f"delta-v1 {tag} baseLabels seg={i}")
+
+        # 解析 base labels 作为 prev
+        flat = base_rgba.reshape(-1, 4)
+        prev = (flat[:splat_count, 0].astype(np.uint16) + (flat[:splat_count, 1].astype(np.uint16) << 8)).copy()
+
+        try:
+            delta = zf.read(seg["deltaPath"])
+        except KeyError:
+            raise _ValidationError(f"bundle 缺少文件: {seg['deltaPath']}") from None
+        seg_fc = _check_delta_v1_header(delta[0:28], seg, splat_count, count, tag, i)
+
+        # 每帧 update block 直接在 segment bytes 上做结构化视图(零拷贝),用数组运算完成校验.
+        off = 28
+        for local in range(1, int(seg_fc)):
+            if off + 4 > len(delta):
+                raise _ValidationError(f"delta-v1 truncated: {tag} seg={i} localFrame={local} missing updateCount")
+            (uc,) = struct.unpack_from("<I", delta, off)
+            off += 4
+            if uc > splat_count:
+                raise _ValidationError(
+                    f"delta-v1 invalid updateCount: {tag} seg={i} localFrame={local} updateCount={uc}"
+                )
+
+            avail = (len(delta) - off) // _DELTA_V1_UPDATE_DTYPE.itemsize
+            if avail < uc:
+                raise _ValidationError(f"delta-v1 truncated: {tag} seg={i} localFrame={local} update={avail}")
+            updates = np.frombuffer(delta, dtype=_DELTA_V1_UPDATE_DTYPE, count=int(uc), offset=off)
+            off += int(uc) * _DELTA_V1_UPDATE_DTYPE.itemsize
+
+            _check_delta_v1_updates(updates, splat_count, count, f"{tag} seg={i} localFrame={local}")
+            prev[updates["sid"]] = updates["label"]
+
+
+def _check_delta_v1_header(head: bytes, seg: dict[str, Any], splat_count: int, count: int, tag: str, i: int) -> int:
+    # 校验 delta-v1 segment 文件的 28 bytes header,返回 segmentFrameCount.
+    magic = head[0:8]
+    if magic != b"SOG4DLB1":
+        raise _ValidationError(f"delta-v1: magic 不匹配: {tag} seg={i} got={magic!r}")
+    if len(head) < 28:
+        raise _ValidationError(f"delta-v1: header 截断: {tag} seg={i}")
+    dv, seg_start, seg_fc, sc, shc = struct.unpack_from("<IIIII", head, 8)
+    if dv != 1:
+        raise _ValidationError(f"delta-v1: version 非法: {tag} seg={i} got={dv}")
+    if int(seg_start) != int(seg["startFrame"]):
+        raise _ValidationError(
+            f"delta-v1: segmentStartFrame mismatch: {tag} seg={i} meta={seg['startFrame']} file={seg_start}"
+        )
+    if int(seg_fc) != int(seg["frameCount"]):
+        raise _ValidationError(
+            f"delta-v1: segmentFrameCount mismatch: {tag} seg={i} meta={seg['frameCount']} file={seg_fc}"
+        )
+    if int(sc) != splat_count:
+        raise _ValidationError(f"delta-v1: splatCount mismatch: {tag} seg={i} meta={splat_count} file={sc}")
+    if int(shc) != count:
+        raise _ValidationError(f"delta-v1: {tag}Count mismatch: seg={i} meta={count} file={shc}")
+    return int(seg_fc)
+
+
+def _resolve_frame_path(template: str, frame: int) -> str:
+    if "{frame}" not in template:
+        raise _ValidationError(f"模板缺少 {{frame}}: {template}")
+    return template.replace("{frame}", f"{frame:05d}")
+
+
+_WORKER_BUNDLE_CHECKER: Optional[_BundleChecker] = None
+_WORKER_BUNDLE_ZIP: Optional[zipfile.ZipFile] = None
+
+
+def _init_bundle_check_worker(checker: _BundleChecker) -> None:
+    global _WORKER_BUNDLE_CHECKER, _WORKER_BUNDLE_ZIP
+    _WORKER_BUNDLE_CHECKER = checker
+    # 每个 worker 进程各自打开一次 ZIP,task 之间复用.
+    _WORKER_BUNDLE_ZIP = zipfile.ZipFile(checker.bundle, "r")
+    _limit_worker_threads()
+
+
+def _run_bundle_check_in_worker(task: tuple[Any, ...]) -> Optional[str]:
+    assert _WORKER_BUNDLE_CHECKER is not None
+    assert _WORKER_BUNDLE_ZIP is not None
+    try:
+        _WORKER_BUNDLE_CHECKER.run(_WORKER_BUNDLE_ZIP, task)
+    except _ValidationError as e:
+        return str(e)
+    return None
+
+
+def _iter_bundle_check_errors(
+    checker: _BundleChecker, zf: zipfile.ZipFile, tasks: list[tuple[Any, ...]], jobs: int
+) -> Iterator[Optional[str]]:
+    # 按 task 顺序产出每个 task 的错误信息(None=通过).
+    # - jobs<=1: 当前进程串行执行,复用已经打开的 zf.
+    # - jobs>1: 进程池并行执行,但始终按 task 顺序 yield,
+    #   所以调用方看到的“第一个错误”与串行完全一致.
+    if jobs <= 1:
+        for task in tasks:
+            try:
+                checker.run(zf, task)
+            except _ValidationError as e:
+                yield str(e)
+                continue
+            yield None
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_bundle_check_worker,
+        initargs=(checker,),
+    ) as executor:
+        pending: deque[Future[Optional[str]]] = deque()
+        next_idx = 0
+        try:
+            while next_idx < len(tasks) or pending:
+                while next_idx < len(tasks) and len(pending) < jobs * 2:
+                    pending.append(executor.submit(_run_bundle_check_in_worker, tasks[next_idx]))
+                    next_idx += 1
+                yield pending.popleft().result()
+        finally:
+            for fut in pending:
+                fut.cancel()
 
 
 def _validate_cmd(args: argparse.Namespace) -> None:
@@ -1627,51 +3925,21 @@ def _validate_cmd(args: argparse.Namespace) -> None:
             _die(f"layout 容量不足: {width}x{height} < splatCount={splat_count}")
 
         streams = meta.get("streams") or {}
-
-        def resolve(template: str, frame: int) -> str:
-            if "{frame}" not in template:
-                _die(f"模板缺少 {{frame}}: {template}")
-            return template.replace("{frame}", f"{frame:05d}")
-
-        # position
         pos = streams.get("position") or {}
-        for f in range(frame_count):
-            _read_zip_webp_rgba(zf, resolve(pos["hiPath"], f))
-            _read_zip_webp_rgba(zf, resolve(pos["loPath"], f))
-
-        # scale
         scale = streams.get("scale") or {}
+        rot = streams.get("rotation") or {}
+        sh = streams.get("sh") or {}
+
         scale_codebook = scale.get("codebook") or []
         if not scale_codebook:
             _die("streams.scale.codebook 为空")
-        for f in range(frame_count):
-            rgba = _read_zip_webp_rgba(zf, resolve(scale["indicesPath"], f))
-            _validate_u16_map_rg(rgba, splat_count, width, height, len(scale_codebook), f"scale_indices frame={f}")
 
-        # rotation
-        rot = streams.get("rotation") or {}
-        for f in range(frame_count):
-            _read_zip_webp_rgba(zf, resolve(rot["path"], f))
-
-        # sh
-        sh = streams.get("sh") or {}
         bands = int(sh.get("bands", 0))
         sh0_codebook = sh.get("sh0Codebook") or []
         if len(sh0_codebook) != 256:
             _die(f"streams.sh.sh0Codebook 长度必须为 256, got {len(sh0_codebook)}")
-        for f in range(frame_count):
-            _read_zip_webp_rgba(zf, resolve(sh["sh0Path"], f))
-
-        if bands == 0:
-            _info("validate ok (bands=0).")
-            return
-
-        def validate_full_labels(template: str, count: int, tag: str) -> None:
-            for f in range(frame_count):
-                rgba = _read_zip_webp_rgba(zf, resolve(template, f))
-                _validate_u16_map_rg(rgba, splat_count, width, height, count, f"{tag}_labels frame={f}")
 
-        def validate_delta_v1(segs: list[dict[str, Any]], count: int, tag: str) -> None:
+        def check_segments(segs: list[dict[str, Any]], tag: str) -> None:
             if not segs:
                 _die(f"delta-v1: {tag}.deltaSegments 为空")
 
@@ -1687,119 +3955,117 @@ def _validate_cmd(args: argparse.Namespace) -> None:
             if start != frame_count:
                 _die(f"delta-v1: {tag} segments 覆盖帧数不等于 frameCount: sum={start}, frameCount={frame_count}")
 
-            # delta 逐段验证(包含 header 与 block 的越界/递增)
-            for i, seg in enumerate(segs):
-                base_rgba = _read_zip_webp_rgba(zf, seg["baseLabelsPath"])
-                _validate_u16_map_rg(base_rgba, splat_count, width, height, count, f"delta-v1 {tag} baseLabels seg={i}")
-
-                # 解析 base labels 作为 prev
-                flat = base_rgba.reshape(-1, 4)
-                prev = (flat[:splat_count, 0].astype(np.uint16) + (flat[:splat_count, 1].astype(np.uint16) << 8)).copy()
-
-                delta = zf.read(seg["deltaPath"])
-                bio = io.BytesIO(delta)
-                magic = bio.read(8)
-                if magic != b"SOG4DLB1":
-                    _die(f"delta-v1: magic 不匹配: {tag} seg={i} got={magic!r}")
-                hdr = bio.read(20)
-                if len(hdr) != 20:
-                    _die(f"delta-v1: header 截断: {tag} seg={i}")
-                dv, seg_start, seg_fc, sc, shc = struct.unpack("<IIIII", hdr)
-                if dv != 1:
-                    _die(f"delta-v1: version 非法: {tag} seg={i} got={dv}")
-                if int(seg_start) != int(seg["startFrame"]):
-                    _die(f"delta-v1: segmentStartFrame mismatch: {tag} seg={i} meta={seg['startFrame']} file={seg_start}")
-                if int(seg_fc) != int(seg["frameCount"]):
-                    _die(f"delta-v1: segmentFrameCount mismatch: {tag} seg={i} meta={seg['frameCount']} file={seg_fc}")
-                if int(sc) != splat_count:
-                    _die(f"delta-v1: splatCount mismatch: {tag} seg={i} meta={splat_count} file={sc}")
-                if int(shc) != count:
-                    _die(f"delta-v1: {tag}Count mismatch: seg={i} meta={count} file={shc}")
-
-                for local in range(1, int(seg_fc)):
-                    raw = bio.read(4)
-                    if len(raw) != 4:
-                        _die(f"delta-v1 truncated: {tag} seg={i} localFrame={local} missing updateCount")
-                    (uc,) = struct.unpack("<I", raw)
-                    if uc > splat_count:
-                        _die(f"delta-v1 invalid updateCount: {tag} seg={i} localFrame={local} updateCount={uc}")
-
-                    prev_sid = -1
-                    for u in range(int(uc)):
-                        rec = bio.read(8)
-                        if len(rec) != 8:
-                            _die(f"delta-v1 truncated: {tag} seg={i} localFrame={local} update={u}")
-                        sid, lab, res = struct.unpack("<IHH", rec)
-                        if res != 0:
-                            _die(f"delta-v1 reserved!=0: {tag} seg={i} localFrame={local} update={u}")
-                        if sid >= splat_count:
-                            _die(f"delta-v1 splatId 越界: {tag} seg={i} localFrame={local} sid={sid}")
-                        if lab >= count:
-                            _die(f"delta-v1 label 越界: {tag} seg={i} localFrame={local} lab={lab}")
-                        if sid <= prev_sid:
-                            _die(f"delta-v1 splatId 非严格递增: {tag} seg={i} localFrame={local} sid={sid} prev={prev_sid}")
-                        prev_sid = int(sid)
-                        prev[int(sid)] = np.uint16(lab)
+        def check_labels(
+            tag: str,
+            count: int,
+            centroids_path: str,
+            expected_bytes: int,
+            enc_field: str,
+            enc: str,
+            labels_path: Any,
+            segs: Any,
+        ) -> _LabelsCheck:
+            centroids_bytes = zf.read(centroids_path)
+            if len(centroids_bytes) != expected_bytes:
+                _die(f"{tag}_centroids.bin 大小不匹配: expected {expected_bytes} got {len(centroids_bytes)}")
+            if enc == "full":
+                return _LabelsCheck(tag, count, str(labels_path), None)
+            if enc != "delta-v1":
+                _die(f"未知 {enc_field}: {enc}")
+            check_segments(segs or [], tag)
+            return _LabelsCheck(tag, count, None, list(segs))
 
         # -------------------------------------------------------------
         # v1/v2: SH rest schema 分歧点
         # -------------------------------------------------------------
-        if ver == 1:
+        labels: list[_LabelsCheck] = []
+        ok_message = "validate ok (bands=0)."
+        if bands > 0 and ver == 1:
             shn_count = int(sh.get("shNCount", 0))
             if not (1 <= shn_count <= 65535):
                 _die(f"shNCount 非法: {shn_count}")
 
-            centroids_bytes = zf.read(sh["shNCentroidsPath"])
             rest_coeff_count = (bands + 1) * (bands + 1) - 1
             scalar_bytes = 2 if sh["shNCentroidsType"] == "f16" else 4
-            expected = shn_count * rest_coeff_count * 3 * scalar_bytes
-            if len(centroids_bytes) != expected:
-                _die(f"shN_centroids.bin 大小不匹配: expected {expected} got {len(centroids_bytes)}")
-
             enc = sh.get("shNLabelsEncoding") or "full"
-            if enc == "full":
-                validate_full_labels(sh["shNLabelsPath"], shn_count, "shN")
-                _info("validate ok (v1 full labels).")
-                return
-            if enc != "delta-v1":
-                _die(f"未知 shNLabelsEncoding: {enc}")
-
-            segs = sh.get("shNDeltaSegments") or []
-            validate_delta_v1(segs, shn_count, "shN")
-            _info("validate ok (v1 delta-v1).")
-            return
-
-        # v2: sh1/sh2/sh3
-        def validate_band(band_key: str, coeff_count: int) -> None:
-            band = sh.get(band_key) or {}
-            if not band:
-                _die(f"streams.sh.{band_key} 缺失")
-
-            count = int(band.get("count", 0))
-            if not (1 <= count <= 65535):
-                _die(f"{band_key}.count 非法: {count}")
-
-            centroids_bytes = zf.read(band["centroidsPath"])
-            scalar_bytes = 2 if band.get("centroidsType") == "f16" else 4
-            expected = count * coeff_count * 3 * scalar_bytes
-            if len(centroids_bytes) != expected:
-                _die(f"{band_key}_centroids.bin 大小不匹配: expected {expected} got {len(centroids_bytes)}")
+            labels.append(
+                check_labels(
+                    "shN",
+                    shn_count,
+                    sh["shNCentroidsPath"],
+                    shn_count * rest_coeff_count * 3 * scalar_bytes,
+                    "shNLabelsEncoding",
+                    enc,
+                    sh.get("shNLabelsPath"),
+                    sh.get("shNDeltaSegments"),
+                )
+            )
+            ok_message = "validate ok (v1 full labels)." if enc == "full" else "validate ok (v1 delta-v1)."
+        elif bands > 0:
+            # v2: sh1/sh2/sh3
+            for band_key, coeff_count in (("sh1", 3), ("sh2", 5), ("sh3", 7))[:bands]:
+                band = sh.get(band_key) or {}
+                if not band:
+                    _die(f"streams.sh.{band_key} 缺失")
+
+                count = int(band.get("count", 0))
+                if not (1 <= count <= 65535):
+                    _die(f"{band_key}.count 非法: {count}")
+
+                scalar_bytes = 2 if band.get("centroidsType") == "f16" else 4
+                labels.append(
+                    check_labels(
+                        band_key,
+                        count,
+                        band["centroidsPath"],
+                        count * coeff_count * 3 * scalar_bytes,
+                        f"{band_key}.labelsEncoding",
+                        band.get("labelsEncoding") or "full",
+                        band.get("labelsPath"),
+                        band.get("deltaSegments"),
+                    )
+                )
+            ok_message = "validate ok (v2)."
 
-            enc = band.get("labelsEncoding") or "full"
-            if enc == "full":
-                validate_full_labels(band["labelsPath"], count, band_key)
-                return
-            if enc != "delta-v1":
-                _die(f"未知 {band_key}.labelsEncoding: {enc}")
-            segs = band.get("deltaSegments") or []
-            validate_delta_v1(segs, count, band_key)
+        # -------------------------------------------------------------
+        # 逐帧 WebP + delta-v1 segment(可并行)
+        # -------------------------------------------------------------
+        checker = _BundleChecker(
+            bundle=bundle,
+            splat_count=splat_count,
+            frame_count=frame_count,
+            width=width,
+            height=height,
+            position_hi_path=pos["hiPath"],
+            position_lo_path=pos["loPath"],
+            scale_indices_path=scale["indicesPath"],
+            scale_count=len(scale_codebook),
+            rotation_path=rot["path"],
+            sh0_path=sh["sh0Path"],
+            labels=labels,
+        )
 
-        validate_band("sh1", 3)
-        if bands >= 2:
-            validate_band("sh2", 5)
-        if bands >= 3:
-            validate_band("sh3", 7)
-        _info("validate ok (v2).")
+        level = args.level
+        try:
+            checker.check_structure(zf)
+        except _ValidationError as e:
+            _die(str(e))
+
+        jobs = max(1, int(args.jobs))
+        tasks = checker.tasks(level, int(args.sample_count), int(args.seed))
+        for err in _iter_bundle_check_errors(checker, zf, tasks, jobs):
+            if err is not None:
+                _die(err)
+
+        if level != "full":
+            decoded_frames = sum(1 for t in tasks if t[0] == "frame")
+            decoded_segs = len(tasks) - decoded_frames
+            total_segs = sum(len(lc.segments or []) for lc in labels)
+            _info(
+                f"validate level={level}: decoded frames {decoded_frames}/{frame_count}, "
+                f"delta segments {decoded_segs}/{total_segs}"
+            )
+        _info(ok_message)
 
 
 def _is_vec3_list(v: Any) -> bool:
@@ -1951,7 +4217,170 @@ def _normalize_meta_cmd(args: argparse.Namespace) -> None:
     _info(f"updated: {target_path}")
 
     if bool(getattr(args, "validate", False)):
-        _validate_cmd(argparse.Namespace(input=str(target_path), verbose=False))
+        _validate_cmd(argparse.Namespace(input=str(target_path), verbose=False, jobs=1, level="full", sample_count=0, seed=0))
+
+
+# -----------------------------------------------------------------------------
+# train-codebooks: 跨多个序列拟合一份可复用的 codebook 库
+# -----------------------------------------------------------------------------
+
+_CODEBOOK_LIBRARY_FORMAT = "sog4d-codebooks"
+
+
+def _train_codebooks_cmd(args: argparse.Namespace) -> None:
+    """
+    在多个序列上采样,拟合一份共享的 scale / sh0 / SH codebook,写成 `pack --reuse-codebooks` 可读的文件.
+
+    说明:
+    - 文件是一个 ZIP: meta.json 与 `.sog4d` 的 scale/sh 部分同构(format=sog4d-codebooks),外加 centroids .bin.
+    - 不同序列的 splat 数可以不同; SH rest 布局(f_rest_* 数量)必须一致.
+    - 采样用每个 stream 一个固定容量的加权样本池,内存只与 --*-sample-count 有关,与输入总量无关.
+    """
+    if int(args.frame_stride) <= 0:
+        _die("--frame-stride 必须 >0")
+    input_dirs = [Path(d) for d in args.input_dir]
+    sequences: list[list[Path]] = []
+    for d in input_dirs:
+        if not d.is_dir():
+            _die(f"input-dir 不是目录: {d}")
+        files = _list_ply_files(d)[:: max(1, int(args.frame_stride))]
+        if not files:
+            _die(f"input-dir 下未找到 .ply: {d}")
+        sequences.append(files)
+    total_frames = sum(len(files) for files in sequences)
+    _info(f"train-codebooks: {len(sequences)} inputs, {total_frames} frames (stride={args.frame_stride})")
+
+    try:
+        header0 = _read_ply_header(sequences[0][0])
+    except ValueError as e:
+        _die(f"{e}. file={sequences[0][0]}")
+    rest_fields = _find_rest_field_names([name for name, _ in header0.vertex_props])
+    if len(rest_fields) % 3 != 0:
+        _die(f"f_rest_* 字段数量必须是 3 的倍数,got {len(rest_fields)}")
+    detected_bands = int(round(math.sqrt(len(rest_fields) // 3 + 1) - 1))
+    if (detected_bands + 1) * (detected_bands + 1) - 1 != len(rest_fields) // 3 or detected_bands > 3:
+        _die(f"无法从 restCoeffCount={len(rest_fields) // 3} 推导 SH bands(只支持 0..3).")
+    sh_bands = detected_bands if args.sh_bands is None else int(args.sh_bands)
+    if sh_bands not in (0, detected_bands):
+        # 与 pack 一致: 只能用 PLY 自带的 bands,或者强制 0 忽略高阶 SH.
+        _die(f"--sh-bands 只能是 0 或 {detected_bands}, got {sh_bands}")
+    rest_coeff_count = (sh_bands + 1) * (sh_bands + 1) - 1
+    rest_fields = rest_fields if sh_bands > 0 else []
+    split = bool(args.sh_split_by_band) and sh_bands > 0
+
+    kmeans_cfg = _KMeansConfig(
+        algorithm=args.kmeans_algorithm,
+        max_iter=int(args.kmeans_max_iter),
+        tol=float(args.kmeans_tol),
+        threads=int(args.kmeans_threads),
+    )
+    decode_cache = _open_decode_cache(args)
+    profiler = _StageProfiler()
+    rng = np.random.default_rng(int(args.seed))
+    sh0_needs_sampling = args.sh0_codebook_method != "base-rgb"
+    sh0_pool = _WeightedReservoir(max(1, int(args.sh0_sample_count) // 3), rng) if sh0_needs_sampling else None
+    scale_pool = _WeightedReservoir(int(args.scale_sample_count), rng)
+    rest_pool = _WeightedReservoir(int(args.shn_sample_count), rng) if sh_bands > 0 else None
+
+    done = 0
+    for files in sequences:
+        for ply in files:
+            with profiler.stage("ply_read"):
+                header = _read_ply_header(ply)
+                names = [name for name, _ in header.vertex_props]
+                if sh_bands > 0 and _find_rest_field_names(names) != rest_fields:
+                    _die(f"SH rest 布局与第一个输入不一致: {ply}")
+                if decode_cache is not None:
+                    frame = _read_ply_frame(ply, rest_fields if sh_bands > 0 else None, decode_cache)
+                else:
+                    frame = _read_ply_projected(ply, rest_fields if sh_bands > 0 else None)
+            with profiler.stage("sampling"):
+                opacity, scale_lin, importance = _sampling_weights(frame, args.opacity_mode, args.scale_mode)
+                if sh0_pool is not None:
+                    sh0_pool.offer(importance, lambda idx: frame.f_dc[idx])
+                scale_pool.offer(opacity, lambda idx: np.log(np.maximum(scale_lin[idx], 1e-8)))
+                if rest_pool is not None:
+                    rest_pool.offer(importance, lambda idx: frame.rest_rows(idx).reshape(idx.shape[0], -1))
+            done += 1
+            if (done & 0x1F) == 1:
+                _info(f"train-codebooks: {done}/{total_frames} frames")
+
+    with profiler.stage("sh0_codebook"):
+        if sh0_pool is not None:
+            vals, w = sh0_pool.result()
+            sh0_codebook = _build_sh0_codebook(
+                vals.reshape(-1), w.repeat(3), args.sh0_codebook_method, int(args.seed), kmeans_cfg
+            )
+        else:
+            sh0_codebook = _build_sh0_codebook(
+                np.empty((0,), np.float32), np.empty((0,), np.float32), "base-rgb", int(args.seed), kmeans_cfg
+            )
+
+    scale_vals, scale_w = scale_pool.result()
+    if scale_vals.shape[0] == 0:
+        _die("scale codebook: 采样结果为空")
+    fit_jobs = [_CodebookFitJob("scaleCodebook(log)", scale_vals, scale_w, int(args.scale_codebook_size), 200_000)]
+    if rest_pool is not None:
+        rest_vals, rest_w = rest_pool.result()
+        if rest_vals.shape[0] == 0:
+            _die("SH rest: 采样结果为空")
+        if not split:
+            fit_jobs.append(_CodebookFitJob("shN_centroids", rest_vals, rest_w, int(args.shn_count), 200_000))
+        else:
+            rest_sel = rest_vals.reshape(rest_vals.shape[0], rest_coeff_count, 3)
+            for band, (c0, c1), count in (
+                (1, (0, 3), args.sh1_count),
+                (2, (3, 8), args.sh2_count),
+                (3, (8, 15), args.sh3_count),
+            )[:sh_bands]:
+                k = int(count) if count is not None else int(args.shn_count)
+                feat = np.ascontiguousarray(rest_sel[:, c0:c1, :].reshape(rest_vals.shape[0], -1))
+                fit_jobs.append(_CodebookFitJob(f"sh{band}_centroids", feat, rest_w, k, 200_000))
+
+    fitted = _fit_codebooks(fit_jobs, int(args.seed), kmeans_cfg, int(args.codebook_jobs), profiler)
+
+    scale_codebook = np.exp(fitted["scaleCodebook(log)"].centroids).astype(np.float32)
+    ctype = args.shn_centroids_type
+    scalar = "<f2" if ctype == "f16" else "<f4"
+    entries: list[tuple[str, bytes]] = []
+    meta_sh: dict[str, Any] = {"bands": int(sh_bands), "sh0Codebook": [float(x) for x in sh0_codebook.tolist()]}
+    if sh_bands > 0 and not split:
+        c = fitted["shN_centroids"].centroids
+        meta_sh.update({"shNCount": int(c.shape[0]), "shNCentroidsType": ctype, "shNCentroidsPath": "shN_centroids.bin"})
+        entries.append(("shN_centroids.bin", c.astype(scalar).tobytes(order="C")))
+    elif sh_bands > 0:
+        for band in range(1, sh_bands + 1):
+            key = f"sh{band}"
+            c = fitted[f"{key}_centroids"].centroids
+            meta_sh[key] = {"count": int(c.shape[0]), "centroidsType": ctype, "centroidsPath": f"{key}_centroids.bin"}
+            entries.append((f"{key}_centroids.bin", c.astype(scalar).tobytes(order="C")))
+
+    meta: dict[str, Any] = {
+        "format": _CODEBOOK_LIBRARY_FORMAT,
+        "version": 2 if split else 1,
+        "training": {
+            "inputs": [str(d) for d in input_dirs],
+            "frames": int(total_frames),
+            "seed": int(args.seed),
+            "opacityMode": args.opacity_mode,
+            "scaleMode": args.scale_mode,
+        },
+        "streams": {
+            "scale": {"codebook": [{"x": float(x), "y": float(y), "z": float(z)} for x, y, z in scale_codebook.tolist()]},
+            "sh": meta_sh,
+        },
+    }
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        _zip_writestr(zf, "meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
+        for name, data in entries:
+            _zip_writestr(zf, name, data)
+    if decode_cache is not None:
+        _info(decode_cache.summary())
+    _info(f"train-codebooks done: {output_path}")
+    if args.profile_json:
+        profiler.write_json(Path(args.profile_json), {"tool": "ply_sequence_to_sog4d", "command": "train-codebooks"})
 
 
 def _build_arg_parser() -> argparse.ArgumentParser:
@@ -1963,12 +4392,85 @@ def _build_arg_parser() -> argparse.ArgumentParser:
     input_group = pack.add_mutually_exclusive_group(required=True)
     input_group.add_argument("--input-ply", help="单个 `.ply` 文件(单帧正式入口)")
     input_group.add_argument("--input-dir", help="包含一个或多个 `.ply` 的目录(序列入口,目录里只有 1 帧也支持)")
+    input_group.add_argument(
+        "--input-archive",
+        help="包含一个或多个 `.ply` 的 zip 或未压缩 tar(序列入口,成员按 --input-dir 同样的规则排序,不解压到磁盘)",
+    )
     pack.add_argument("--output", required=True, help="输出 .sog4d 路径")
     pack.add_argument("--time-mapping", default="uniform", choices=["uniform", "explicit"], help="uniform 或 explicit")
     pack.add_argument("--frame-times", default=None, help="explicit 模式下的 frameTimesNormalized(逗号或文件路径)")
     pack.add_argument("--layout-width", type=int, default=None, help="layout.width(默认自动)")
     pack.add_argument("--layout-height", type=int, default=None, help="layout.height(默认自动)")
     pack.add_argument("--seed", type=int, default=0, help="随机种子(影响采样与 k-means)")
+    pack.add_argument(
+        "--weighted-sampler",
+        default="numpy",
+        choices=list(_WEIGHTED_SAMPLERS),
+        help="按权重不放回采样的实现: numpy(默认,与旧版本输出一致) 或 a-es(指数 key,O(n),大帧明显更快). 两者都受 --seed 控制",
+    )
+    pack.add_argument(
+        "--codebook-sampling",
+        default="per-frame",
+        choices=["per-frame", "reservoir"],
+        help="codebook 拟合样本的预算分配: per-frame(默认,每帧平均分配) 或 reservoir(每个 stream 一个固定容量的跨帧加权样本池)",
+    )
+
+    # k-means(内置引擎)
+    pack.add_argument(
+        "--kmeans-algorithm",
+        default="minibatch",
+        choices=list(_KMEANS_ALGORITHMS),
+        help="codebook/palette 拟合算法: minibatch(默认,快) 或 lloyd(全量迭代,误差更小但更慢)",
+    )
+    pack.add_argument("--kmeans-max-iter", type=int, default=100, help="k-means 迭代预算(lloyd: 迭代次数, minibatch: epoch 数)")
+    pack.add_argument("--kmeans-tol", type=float, default=1e-4, help="k-means 收敛阈值(相对数据方差的中心平方位移)")
+    pack.add_argument("--kmeans-threads", type=int, default=0, help="k-means 与逐帧 labels 分配的线程数(0=CPU 核数). 结果与线程数无关")
+    pack.add_argument(
+        "--reuse-codebooks",
+        type=Path,
+        default=None,
+        help="从已有 .sog4d 或 train-codebooks 生成的 codebook 库读回 scale codebook / sh0Codebook / SH centroids(SH 布局必须与本次打包一致)",
+    )
+    pack.add_argument(
+        "--reuse-codebooks-mode",
+        default="direct",
+        choices=["direct", "init"],
+        help="--reuse-codebooks 的用法: direct(默认,直接使用,跳过 k-means) 或 init(作为 k-means 初始中心再迭代)",
+    )
+    pack.add_argument(
+        "--codebook-jobs",
+        type=int,
+        default=1,
+        help="并行拟合 scale/shN(或 sh1/sh2/sh3) codebook 的进程数(默认 1=串行). 每个 codebook 的随机种子固定,结果与进程数无关",
+    )
+
+    # SH labels 近似搜索(大 palette 时逐帧 predict 的主要开销)
+    pack.add_argument(
+        "--sh-label-search",
+        default="exact",
+        choices=["exact", "ivf"],
+        help="逐帧 SH labels 的最近中心搜索: exact(默认,精确) 或 ivf(倒排表近似搜索,大 palette 更快)",
+    )
+    pack.add_argument("--sh-ann-lists", type=int, default=0, help="ivf 倒排表数量(0=自动,约 sqrt(centroids))")
+    pack.add_argument("--sh-ann-nprobe", type=int, default=8, help="ivf 每行查询的倒排表数量: 精度旋钮,越大越接近精确搜索")
+    pack.add_argument(
+        "--sh-ann-audit",
+        type=int,
+        default=4096,
+        help="ivf 时每帧每个 stream 抽查多少行与精确搜索比较,结束时报告 labels 不同的比例(0=不抽查)",
+    )
+    pack.add_argument(
+        "--sh-label-reuse-tol",
+        type=float,
+        default=None,
+        help="逐帧 labels 复用: 只对 SH rest 变化超过该阈值(逐分量最大绝对差)的 splat 重新分配,其余沿用上一帧. 不设置时每帧全量分配; 0 表示只复用完全相同的行(结果不变)",
+    )
+    pack.add_argument(
+        "--sh-label-reuse-interval",
+        type=int,
+        default=16,
+        help="labels 复用时每隔多少帧全量分配一次(reuse chain 长度). --jobs N 时每个 chain 交给一个 worker",
+    )
 
     # opacity/scale 解码
     pack.add_argument("--opacity-mode", default="auto", choices=["auto", "linear", "sigmoid"], help="opacity 解码方式")
@@ -2013,10 +4515,105 @@ def _build_arg_parser() -> argparse.ArgumentParser:
     pack.add_argument("--zip-compression", default="stored", choices=["stored", "deflated"], help="ZIP 压缩方式")
     pack.add_argument("--self-check", action="store_true", help="打包后自动执行 validate")
 
+    # I/O
+    pack.add_argument(
+        "--single-read",
+        action="store_true",
+        help="每个 PLY 只解析一次: pass1 把量化后的逐帧属性写入 scratch,pass2 直接读 scratch(需要额外磁盘空间)",
+    )
+    pack.add_argument("--scratch-dir", default=None, help="single-read 的 scratch 父目录(默认系统临时目录)")
+    pack.add_argument(
+        "--prefetch-frames",
+        type=int,
+        default=0,
+        help="后台线程预读 PLY 的帧数(0=关闭). 作用于 pass 1 与 --jobs 1 的 pass 2,读盘与计算重叠",
+    )
+    pack.add_argument("--prefetch-max-mb", type=float, default=2048.0, help="预读队列里已解码数组的内存上限(MiB)")
+    pack.add_argument(
+        "--decode-cache-dir",
+        default=None,
+        help="跨运行的逐帧解码缓存目录: 按 size/mtime/内容 hash 存每帧解码后的数组,重复打包同一序列时直接 memmap 读回",
+    )
+    pack.add_argument("--decode-cache-max-gb", type=float, default=20.0, help="解码缓存的大小上限(GiB),超出按 LRU 淘汰")
+
+    # WebP
+    pack.add_argument(
+        "--webp-effort",
+        default="max",
+        choices=sorted(_WEBP_EFFORT_PROFILES),
+        help="WebP lossless 压缩力度: fast(预览/CI)/balanced/max(默认,发布用). 只影响体积与耗时,解码数据一致",
+    )
+
+    # 并行
+    pack.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="pass2 逐帧编码(以及 --self-check)的 worker 进程数(默认 1=串行). 输出与串行字节级一致",
+    )
+
+    # 诊断
+    pack.add_argument(
+        "--profile-json",
+        default=None,
+        help="把各阶段 wall/CPU 耗时,峰值 RSS 与逐帧耗时直方图写到该 JSON 文件",
+    )
+
+    # train-codebooks
+    train = sub.add_parser(
+        "train-codebooks", help="在多个序列上拟合一份共享 codebook 库,供 pack --reuse-codebooks 直接使用"
+    )
+    train.add_argument("--input-dir", action="append", required=True, help="输入序列目录,可重复给多个")
+    train.add_argument("--output", required=True, help="输出 codebook 库路径(ZIP,建议后缀 .sog4dcb)")
+    train.add_argument("--frame-stride", type=int, default=1, help="每个序列每隔多少帧取一帧参与采样(默认 1=全部)")
+    train.add_argument("--seed", type=int, default=0, help="随机种子(影响采样与 k-means)")
+    train.add_argument("--opacity-mode", default="auto", choices=["auto", "linear", "sigmoid"], help="opacity 解码方式(需与 pack 一致)")
+    train.add_argument("--scale-mode", default="exp", choices=["auto", "linear", "exp"], help="scale 解码方式(需与 pack 一致)")
+    train.add_argument("--scale-codebook-size", type=int, default=4096, help="scale codebook 大小")
+    train.add_argument("--scale-sample-count", type=int, default=200_000, help="scale 拟合采样量(所有输入合计)")
+    train.add_argument(
+        "--sh0-codebook-method",
+        default="base-rgb",
+        choices=["base-rgb", "quantile", "kmeans"],
+        help="sh0Codebook 生成方法",
+    )
+    train.add_argument("--sh0-sample-count", type=int, default=1_000_000, help="sh0 拟合采样量(标量总量)")
+    train.add_argument("--sh-bands", type=int, default=None, help="SH bands(默认按第一个输入的 f_rest_* 推导)")
+    train.add_argument("--sh-split-by-band", action="store_true", help="按 band 拟合 sh1/sh2/sh3(供 pack --sh-split-by-band 使用)")
+    train.add_argument("--shN-count", dest="shn_count", type=int, default=8192, help="shN palette entry 数")
+    train.add_argument("--sh1-count", type=int, default=None, help="sh1 palette entry 数(默认继承 --shN-count)")
+    train.add_argument("--sh2-count", type=int, default=None, help="sh2 palette entry 数(默认继承 --shN-count)")
+    train.add_argument("--sh3-count", type=int, default=None, help="sh3 palette entry 数(默认继承 --shN-count)")
+    train.add_argument("--shN-centroids-type", dest="shn_centroids_type", default="f32", choices=["f16", "f32"], help="centroids.bin 标量类型")
+    train.add_argument("--shN-sample-count", dest="shn_sample_count", type=int, default=200_000, help="SH rest 拟合采样量(所有输入合计)")
+    train.add_argument("--kmeans-algorithm", default="minibatch", choices=list(_KMEANS_ALGORITHMS), help="codebook 拟合算法")
+    train.add_argument("--kmeans-max-iter", type=int, default=100, help="k-means 迭代预算")
+    train.add_argument("--kmeans-tol", type=float, default=1e-4, help="k-means 收敛阈值")
+    train.add_argument("--kmeans-threads", type=int, default=0, help="k-means 线程数(0=CPU 核数)")
+    train.add_argument("--codebook-jobs", type=int, default=1, help="并行拟合 codebook 的进程数")
+    train.add_argument("--decode-cache-dir", default=None, help="逐帧解码缓存目录(与 pack 的同名参数共用)")
+    train.add_argument("--decode-cache-max-gb", type=float, default=20.0, help="解码缓存的大小上限(GiB),超出按 LRU 淘汰")
+    train.add_argument("--profile-json", default=None, help="把各阶段耗时写到该 JSON 文件")
+
     # validate
     val = sub.add_parser("validate", help="自检 .sog4d bundle(越界/缺文件/尺寸等)")
     val.add_argument("--input", required=True, help="输入 .sog4d")
     val.add_argument("--verbose", action="store_true", help="输出更多信息(预留)")
+    val.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="并行解码/校验的 worker 进程数(默认 1=串行). 出错时总是报告按帧序的第一个错误",
+    )
+    val.add_argument(
+        "--level",
+        default="full",
+        choices=["structure", "sample", "full"],
+        help="校验深度: structure=只查 meta/ZIP entry/centroids/delta header,不解码图像; "
+        "sample=再按 seed 抽样解码部分帧与 segments; full=全部解码(默认)",
+    )
+    val.add_argument("--sample-count", type=int, default=8, help="sample: 抽样的帧数,以及每个 stream 抽样的 segment 数")
+    val.add_argument("--seed", type=int, default=0, help="sample: 抽样随机种子")
 
     # normalize-meta
     norm = sub.add_parser("normalize-meta", help="规范化/修复 .sog4d 的 meta.json(补 format + 修 Vector3 JSON)")
@@ -2031,6 +4628,8 @@ def main(argv: list[str]) -> None:
     args = _build_arg_parser().parse_args(argv)
     if args.cmd == "pack":
         _pack_cmd(args)
+    elif args.cmd == "train-codebooks":
+        _train_codebooks_cmd(args)
     elif args.cmd == "validate":
         _validate_cmd(args)
     elif args.cmd == "normalize-meta":
@@ -1,14 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import gzip
+import io
 import json
+import re
 import subprocess
 import sys
+import tarfile
 import tempfile
 import unittest
 import zipfile
 from pathlib import Path
 
+import numpy as np
+from PIL import Image
+
+try:
+    # `.ply.zst` 输入的测试需要 zstandard,缺失时跳过.
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
 
 SCRIPT_PATH = Path(__file__).resolve().parents[1] / "ply_sequence_to_sog4d.py"
 
@@ -38,6 +51,67 @@ end_header
 """
 
 
+def _write_binary_sequence(
+    out_dir: Path,
+    *,
+    frame_count: int,
+    splat_count: int,
+    sh_bands: int,
+    seed: int = 0,
+) -> list[Path]:
+    # 生成一个小的 binary_little_endian 序列.
+    # - 每帧只让一部分 splat 移动/改 SH,贴近真实序列"大部分不变"的分布.
+    # - 数值范围对齐 gaussian-splatting 常见导出(opacity=logit, scale=log).
+    rng = np.random.default_rng(seed)
+    rest_count = ((sh_bands + 1) * (sh_bands + 1) - 1) * 3 if sh_bands > 0 else 0
+    names = [
+        "x", "y", "z",
+        "f_dc_0", "f_dc_1", "f_dc_2",
+        "opacity",
+        "scale_0", "scale_1", "scale_2",
+        "rot_0", "rot_1", "rot_2", "rot_3",
+        *[f"f_rest_{i}" for i in range(rest_count)],
+    ]
+    dtype = np.dtype([(n, "<f4") for n in names])
+
+    base = np.empty(splat_count, dtype=dtype)
+    for n in names:
+        base[n] = rng.normal(0.0, 1.0, splat_count).astype(np.float32)
+    for n in ("scale_0", "scale_1", "scale_2"):
+        base[n] = rng.uniform(-5.0, -1.0, splat_count).astype(np.float32)
+
+    header = "\n".join(
+        [
+            "ply",
+            "format binary_little_endian 1.0",
+            f"element vertex {splat_count}",
+            *[f"property float {n}" for n in names],
+            "end_header",
+            "",
+        ]
+    ).encode("ascii")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = []
+    cur = base.copy()
+    for fi in range(frame_count):
+        if fi > 0:
+            moved = rng.random(splat_count) < 0.25
+            for n in ("x", "y", "z"):
+                cur[n][moved] += rng.normal(0.0, 0.05, int(moved.sum())).astype(np.float32)
+            for i in range(rest_count):
+                cur[f"f_rest_{i}"][moved] += rng.normal(0.0, 0.2, int(moved.sum())).astype(np.float32)
+        path = out_dir / f"time_{fi:05d}.ply"
+        path.write_bytes(header + cur.tobytes())
+        paths.append(path)
+    return paths
+
+
+def _read_bundle_entries(path: Path) -> dict[str, bytes]:
+    with zipfile.ZipFile(path, "r") as archive:
+        return {info.filename: archive.read(info.filename) for info in archive.infolist()}
+
+
 class SingleFrameCliTests(unittest.TestCase):
     maxDiff = None
 
@@ -129,5 +203,795 @@ class SingleFrameCliTests(unittest.TestCase):
             self.assertIn("validate ok (bands=0).", validate.stderr)
 
 
+class SequencePackCliTests(unittest.TestCase):
+    maxDiff = None
+
+    def run_cmd(self, *args: str) -> subprocess.CompletedProcess[str]:
+        return subprocess.run(
+            [sys.executable, str(SCRIPT_PATH), *args],
+            text=True,
+            capture_output=True,
+            timeout=300,
+            check=False,
+        )
+
+    def pack_sequence(self, input_dir: Path, out_path: Path, *extra: str) -> subprocess.CompletedProcess[str]:
+        result = self.run_cmd(
+            "pack",
+            "--input-dir",
+            str(input_dir),
+            "--output",
+            str(out_path),
+            "--scale-codebook-size",
+            "16",
+            "--shN-count",
+            "16",
+            "--delta-segment-length",
+            "2",
+            *extra,
+        )
+        self.assertEqual(
+            result.returncode,
+            0,
+            msg=f"序列打包失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+        )
+        return result
+
+    def test_single_read_matches_two_pass_bundle(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_single_read_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=64, sh_bands=1)
+
+            baseline = tmp_dir / "baseline.sog4d"
+            single_read = tmp_dir / "single_read.sog4d"
+            scratch_dir = tmp_dir / "scratch"
+            self.pack_sequence(input_dir, baseline)
+            result = self.pack_sequence(
+                input_dir, single_read, "--single-read", "--scratch-dir", str(scratch_dir), "--self-check"
+            )
+
+            self.assertIn("validate ok (v1 delta-v1).", result.stderr)
+            self.assertEqual(_read_bundle_entries(baseline), _read_bundle_entries(single_read))
+            self.assertEqual([], list(scratch_dir.iterdir()), "scratch 目录在打包结束后应被清理")
+
+    def test_parallel_jobs_bundle_is_byte_identical_to_serial(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_jobs_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=5, splat_count=64, sh_bands=3)
+
+            for label, extra in (("v1", ()), ("v2", ("--sh-split-by-band",))):
+                serial = tmp_dir / f"serial_{label}.sog4d"
+                parallel = tmp_dir / f"parallel_{label}.sog4d"
+                self.pack_sequence(input_dir, serial, *extra)
+                result = self.pack_sequence(input_dir, parallel, *extra, "--jobs", "2", "--self-check")
+
+                self.assertIn("validate ok", result.stderr)
+                self.assertEqual(serial.read_bytes(), parallel.read_bytes(), f"{label}: --jobs 2 输出应与串行一致")
+
+    def test_validate_reports_corrupted_delta_updates(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_delta_validate_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=256, sh_bands=1)
+            bundle = tmp_dir / "ok.sog4d"
+            self.pack_sequence(input_dir, bundle)
+
+            entries = _read_bundle_entries(bundle)
+            delta_name = "sh/delta_00000.bin"
+            delta = bytearray(entries[delta_name])
+            update_count = int.from_bytes(delta[28:32], "little")
+            self.assertGreaterEqual(update_count, 2)
+
+            def corrupt(tag: str, data: bytes) -> subprocess.CompletedProcess[str]:
+                out_path = tmp_dir / f"{tag}.sog4d"
+                with zipfile.ZipFile(out_path, "w") as archive:
+                    for name, payload in entries.items():
+                        archive.writestr(name, data if name == delta_name else payload)
+                result = self.run_cmd("validate", "--input", str(out_path))
+                self.assertNotEqual(result.returncode, 0, msg=f"{tag}: 损坏的 delta 本应校验失败")
+                # 并行校验必须报告与串行相同的第一个错误.
+                parallel = self.run_cmd("validate", "--input", str(out_path), "--jobs", "3")
+                self.assertEqual(result.returncode, parallel.returncode)
+                self.assertEqual(result.stderr, parallel.stderr)
+                return result
+
+            # 交换前两条记录 -> splatId 不再严格递增.
+            swapped = bytearray(delta)
+            swapped[32:40], swapped[40:48] = delta[40:48], delta[32:40]
+            result = corrupt("swapped", bytes(swapped))
+            self.assertIn("delta-v1 splatId 非严格递增: shN seg=0 localFrame=1", result.stderr)
+
+            # 第二条记录 reserved!=0.
+            reserved = bytearray(delta)
+            reserved[46] = 1
+            result = corrupt("reserved", bytes(reserved))
+            self.assertIn("delta-v1 reserved!=0: shN seg=0 localFrame=1 update=1", result.stderr)
+
+            # 截断在第二条记录中间.
+            result = corrupt("truncated", bytes(delta[:44]))
+            self.assertIn("delta-v1 truncated: shN seg=0 localFrame=1 update=1", result.stderr)
+
+    def test_validate_levels(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_validate_level_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=5, splat_count=64, sh_bands=1)
+            bundle = tmp_dir / "ok.sog4d"
+            self.pack_sequence(input_dir, bundle)
+
+            structure = self.run_cmd("validate", "--input", str(bundle), "--level", "structure")
+            self.assertEqual(structure.returncode, 0, msg=structure.stderr)
+            self.assertIn("validate level=structure: decoded frames 0/5, delta segments 0/3", structure.stderr)
+
+            sample = self.run_cmd("validate", "--input", str(bundle), "--level", "sample", "--sample-count", "2")
+            self.assertEqual(sample.returncode, 0, msg=sample.stderr)
+            self.assertIn("validate level=sample: decoded frames 2/5, delta segments 2/3", sample.stderr)
+            self.assertIn("validate ok (v1 delta-v1).", sample.stderr)
+
+            entries = _read_bundle_entries(bundle)
+
+            def rewrite(tag: str, drop: str = "", patch: tuple[str, bytes] | None = None) -> Path:
+                out_path = tmp_dir / f"{tag}.sog4d"
+                with zipfile.ZipFile(out_path, "w") as archive:
+                    for name, payload in entries.items():
+                        if name == drop:
+                            continue
+                        archive.writestr(name, patch[1] if patch and patch[0] == name else payload)
+                return out_path
+
+            # 缺一张帧图: structure 不解码也能发现.
+            missing = rewrite("missing", drop="frames/00003/rotation.webp")
+            result = self.run_cmd("validate", "--input", str(missing), "--level", "structure")
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("bundle 缺少文件: frames/00003/rotation.webp", result.stderr)
+
+            # delta header 的 splatCount 被改坏.
+            delta_name = "sh/delta_00002.bin"
+            bad_header = bytearray(entries[delta_name])
+            bad_header[20:24] = (999).to_bytes(4, "little")
+            result = self.run_cmd(
+                "validate", "--input", str(rewrite("bad_header", patch=(delta_name, bytes(bad_header)))), "--level", "structure"
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("delta-v1: splatCount mismatch: shN seg=1 meta=64 file=999", result.stderr)
+
+    def test_profile_json_reports_stage_timings(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_profile_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=64, sh_bands=1)
+
+            profile_path = tmp_dir / "profile.json"
+            self.pack_sequence(
+                input_dir, tmp_dir / "out.sog4d", "--jobs", "2", "--self-check", "--profile-json", str(profile_path)
+            )
+
+            profile = json.loads(profile_path.read_text(encoding="utf-8"))
+            self.assertEqual("ply_sequence_to_sog4d", profile["tool"])
+            self.assertEqual("pack", profile["command"])
+            self.assertEqual(3, profile["frameCount"])
+            self.assertGreater(profile["peakRssBytes"], 0)
+            stages = profile["stages"]
+            for name in (
+                "pass1:ply_read",
+                "pass1:sampling",
+                "kmeans_fit:scaleCodebook(log)",
+                "kmeans_fit:shN_centroids",
+                "pass2:ply_read",
+                "pass2:predict:shN",
+                "pass2:webp_encode:sh0",
+                "pass2:zip_write",
+                "validate",
+            ):
+                self.assertIn(name, stages)
+                self.assertGreater(stages[name]["processPeakRssBytesAtEnd"], 0)
+                self.assertGreaterEqual(stages[name]["peakRssGrowthBytes"], 0)
+                self.assertLessEqual(stages[name]["processPeakRssBytesAtEnd"], profile["peakRssBytes"])
+            # 逐帧 stage 带直方图,worker 里测到的耗时也按帧汇总.
+            self.assertEqual(3, stages["pass1:ply_read"]["perFrame"]["count"])
+            self.assertEqual(3, stages["pass2:webp_encode:sh0"]["perFrame"]["count"])
+            self.assertEqual(10, len(stages["pass2:zip_write"]["perFrame"]["histogram"]["counts"]))
+
+    def test_fast_webp_effort_keeps_decoded_data(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_webp_effort_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=64, sh_bands=1)
+
+            max_path = tmp_dir / "max.sog4d"
+            fast_path = tmp_dir / "fast.sog4d"
+            self.pack_sequence(input_dir, max_path)
+            result = self.pack_sequence(input_dir, fast_path, "--webp-effort", "fast", "--self-check")
+
+            self.assertIn("webp effort=fast (method=1, quality=20):", result.stderr)
+            self.assertIn("position_hi", result.stderr)
+            max_entries = _read_bundle_entries(max_path)
+            fast_entries = _read_bundle_entries(fast_path)
+            self.assertEqual(sorted(max_entries), sorted(fast_entries))
+            for name, data in max_entries.items():
+                if not name.endswith(".webp"):
+                    self.assertEqual(data, fast_entries[name], name)
+                    continue
+                with Image.open(io.BytesIO(data)) as a, Image.open(io.BytesIO(fast_entries[name])) as b:
+                    np.testing.assert_array_equal(np.asarray(a.convert("RGBA")), np.asarray(b.convert("RGBA")), name)
+
+    def test_a_es_weighted_sampler_is_seeded(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_a_es_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=64, sh_bands=1)
+
+            first = tmp_dir / "first.sog4d"
+            second = tmp_dir / "second.sog4d"
+            common = ("--weighted-sampler", "a-es", "--sh0-codebook-method", "kmeans", "--webp-effort", "fast")
+            self.pack_sequence(input_dir, first, *common, "--self-check")
+            self.pack_sequence(input_dir, second, *common)
+
+            self.assertEqual(_read_bundle_entries(first), _read_bundle_entries(second))
+
+    def test_reservoir_codebook_sampling_packs_split_bands(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_reservoir_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=4, splat_count=64, sh_bands=3)
+
+            first = tmp_dir / "first.sog4d"
+            second = tmp_dir / "second.sog4d"
+            common = (
+                "--codebook-sampling",
+                "reservoir",
+                "--sh0-codebook-method",
+                "kmeans",
+                "--sh-split-by-band",
+                "--shN-sample-count",
+                "90",
+                "--webp-effort",
+                "fast",
+            )
+            result = self.pack_sequence(input_dir, first, *common, "--self-check")
+            # 第二次用进程池并行拟合 scale/sh1/sh2/sh3 四个 codebook,结果应与串行一致.
+            parallel = self.pack_sequence(input_dir, second, *common, "--codebook-jobs", "3")
+
+            self.assertIn("validate ok (v2).", result.stderr)
+            # per-frame 会按 90 // 4 * 4 = 88 分配;reservoir 恰好保留 90 个全局样本.
+            self.assertIn("sh1_centroids: fitting k-means(k=16, sample=90,", result.stderr)
+            self.assertIn("codebooks: fitting 4 codebooks with 3 worker processes", parallel.stderr)
+            self.assertEqual(_read_bundle_entries(first), _read_bundle_entries(second))
+
+    def test_kmeans_engine_is_independent_of_thread_count(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_kmeans_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            # 4100 splats > 2 个分配行块(2048),多线程路径才会真正被用到.
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=4100, sh_bands=2)
+
+            single = tmp_dir / "single.sog4d"
+            threaded = tmp_dir / "threaded.sog4d"
+            lloyd = tmp_dir / "lloyd.sog4d"
+            common = ("--sh0-codebook-method", "kmeans", "--webp-effort", "fast")
+            self.pack_sequence(input_dir, single, *common, "--kmeans-threads", "1")
+            self.pack_sequence(input_dir, threaded, *common, "--kmeans-threads", "3")
+            result = self.pack_sequence(
+                input_dir, lloyd, *common, "--kmeans-algorithm", "lloyd", "--kmeans-max-iter", "5", "--self-check"
+            )
+
+            self.assertEqual(_read_bundle_entries(single), _read_bundle_entries(threaded))
+            self.assertIn("shN_centroids: fitting k-means(k=16, sample=", result.stderr)
+            self.assertIn("algorithm=lloyd", result.stderr)
+            self.assertIn("validate ok (v1 delta-v1).", result.stderr)
+
+    def test_kmeans_recovers_every_cluster_of_a_clustered_fixture(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_kmeans_clusters_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            input_dir.mkdir()
+            # 64 个分得很开的 SH 原型,每个 60 个带小噪声的 splat; 权重全部相同.
+            # k=64 时 k-means 应当每个原型分到一个中心,inertia 只剩噪声本身.
+            rng = np.random.default_rng(7)
+            protos = rng.normal(0.0, 1.0, (64, 9)).astype(np.float32)
+            labels = np.repeat(np.arange(64), 60)
+            rng.shuffle(labels)
+            names = [
+                "x", "y", "z", "f_dc_0", "f_dc_1", "f_dc_2", "opacity",
+                "scale_0", "scale_1", "scale_2", "rot_0", "rot_1", "rot_2", "rot_3",
+                *[f"f_rest_{i}" for i in range(9)],
+            ]
+            v = np.zeros(labels.shape[0], dtype=np.dtype([(n, "<f4") for n in names]))
+            for n in ("x", "y", "z"):
+                v[n] = rng.normal(0.0, 1.0, labels.shape[0])
+            for n in ("scale_0", "scale_1", "scale_2"):
+                v[n] = -2.0
+            v["rot_0"] = 1.0
+            noisy = protos[labels] + rng.normal(0.0, 0.01, (labels.shape[0], 9)).astype(np.float32)
+            for i in range(9):
+                v[f"f_rest_{i}"] = noisy[:, i]
+            header = "\n".join(
+                [
+                    "ply",
+                    "format binary_little_endian 1.0",
+                    f"element vertex {labels.shape[0]}",
+                    *[f"property float {n}" for n in names],
+                    "end_header",
+                    "",
+                ]
+            ).encode("ascii")
+            (input_dir / "time_00000.ply").write_bytes(header + v.tobytes())
+
+            for algorithm in ("minibatch", "lloyd"):
+                out_path = tmp_dir / f"{algorithm}.sog4d"
+                result = self.run_cmd(
+                    "pack",
+                    "--input-dir",
+                    str(input_dir),
+                    "--output",
+                    str(out_path),
+                    "--shN-count",
+                    "64",
+                    "--shN-centroids-type",
+                    "f32",
+                    "--scale-codebook-size",
+                    "16",
+                    "--kmeans-algorithm",
+                    algorithm,
+                    "--webp-effort",
+                    "fast",
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{algorithm} 打包失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                entries = _read_bundle_entries(out_path)
+                sh = json.loads(entries["meta.json"])["streams"]["sh"]
+                centroids = np.frombuffer(entries[sh["shNCentroidsPath"]], dtype="<f4").reshape(64, 9)
+                nearest = np.sqrt(((protos[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+                self.assertLess(float(nearest.max()), 0.05, msg=f"{algorithm}: 有原型没有分到中心")
+
+    def test_kmeans_handles_mostly_zero_importance_weights(self) -> None:
+        # pack 的采样器不会把 0 权重的行交给 k-means,这里直接调用引擎:
+        # 20000 行里只有 50 行正权重(少于 k),init 子集可能一行正权重都没有,minibatch 重分配也只能从这 50 行里抽.
+        code = "\n".join(
+            [
+                "import sys",
+                f"sys.path.insert(0, {str(SCRIPT_PATH.parent)!r})",
+                "import numpy as np",
+                "import ply_sequence_to_sog4d as m",
+                "rng = np.random.default_rng(0)",
+                "x = rng.normal(size=(20000, 8)).astype(np.float32)",
+                "w = np.zeros(20000)",
+                "w[rng.choice(20000, 50, replace=False)] = 1.0",
+                "for algorithm in ('minibatch', 'lloyd'):",
+                "    model = m._kmeans_fit(x, w, 256, 0, m._KMeansConfig(algorithm=algorithm, threads=1))",
+                "    assert model.centroids.shape == (256, 8) and np.isfinite(model.centroids).all()",
+                "one = np.zeros(20000)",
+                "one[0] = 1.0",
+                "model = m._kmeans_fit(x, one, 16, 0, m._KMeansConfig(threads=1))",
+                "assert np.isfinite(model.centroids).all()",
+                "print('ok')",
+            ]
+        )
+        result = subprocess.run([sys.executable, "-c", code], text=True, capture_output=True, timeout=120, check=False)
+        self.assertEqual(result.returncode, 0, msg=f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
+        self.assertIn("ok", result.stdout)
+
+    def test_kmeans_init_partitions_large_k(self) -> None:
+        # k >= 4 * _KMEANS_INIT_CELL_K 时 k-means++ 分块进行: 中心数仍为 k,都取自正权重的行,势能与整体 greedy 接近.
+        code = "\n".join(
+            [
+                "import sys",
+                f"sys.path.insert(0, {str(SCRIPT_PATH.parent)!r})",
+                "import numpy as np",
+                "import ply_sequence_to_sog4d as m",
+                "rng = np.random.default_rng(0)",
+                "x = (rng.normal(size=(64, 8)) * 4.0)[rng.integers(0, 64, 12288)] + rng.normal(size=(12288, 8))",
+                "x = x.astype(np.float32)",
+                "w = rng.lognormal(size=12288)",
+                "w[rng.random(12288) < 0.5] = 0.0",
+                "k = 4 * m._KMEANS_INIT_CELL_K",
+                "def cost(c):",
+                "    _, d2 = m._CentroidAssigner(c).assign(x)",
+                "    return float(np.dot(w, d2))",
+                "part = m._kmeans_init(x, w, k, np.random.default_rng(0))",
+                "greedy = m._kmeans_plusplus(x, w, k, np.random.default_rng(0))",
+                "assert part.shape == (k, 8)",
+                "assert np.unique(part, axis=0).shape[0] == k",
+                "positive = {row.tobytes() for row in x[w > 0.0]}",
+                "assert all(row.tobytes() in positive for row in part)",
+                "print(f'ratio={cost(part) / cost(greedy):.4f}')",
+            ]
+        )
+        result = subprocess.run([sys.executable, "-c", code], text=True, capture_output=True, timeout=120, check=False)
+        self.assertEqual(result.returncode, 0, msg=f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
+        ratio = float(re.search(r"ratio=([0-9.]+)", result.stdout).group(1))
+        self.assertLess(ratio, 1.1)
+
+    def test_ivf_label_search_reports_difference_from_exact(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_ivf_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=600, sh_bands=2)
+
+            exact = tmp_dir / "exact.sog4d"
+            full_probe = tmp_dir / "full_probe.sog4d"
+            approx = tmp_dir / "approx.sog4d"
+            common = ("--webp-effort", "fast")
+            self.pack_sequence(input_dir, exact, *common)
+            # nprobe >= lists 时每行都会比较全部倒排表,结果应与精确搜索一致.
+            result_full = self.pack_sequence(
+                input_dir, full_probe, *common, "--sh-label-search", "ivf", "--sh-ann-lists", "4", "--sh-ann-nprobe", "4"
+            )
+            result_approx = self.pack_sequence(
+                input_dir,
+                approx,
+                *common,
+                "--sh-label-search",
+                "ivf",
+                "--sh-ann-lists",
+                "4",
+                "--sh-ann-nprobe",
+                "1",
+                "--sh-ann-audit",
+                "100",
+                "--self-check",
+            )
+
+            self.assertEqual(_read_bundle_entries(exact), _read_bundle_entries(full_probe))
+            self.assertIn("shN: ivf index (centroids=16, lists=4, nprobe=4,", result_full.stderr)
+            self.assertIn("audited=1800 differing=0 (0.000%)", result_full.stderr)
+            self.assertIn("sh ann shN: ivf(lists=4, nprobe=1) audited=300 differing=", result_approx.stderr)
+            self.assertIn("validate ok (v1 delta-v1).", result_approx.stderr)
+
+    def test_ivf_index_drops_empty_cells(self) -> None:
+        # 64 个 centroid 各重复 4 次 + 8 个离群点,lists=64 接近去重后的 centroid 数(72),粗 k-means 会留下空 cell.
+        # 空 cell 不能留在索引里: 只探测到它的行会拿到默认 label 0.
+        code = "\n".join(
+            [
+                "import sys",
+                f"sys.path.insert(0, {str(SCRIPT_PATH.parent)!r})",
+                "import numpy as np",
+                "import ply_sequence_to_sog4d as m",
+                "rng = np.random.default_rng(0)",
+                "base = rng.normal(size=(64, 9)).astype(np.float32)",
+                "c = np.concatenate([np.tile(base, (4, 1)), rng.normal(0.0, 5.0, (8, 9)).astype(np.float32)])",
+                "x = (c[rng.integers(0, c.shape[0], 50000)] + rng.normal(0.0, 0.3, (50000, 9))).astype(np.float32)",
+                "index = m._IvfCentroidIndex(c, 64, 1, 1, m._KMeansConfig(threads=1))",
+                "assert index.lists < 64, index.lists",
+                "assert all(ids.shape[0] > 0 for ids, _ in index.cells)",
+                "labels = index.predict(x)",
+                "exact, _ = m._CentroidAssigner(c).assign(x)",
+                "assert abs(int((labels == 0).sum()) - int((exact == 0).sum())) <= 10",
+                "assert float((labels == exact).mean()) > 0.99",
+                "print('ok')",
+            ]
+        )
+        result = subprocess.run([sys.executable, "-c", code], text=True, capture_output=True, timeout=120, check=False)
+        self.assertEqual(result.returncode, 0, msg=f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
+        self.assertIn("ok", result.stdout)
+
+    def test_label_reuse_is_exact_at_zero_tol_and_independent_of_jobs(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_reuse_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=5, splat_count=600, sh_bands=1)
+
+            exact = tmp_dir / "exact.sog4d"
+            reuse_zero = tmp_dir / "reuse_zero.sog4d"
+            serial = tmp_dir / "serial.sog4d"
+            parallel = tmp_dir / "parallel.sog4d"
+            common = ("--webp-effort", "fast")
+            self.pack_sequence(input_dir, exact, *common)
+            result_zero = self.pack_sequence(input_dir, reuse_zero, *common, "--sh-label-reuse-tol", "0")
+            # 每帧约 25% 的 splat 改 SH: tol=0 时只有这些行会重新搜索,labels 与全量分配一致.
+            self.assertEqual(_read_bundle_entries(exact), _read_bundle_entries(reuse_zero))
+            match = re.search(r"sh label reuse shN: searched (\d+)/3000 rows", result_zero.stderr)
+            self.assertIsNotNone(match, result_zero.stderr)
+            assert match is not None
+            self.assertLess(int(match.group(1)), 3000 // 2)
+
+            lossy = (*common, "--sh-label-reuse-tol", "0.3", "--sh-label-reuse-interval", "2")
+            self.pack_sequence(input_dir, serial, *lossy)
+            result = self.pack_sequence(input_dir, parallel, *lossy, "--jobs", "2", "--self-check")
+            self.assertEqual(serial.read_bytes(), parallel.read_bytes())
+            self.assertIn("validate ok (v1 delta-v1).", result.stderr)
+
+    def test_reuse_codebooks_direct_and_init(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_reuse_cb_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=300, sh_bands=1)
+
+            source = tmp_dir / "source.sog4d"
+            direct = tmp_dir / "direct.sog4d"
+            init = tmp_dir / "init.sog4d"
+            common = ("--sh0-codebook-method", "kmeans", "--shN-centroids-type", "f32", "--webp-effort", "fast")
+            self.pack_sequence(input_dir, source, *common)
+
+            # direct: 不跑 k-means,codebook 与 labels 都应与源 bundle 一致.
+            result_direct = self.pack_sequence(input_dir, direct, *common, "--reuse-codebooks", str(source))
+            self.assertIn("shN_centroids: reusing 16 centroids, skip k-means", result_direct.stderr)
+            self.assertNotIn("fitting k-means", result_direct.stderr)
+            self.assertEqual(_read_bundle_entries(source), _read_bundle_entries(direct))
+
+            result_init = self.pack_sequence(
+                input_dir,
+                init,
+                *common,
+                "--reuse-codebooks",
+                str(source),
+                "--reuse-codebooks-mode",
+                "init",
+                "--self-check",
+            )
+            self.assertIn("init=reused) ...", result_init.stderr)
+            self.assertIn("validate ok (v1 delta-v1).", result_init.stderr)
+
+            # SH 布局不一致(v1 bundle -> v2 打包)必须直接报错.
+            mismatch = self.run_cmd(
+                "pack",
+                "--input-dir",
+                str(input_dir),
+                "--output",
+                str(tmp_dir / "mismatch.sog4d"),
+                "--sh-split-by-band",
+                "--reuse-codebooks",
+                str(source),
+            )
+            self.assertNotEqual(mismatch.returncode, 0)
+            self.assertIn("里没有 sh1_centroids", mismatch.stderr)
+
+            # bundle 缺 centroids 文件时给出明确报错,而不是 KeyError traceback.
+            broken = tmp_dir / "broken.sog4d"
+            with zipfile.ZipFile(source, "r") as src, zipfile.ZipFile(broken, "w") as dst:
+                for info in src.infolist():
+                    if info.filename != "shN_centroids.bin":
+                        dst.writestr(info, src.read(info.filename))
+            missing = self.run_cmd(
+                "pack", "--input-dir", str(input_dir), "--output", str(tmp_dir / "missing.sog4d"), "--reuse-codebooks", str(broken)
+            )
+            self.assertNotEqual(missing.returncode, 0)
+            self.assertIn("--reuse-codebooks: bundle 里缺少 shN_centroids.bin", missing.stderr)
+            self.assertNotIn("Traceback", missing.stderr)
+
+    def test_train_codebooks_library_is_packed_without_sampling(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_train_cb_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            seq_a = tmp_dir / "seq_a"
+            seq_b = tmp_dir / "seq_b"
+            _write_binary_sequence(seq_a, frame_count=3, splat_count=300, sh_bands=2, seed=1)
+            _write_binary_sequence(seq_b, frame_count=2, splat_count=200, sh_bands=2, seed=2)
+
+            library = tmp_dir / "shared.sog4dcb"
+            train = self.run_cmd(
+                "train-codebooks",
+                "--input-dir",
+                str(seq_a),
+                "--input-dir",
+                str(seq_b),
+                "--output",
+                str(library),
+                "--sh-split-by-band",
+                "--scale-codebook-size",
+                "16",
+                "--shN-count",
+                "16",
+                "--sh0-codebook-method",
+                "kmeans",
+                "--profile-json",
+                str(tmp_dir / "train.profile.json"),
+            )
+            self.assertEqual(train.returncode, 0, msg=f"stdout:\n{train.stdout}\nstderr:\n{train.stderr}")
+            self.assertIn("train-codebooks: 2 inputs, 5 frames", train.stderr)
+            train_profile = json.loads((tmp_dir / "train.profile.json").read_text(encoding="utf-8"))
+            self.assertEqual("train-codebooks", train_profile["command"])
+
+            entries = _read_bundle_entries(library)
+            meta = json.loads(entries["meta.json"])
+            self.assertEqual(meta["format"], "sog4d-codebooks")
+            self.assertEqual(meta["version"], 2)
+            self.assertEqual(sorted(k for k in entries if k.endswith(".bin")), ["sh1_centroids.bin", "sh2_centroids.bin"])
+
+            out_path = tmp_dir / "packed.sog4d"
+            result = self.pack_sequence(
+                seq_b,
+                out_path,
+                "--sh-split-by-band",
+                "--shN-centroids-type",
+                "f32",
+                "--reuse-codebooks",
+                str(library),
+                "--self-check",
+            )
+            self.assertIn("codebook sampling: skipped (reuse codebooks, direct)", result.stderr)
+            self.assertNotIn("fitting k-means", result.stderr)
+            packed = _read_bundle_entries(out_path)
+            self.assertEqual(packed["sh1_centroids.bin"], entries["sh1_centroids.bin"])
+            self.assertEqual(
+                json.loads(packed["meta.json"])["streams"]["sh"]["sh0Codebook"], meta["streams"]["sh"]["sh0Codebook"]
+            )
+
+    def test_decode_cache_hits_on_repack_and_evicts_by_budget(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_decode_cache_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            _write_binary_sequence(input_dir, frame_count=3, splat_count=300, sh_bands=1)
+            cache_dir = tmp_dir / "cache"
+
+            plain = tmp_dir / "plain.sog4d"
+            cold = tmp_dir / "cold.sog4d"
+            warm = tmp_dir / "warm.sog4d"
+            self.pack_sequence(input_dir, plain)
+            result_cold = self.pack_sequence(input_dir, cold, "--decode-cache-dir", str(cache_dir))
+            # --jobs 1: pass 2 在主进程里读同一批帧,全部命中 pass 1 刚写入的条目.
+            self.assertIn("decode cache: hits=3, misses=3", result_cold.stderr)
+            result_warm = self.pack_sequence(input_dir, warm, "--decode-cache-dir", str(cache_dir), "--jobs", "2")
+            self.assertIn("decode cache: hits=3, misses=0", result_warm.stderr)
+            self.assertEqual(_read_bundle_entries(plain), _read_bundle_entries(cold))
+            self.assertEqual(_read_bundle_entries(plain), _read_bundle_entries(warm))
+
+            # 内容变了(哪怕 size 不变)就不能命中旧条目.
+            first = sorted(input_dir.glob("*.ply"))[0]
+            data = bytearray(first.read_bytes())
+            data[-1] ^= 0x01
+            first.write_bytes(bytes(data))
+            result_changed = self.pack_sequence(
+                input_dir, tmp_dir / "changed.sog4d", "--decode-cache-dir", str(cache_dir)
+            )
+            self.assertIn("decode cache: hits=5, misses=1", result_changed.stderr)
+
+            # 预算小于单帧: 每次写入后只保留最新的条目.
+            result_tiny = self.pack_sequence(
+                input_dir, tmp_dir / "tiny.sog4d", "--decode-cache-dir", str(cache_dir), "--decode-cache-max-gb", "1e-9"
+            )
+            self.assertIn("decode cache: hits=6, misses=0", result_tiny.stderr)
+            frames_dir = cache_dir / "v1" / "frames"
+            self.assertEqual(len(list(frames_dir.iterdir())), 4)
+            self.pack_sequence(
+                input_dir, tmp_dir / "tiny2.sog4d", "--decode-cache-dir", str(cache_dir), "--decode-cache-max-gb", "1e-9",
+                "--sh-bands", "0",
+            )
+            entries = list(frames_dir.iterdir())
+            self.assertEqual(len(entries), 1)
+            # 被淘汰内容的 key 记录(包括改写前那份 stat 的)随之删除,只剩指向存活条目的一条.
+            keys = list((cache_dir / "v1" / "keys").glob("*.json"))
+            self.assertEqual(len(keys), 1)
+            self.assertTrue(entries[0].name.startswith(json.loads(keys[0].read_text(encoding="utf-8"))["content"]))
+
+    def test_prefetch_matches_serial_reads_and_surfaces_errors(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_prefetch_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_dir = tmp_dir / "frames"
+            paths = _write_binary_sequence(input_dir, frame_count=5, splat_count=300, sh_bands=1)
+
+            plain = tmp_dir / "plain.sog4d"
+            prefetched = tmp_dir / "prefetched.sog4d"
+            self.pack_sequence(input_dir, plain)
+            # 内存上限远小于单帧: 队列每次只放一帧,仍然要能推进.
+            result = self.pack_sequence(
+                input_dir, prefetched, "--prefetch-frames", "3", "--prefetch-max-mb", "0.001"
+            )
+            self.assertIn("prefetch: up to 3 frames ahead", result.stderr)
+            self.assertEqual(_read_bundle_entries(plain), _read_bundle_entries(prefetched))
+
+            # 预读线程里的解析错误要在主线程原样报出来.
+            paths[3].write_bytes(paths[3].read_bytes()[:-7])
+            broken = self.run_cmd(
+                "pack",
+                "--input-dir",
+                str(input_dir),
+                "--output",
+                str(tmp_dir / "broken.sog4d"),
+                "--prefetch-frames",
+                "2",
+            )
+            self.assertNotEqual(broken.returncode, 0)
+            self.assertIn("vertex body truncated", broken.stderr)
+            self.assertIn("time_00003.ply", broken.stderr)
+
+    def test_gzip_compressed_sequence_matches_plain_ply(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_gzip_input_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            plain_dir = tmp_dir / "plain"
+            gz_dir = tmp_dir / "gz"
+            gz_dir.mkdir()
+            for path in _write_binary_sequence(plain_dir, frame_count=3, splat_count=300, sh_bands=1):
+                (gz_dir / f"{path.name}.gz").write_bytes(gzip.compress(path.read_bytes()))
+
+            plain = tmp_dir / "plain.sog4d"
+            packed = tmp_dir / "gz.sog4d"
+            self.pack_sequence(plain_dir, plain)
+            result = self.pack_sequence(gz_dir, packed, "--prefetch-frames", "2", "--self-check")
+            self.assertIn("frames: 3", result.stderr)
+            self.assertEqual(_read_bundle_entries(plain), _read_bundle_entries(packed))
+
+    @unittest.skipUnless(zstandard is not None, "需要 zstandard")
+    def test_zstd_compressed_sequence_matches_plain_ply(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_zstd_input_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            plain_dir = tmp_dir / "plain"
+            zst_dir = tmp_dir / "zst"
+            zst_dir.mkdir()
+            cctx = zstandard.ZstdCompressor()
+            for i, path in enumerate(_write_binary_sequence(plain_dir, frame_count=3, splat_count=300, sh_bands=1)):
+                data = path.read_bytes()
+                if i == 0:
+                    # 多个 zstd frame 拼接(`zstd` 追加写入或并行压缩的产物)也要整体读完.
+                    cut = len(data) // 3
+                    payload = cctx.compress(data[:cut]) + cctx.compress(data[cut:])
+                else:
+                    payload = cctx.compress(data)
+                (zst_dir / f"{path.name}.zst").write_bytes(payload)
+
+            plain = tmp_dir / "plain.sog4d"
+            packed = tmp_dir / "zst.sog4d"
+            self.pack_sequence(plain_dir, plain)
+            result = self.pack_sequence(zst_dir, packed, "--prefetch-frames", "2", "--self-check")
+            self.assertIn("frames: 3", result.stderr)
+            self.assertEqual(_read_bundle_entries(plain), _read_bundle_entries(packed))
+
+    def test_input_archive_matches_input_dir(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="sog4d_archive_input_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            plain_dir = tmp_dir / "plain"
+            frames = _write_binary_sequence(plain_dir, frame_count=3, splat_count=300, sh_bands=1)
+
+            # 成员故意倒序写入,验证按 `_sort_key` 重新排序.
+            tar_path = tmp_dir / "frames.tar"
+            with tarfile.open(tar_path, "w") as tf:
+                for path in reversed(frames):
+                    tf.add(path, arcname=f"capture/{path.name}")
+            zip_path = tmp_dir / "frames.zip"
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for path in reversed(frames):
+                    zf.write(path, arcname=path.name)
+                zf.writestr(f"__MACOSX/._{frames[0].name}", b"not a ply")
+            # stored 成员走 memmap: 数据偏移要跳过 local header 的文件名与 extra 字段.
+            stored_path = tmp_dir / "stored.zip"
+            with zipfile.ZipFile(stored_path, "w", compression=zipfile.ZIP_STORED) as zf:
+                zf.writestr("readme.txt", b"capture notes")
+                for path in reversed(frames):
+                    zf.write(path, arcname=f"capture/{path.name}")
+
+            plain = tmp_dir / "plain.sog4d"
+            self.pack_sequence(plain_dir, plain)
+            expected = _read_bundle_entries(plain)
+            for archive, extra in (
+                (tar_path, ("--jobs", "2")),
+                (zip_path, ("--prefetch-frames", "2")),
+                (stored_path, ("--jobs", "2")),
+            ):
+                packed = tmp_dir / f"{archive.stem}.sog4d"
+                result = self.run_cmd(
+                    "pack",
+                    "--input-archive",
+                    str(archive),
+                    "--output",
+                    str(packed),
+                    "--scale-codebook-size",
+                    "16",
+                    "--shN-count",
+                    "16",
+                    "--delta-segment-length",
+                    "2",
+                    "--self-check",
+                    *extra,
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{archive.name} 打包失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                self.assertIn("frames: 3", result.stderr)
+                self.assertEqual(expected, _read_bundle_entries(packed), msg=archive.name)
+
+            tgz_path = tmp_dir / "frames.tar.gz"
+            with tarfile.open(tgz_path, "w:gz") as tf:
+                tf.add(frames[0], arcname=frames[0].name)
+            result = self.run_cmd("pack", "--input-archive", str(tgz_path), "--output", str(tmp_dir / "tgz.sog4d"))
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("未压缩的 tar", result.stderr)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -19,20 +19,38 @@
 from __future__ import annotations
 
 import argparse
+import gzip
+import hashlib
+import io
+import json
 import math
+import os
 import re
 import struct
+import shutil
 import sys
-from dataclasses import dataclass
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Any, BinaryIO, Iterator, Optional
 
 import numpy as np
 
 try:
-    from sklearn.cluster import MiniBatchKMeans
-except Exception:
-    MiniBatchKMeans = None  # type: ignore[assignment]
+    # `--profile-json` 用它取峰值 RSS. Windows 没有这个模块,此时峰值 RSS 记为 0.
+    import resource
+except Exception:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+try:
+    # `.ply.zst` 输入需要 zstandard; `.ply.gz` 用标准库 gzip 即可.
+    import zstandard
+except Exception:  # pragma: no cover - 可选依赖
+    zstandard = None  # type: ignore[assignment]
 
 
 SH_C0: float = 0.28209479177387814
@@ -135,6 +153,108 @@ class _ParsedV2Section:
     length: int
 
 
+# -----------------------------------------------------------------------------
+# 分阶段 profiling(`--profile-json`)
+# -----------------------------------------------------------------------------
+
+
+def _peak_rss_bytes() -> int:
+    # 进程自启动以来的峰值 RSS.
+    # - Linux 的 ru_maxrss 单位是 KiB,macOS 是 bytes.
+    # - Windows 没有 resource 模块,返回 0.
+    if resource is None:
+        return 0
+    rss = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _frame_histogram(values: list[float], bins: int = 10) -> dict[str, Any]:
+    arr = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(arr, bins=bins)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99]).tolist()
+    return {
+        "count": int(arr.size),
+        "meanSeconds": float(arr.mean()),
+        "minSeconds": float(arr.min()),
+        "p50Seconds": float(p50),
+        "p90Seconds": float(p90),
+        "p99Seconds": float(p99),
+        "maxSeconds": float(arr.max()),
+        "histogram": {"edgesSeconds": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+class _StageProfiler:
+    """
+    分阶段记录 wall/CPU 耗时与峰值 RSS,`--profile-json` 时写成 JSON.
+
+    说明:
+    - 每个 stage 记录调用次数,wall/CPU 累计耗时,以及两种内存数字:
+      - `processPeakRssBytesAtEnd`: stage 结束时进程的峰值 RSS(自进程启动以来的高水位,不是本 stage 自己的峰值).
+      - `peakRssGrowthBytes`: 单次调用期间高水位的最大抬升,即本 stage 把进程峰值推高了多少; 0 表示没超过之前的高水位.
+    - 带 frame 的调用额外保留逐帧 wall 耗时,输出分位数与直方图,便于定位慢帧与回归.
+    """
+
+    def __init__(self) -> None:
+        self._stages: dict[str, dict[str, Any]] = {}
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, frame: Optional[int] = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        rss0 = _peak_rss_bytes()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0, time.process_time() - c0, frame, rss0)
+
+    def add(
+        self, name: str, wall: float, cpu: float, frame: Optional[int] = None, rss0: Optional[int] = None
+    ) -> None:
+        # rss0: 调用开始时的峰值 RSS. 外部测得的耗时(worker)没有这个值,不计 `peakRssGrowthBytes`.
+        st = self._stages.get(name)
+        if st is None:
+            st = {
+                "calls": 0,
+                "wallSeconds": 0.0,
+                "cpuSeconds": 0.0,
+                "processPeakRssBytesAtEnd": 0,
+                "peakRssGrowthBytes": 0,
+                "frameWall": [],
+            }
+            self._stages[name] = st
+        st["calls"] += 1
+        st["wallSeconds"] += float(wall)
+        st["cpuSeconds"] += float(cpu)
+        rss = _peak_rss_bytes()
+        st["processPeakRssBytesAtEnd"] = max(st["processPeakRssBytesAtEnd"], rss)
+        if rss0 is not None:
+            st["peakRssGrowthBytes"] = max(st["peakRssGrowthBytes"], rss - rss0)
+        if frame is not None:
+            st["frameWall"].append(float(wall))
+
+    def to_dict(self) -> dict[str, Any]:
+        stages: dict[str, Any] = {}
+        for name, st in self._stages.items():
+            out = {k: v for k, v in st.items() if k != "frameWall"}
+            if st["frameWall"]:
+                out["perFrame"] = _frame_histogram(st["frameWall"])
+            stages[name] = out
+        return {
+            "totalWallSeconds": time.perf_counter() - self._wall0,
+            "totalCpuSeconds": time.process_time() - self._cpu0,
+            "peakRssBytes": _peak_rss_bytes(),
+            "stages": stages,
+        }
+
+    def write_json(self, path: Path, info: dict[str, Any]) -> None:
+        report = {**info, **self.to_dict()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
 # -----------------------------------------------------------------------------
 # PLY 读取
 # -----------------------------------------------------------------------------
@@ -219,32 +339,144 @@ def _parse_ply_header(fp) -> _PlyHeader:
     return _PlyHeader(fmt=fmt, endian=endian, vertex_count=vertex_count, vertex_props=vertex_props)
 
 
+# -----------------------------------------------------------------------------
+# 压缩输入(`.ply.gz` / `.ply.zst`)
+# -----------------------------------------------------------------------------
+#
+# - 压缩文件不能 memmap: header 与 body 都从解压流顺序读取,body 直接 readinto 预分配的 vertex 数组,
+#   不落临时的未压缩文件.
+
+_PLY_SUFFIXES: tuple[str, ...] = (".ply", ".ply.gz", ".ply.zst")
+
+
+def _is_ply_name(name: str) -> bool:
+    return name.lower().endswith(_PLY_SUFFIXES)
+
+
+def _is_compressed_ply(name: str) -> bool:
+    return name.lower().endswith((".ply.gz", ".ply.zst"))
+
+
+def _open_ply_stream(path: Path) -> BinaryIO:
+    # 按后缀打开(解压)流,只支持顺序读.
+    name = path.name.lower()
+    if name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise ValueError(f"读取 {path.name} 需要 zstandard: pip install zstandard")
+        reader = zstandard.ZstdDecompressor().stream_reader(path.open("rb"), read_across_frames=True, closefd=True)
+        # zstandard 的 reader 没有 readline,包一层 BufferedReader 给 header 解析用.
+        return io.BufferedReader(reader)  # type: ignore[arg-type]
+    return path.open("rb")
+
+
+def _read_ply_binary_stream(fp: BinaryIO, header: _PlyHeader, path: Path) -> np.ndarray:
+    # 从顺序流读取 binary body: 直接 readinto 预分配的结构化数组,没有中间整帧 bytes.
+    data = np.empty(header.vertex_count, dtype=np.dtype(header.vertex_props, align=False))
+    buf = memoryview(data.view(np.uint8))
+    filled = 0
+    while filled < buf.nbytes:
+        n = fp.readinto(buf[filled:])
+        if not n:
+            raise ValueError(f"PLY: vertex body truncated: {path} expected {buf.nbytes} body bytes, got {filled}")
+        filled += n
+    return data
+
+
 def _read_ply_vertices(path: Path) -> np.ndarray:
+    if _is_compressed_ply(path.name):
+        with _open_ply_stream(path) as fp:
+            header = _parse_ply_header(fp)
+            if header.fmt == "ascii":
+                return _read_ply_ascii_body(fp, header, path)
+            return _read_ply_binary_stream(fp, header, path)
+
     with path.open("rb") as fp:
         header = _parse_ply_header(fp)
-        dtype = np.dtype(header.vertex_props, align=False)
-
-        if header.fmt in ("binary_little_endian", "binary_big_endian"):
-            data = np.fromfile(fp, dtype=dtype, count=header.vertex_count)
-        elif header.fmt == "ascii":
-            cols = len(header.vertex_props)
-            data = np.empty(header.vertex_count, dtype=dtype)
-            for i in range(header.vertex_count):
-                line = fp.readline()
-                if not line:
-                    raise ValueError(f"PLY: unexpected EOF while reading vertices: {path}")
-                items = line.decode("ascii", errors="replace").strip().split()
-                if len(items) < cols:
-                    raise ValueError(f"PLY: vertex line has too few columns: {path} line={i}")
-                if len(items) != cols:
-                    raise ValueError(f"PLY: vertex line has unexpected extra columns: {path} line={i}")
-                for (name, dt), token in zip(header.vertex_props, items):
-                    data[name][i] = np.array(token, dtype=dt)
-        else:
+
+        if header.fmt == "ascii":
+            return _read_ply_ascii_body(fp, header, path)
+
+        if header.fmt not in ("binary_little_endian", "binary_big_endian"):
             raise ValueError(f"PLY: unsupported format: {header.fmt}")
+        body_offset = fp.tell()
+
+    return _memmap_ply_body(path, header, body_offset)
+
+
+_ASCII_BLOCK_ROWS = 65536
+
+
+def _read_ply_ascii_body(fp, header: _PlyHeader, path: Path) -> np.ndarray:
+    # ascii body 按块交给 `np.loadtxt` 的 C 解析器,避免逐 token 的 Python 循环.
+    # - 列数不对时 loadtxt 会整块失败,此时再逐行扫描该块,给出和以前一致的行号报错.
+    # - 所有列先按 float64 解析再转成目标 dtype,整数列在 2^53 以内是精确的.
+    dtype = np.dtype(header.vertex_props, align=False)
+    cols = len(header.vertex_props)
+    count = header.vertex_count
+    data = np.empty(count, dtype=dtype)
+    if count == 0:
+        return data
+
+    lines = fp.read().split(b"\n", count)
+    if len(lines) < count or (len(lines) == count and lines[-1] == b""):
+        raise ValueError(f"PLY: unexpected EOF while reading vertices: {path}")
+
+    for start in range(0, count, _ASCII_BLOCK_ROWS):
+        end = min(start + _ASCII_BLOCK_ROWS, count)
+        block_lines = lines[start:end]
+        text = b"\n".join(block_lines).decode("ascii", errors="replace")
+        try:
+            with warnings.catch_warnings():
+                # 空块/空行时 loadtxt 会发 UserWarning,这里统一由下面的行数检查兜底.
+                warnings.simplefilter("ignore", UserWarning)
+                block = np.loadtxt(io.StringIO(text), dtype=np.float64, comments=None, ndmin=2)
+        except ValueError:
+            block = None
+        if block is None or block.shape != (end - start, cols):
+            _raise_ascii_column_error(block_lines, start, cols, path)
+            raise ValueError(f"PLY: invalid vertex value in lines {start}..{end - 1}: {path}")
+
+        for i, (name, _dt) in enumerate(header.vertex_props):
+            data[name][start:end] = block[:, i]
     return data
 
 
+def _raise_ascii_column_error(block_lines: list[bytes], start: int, cols: int, path: Path) -> None:
+    for offset, line in enumerate(block_lines):
+        items = line.split()
+        if len(items) < cols:
+            raise ValueError(f"PLY: vertex line has too few columns: {path} line={start + offset}")
+        if len(items) != cols:
+            raise ValueError(f"PLY: vertex line has unexpected extra columns: {path} line={start + offset}")
+
+
+def _memmap_ply_body(path: Path, header: _PlyHeader, body_offset: int) -> np.ndarray:
+    # binary body 直接 memmap,不做整帧拷贝.
+    # - 返回的是结构化 memmap,`v["x"]` 这类字段访问都是 strided view.
+    # - 真正的拷贝只发生在 `_gather_columns` 把用到的列转成 float32 时.
+    dtype = np.dtype(header.vertex_props, align=False)
+    expected_end = body_offset + header.vertex_count * dtype.itemsize
+    file_size = path.stat().st_size
+    if file_size < expected_end:
+        raise ValueError(
+            f"PLY: vertex body truncated: {path} expected {expected_end} bytes, got {file_size}"
+        )
+    if header.vertex_count == 0:
+        return np.empty((0,), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=body_offset, shape=(header.vertex_count,))
+
+
+def _gather_columns(v: np.ndarray, names: list[str]) -> np.ndarray:
+    # 把若干标量列一次性写进预分配的 [N,len(names)] float32.
+    # 相比 `np.stack([...]).astype(...)`,这里每列只拷贝一次,也不会产生中间数组.
+    out = np.empty((v.shape[0], len(names)), dtype=np.float32)
+    for i, name in enumerate(names):
+        out[:, i] = v[name]
+    return out
+
+
 def _require_fields(v: np.ndarray, path: Path, fields: list[str]) -> None:
     names = set(v.dtype.names or [])
     missing = [field for field in fields if field not in names]
@@ -293,7 +525,7 @@ def _sort_key(path: Path) -> tuple:
 
 
 def _list_ply_files(input_dir: Path) -> list[Path]:
-    files = [path for path in input_dir.iterdir() if path.is_file() and path.suffix.lower() == ".ply"]
+    files = [path for path in input_dir.iterdir() if path.is_file() and _is_ply_name(path.name)]
     files.sort(key=_sort_key)
     return files
 
@@ -306,8 +538,8 @@ def _resolve_input_ply_files(args: argparse.Namespace) -> list[Path]:
             raise ValueError(f"input-ply 不存在: {input_ply}")
         if not input_ply.is_file():
             raise ValueError(f"input-ply 不是文件: {input_ply}")
-        if input_ply.suffix.lower() != ".ply":
-            raise ValueError(f"input-ply 必须是 .ply 文件: {input_ply}")
+        if not _is_ply_name(input_ply.name):
+            raise ValueError(f"input-ply 必须是 .ply / .ply.gz / .ply.zst 文件: {input_ply}")
         return [input_ply]
 
     input_dir = getattr(args, "input_dir", None)
@@ -325,7 +557,8 @@ def _resolve_input_ply_files(args: argparse.Namespace) -> list[Path]:
     raise ValueError("需要二选一提供 --input-ply 或 --input-dir")
 
 
-def _read_ply_frame(path: Path, rest_field_names: list[str] | None = None) -> PlyFrame:
+def _read_ply_columns(path: Path, rest_field_names: list[str] | None) -> dict[str, np.ndarray]:
+    # 解析 PLY 并取出用到的列(float32). rest 保持 PLY 字段顺序的 [N,R],reshape 交给 `_read_ply_frame`.
     v = _read_ply_vertices(path)
     _require_fields(
         v,
@@ -348,41 +581,198 @@ def _read_ply_frame(path: Path, rest_field_names: list[str] | None = None) -> Pl
         ],
     )
 
-    positions = np.stack([v["x"], v["y"], v["z"]], axis=1).astype(np.float32, copy=False)
-    f_dc = np.stack([v["f_dc_0"], v["f_dc_1"], v["f_dc_2"]], axis=1).astype(np.float32, copy=False)
-    opacity_raw = v["opacity"].astype(np.float32, copy=False)
-    scale_raw = np.stack([v["scale_0"], v["scale_1"], v["scale_2"]], axis=1).astype(np.float32, copy=False)
-    rot_raw = np.stack([v["rot_0"], v["rot_1"], v["rot_2"], v["rot_3"]], axis=1).astype(np.float32, copy=False)
+    columns = {
+        "positions": _gather_columns(v, ["x", "y", "z"]),
+        "f_dc": _gather_columns(v, ["f_dc_0", "f_dc_1", "f_dc_2"]),
+        "opacity_raw": np.array(v["opacity"], dtype=np.float32),
+        "scale_raw": _gather_columns(v, ["scale_0", "scale_1", "scale_2"]),
+        "rot_raw": _gather_columns(v, ["rot_0", "rot_1", "rot_2", "rot_3"]),
+    }
+    if rest_field_names:
+        _require_fields(v, path, rest_field_names)
+        columns["rest"] = _gather_columns(v, rest_field_names)
+    return columns
+
+
+def _read_ply_frame(
+    path: Path,
+    rest_field_names: list[str] | None = None,
+    decode_cache: Optional["_PlyDecodeCache"] = None,
+) -> PlyFrame:
+    if decode_cache is not None:
+        columns = decode_cache.load(path, rest_field_names)
+    else:
+        columns = _read_ply_columns(path, rest_field_names)
 
     rest = None
     if rest_field_names:
-        _require_fields(v, path, rest_field_names)
-        flat = np.stack([v[name] for name in rest_field_names], axis=1).astype(np.float32, copy=False)
+        flat = columns["rest"]
         if flat.shape[1] % 3 != 0:
             raise ValueError(f"{path}: `f_rest_*` 字段数量不是 3 的倍数: {flat.shape[1]}")
         rest_coeff_count = flat.shape[1] // 3
         # `f_rest_*` 的字段顺序要和仓库现有 PLY importer 保持一致:
         # 先写完全部 R coeff,再写 G coeff,最后写 B coeff.
         # 这里如果直接按 `RGBRGB...` reshape,会把灰色材质错误染成彩色.
-        rest = np.stack(
-            [
-                flat[:, 0:rest_coeff_count],
-                flat[:, rest_coeff_count : rest_coeff_count * 2],
-                flat[:, rest_coeff_count * 2 : rest_coeff_count * 3],
-            ],
-            axis=2,
-        )
+        # [N,3,coeff] -> [N,coeff,3] 只是转置 view,不再额外拷贝一份 rest.
+        rest = flat.reshape(flat.shape[0], 3, rest_coeff_count).transpose(0, 2, 1)
 
     return PlyFrame(
-        positions=positions,
-        f_dc=f_dc,
-        opacity_raw=opacity_raw,
-        scale_raw=scale_raw,
-        rot_raw=rot_raw,
+        positions=columns["positions"],
+        f_dc=columns["f_dc"],
+        opacity_raw=columns["opacity_raw"],
+        scale_raw=columns["scale_raw"],
+        rot_raw=columns["rot_raw"],
         rest=rest,
     )
 
 
+# -----------------------------------------------------------------------------
+# 跨运行的逐帧解码缓存(`--decode-cache-dir`)
+# -----------------------------------------------------------------------------
+
+_DECODE_CACHE_LAYOUT = "v1"
+_DECODE_CACHE_COLUMNS: tuple[str, ...] = ("positions", "f_dc", "opacity_raw", "scale_raw", "rot_raw", "rest")
+_DECODE_CACHE_HASH_CHUNK = 1 << 20
+
+
+class _PlyDecodeCache:
+    """
+    把 `_read_ply_columns` 的结果按帧落盘为一组 `.npy`,下次运行命中时直接 memmap 读回.
+
+    目录布局与 `ply_sequence_to_sog4d.py` 的同名缓存一致,两个工具可以共用一个 `--decode-cache-dir`:
+    - `v1/keys/<路径+size+mtime_ns 的 hash>.json`: 该文件当时的内容 hash.
+    - `v1/frames/<内容 hash>-<rest 字段签名>/<列名>.npy`: 未解释的原始列,rest 是 PLY 字段顺序的 [N,R].
+    - 条目目录的 mtime 即 LRU 时间戳,总大小超过预算时从最旧的条目开始删.
+      淘汰后,内容已没有任何条目的 key 记录一并删除.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root / _DECODE_CACHE_LAYOUT
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None
+        for sub in ("keys", "frames", "tmp"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _content_hash(self, path: Path) -> str:
+        st = path.stat()
+        resolved = str(path.resolve())
+        key = hashlib.blake2b(f"{resolved}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8"), digest_size=16).hexdigest()
+        key_path = self.root / "keys" / f"{key}.json"
+        try:
+            return str(json.loads(key_path.read_text(encoding="utf-8"))["content"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        h = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as fp:
+            for chunk in iter(lambda: fp.read(_DECODE_CACHE_HASH_CHUNK), b""):
+                h.update(chunk)
+        content = h.hexdigest()
+        st2 = path.stat()
+        if (st2.st_size, st2.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            record = {"path": resolved, "size": st.st_size, "mtimeNs": st.st_mtime_ns, "content": content}
+            tmp = self.root / "tmp" / f"{key}.{os.getpid()}.json"
+            tmp.write_text(json.dumps(record), encoding="utf-8")
+            os.replace(tmp, key_path)
+        return content
+
+    def _entry_dir(self, content: str, rest_field_names: list[str] | None) -> Path:
+        if rest_field_names:
+            sig = hashlib.blake2b(",".join(rest_field_names).encode("utf-8"), digest_size=6).hexdigest()
+        else:
+            sig = "norest"
+        return self.root / "frames" / f"{content}-{sig}"
+
+    def _load_entry(self, entry: Path, with_rest: bool) -> Optional[dict[str, np.ndarray]]:
+        columns: dict[str, np.ndarray] = {}
+        try:
+            for name in _DECODE_CACHE_COLUMNS:
+                if name == "rest" and not with_rest:
+                    continue
+                columns[name] = np.load(entry / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return columns
+
+    def load(self, path: Path, rest_field_names: list[str] | None) -> dict[str, np.ndarray]:
+        entry = self._entry_dir(self._content_hash(path), rest_field_names)
+        columns = self._load_entry(entry, bool(rest_field_names))
+        if columns is not None:
+            self.hits += 1
+            return columns
+        self.misses += 1
+        columns = _read_ply_columns(path, rest_field_names)
+        self._store(entry, columns)
+        return columns
+
+    def _store(self, entry: Path, columns: dict[str, np.ndarray]) -> None:
+        tmp = Path(tempfile.mkdtemp(prefix=f"{entry.name}.", dir=self.root / "tmp"))
+        size = 0
+        for name, arr in columns.items():
+            p = tmp / f"{name}.npy"
+            np.save(p, np.ascontiguousarray(arr), allow_pickle=False)
+            size += p.stat().st_size
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        if self._bytes is not None:
+            self._bytes += size
+        if self._bytes is None or self._bytes > self.max_bytes:
+            self.evict(keep=entry)
+
+    def _scan(self) -> tuple[list[tuple[float, int, Path]], int]:
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        for entry in (self.root / "frames").iterdir():
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except OSError:
+                continue
+            total += size
+        return entries, total
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        entries, total = self._scan()
+        entries.sort(key=lambda e: e[0])
+        for _mtime, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        self._bytes = total
+        self._prune_keys()
+
+    def _prune_keys(self) -> None:
+        # key 记录只是 "路径+stat -> 内容 hash" 的索引,内容的所有条目都没了就没有保留的意义.
+        live = {entry.name.rsplit("-", 1)[0] for entry in (self.root / "frames").iterdir()}
+        for key_path in (self.root / "keys").glob("*.json"):
+            try:
+                content = str(json.loads(key_path.read_text(encoding="utf-8"))["content"])
+            except (OSError, ValueError, KeyError):
+                content = ""
+            if content not in live:
+                try:
+                    key_path.unlink()
+                except OSError:
+                    continue
+
+    def summary(self) -> str:
+        _, total = self._scan()
+        return (
+            f"decode cache: hits={self.hits}, misses={self.misses}, "
+            f"size={total / (1 << 20):.1f} MiB / budget {self.max_bytes / (1 << 20):.1f} MiB ({self.root})"
+        )
+
+
 # -----------------------------------------------------------------------------
 # 数值与量化
 # -----------------------------------------------------------------------------
@@ -441,7 +831,16 @@ def _quantize_0_1_to_u8(x: np.ndarray) -> np.ndarray:
     return np.clip(np.round(x * 255.0), 0, 255).astype(np.uint8)
 
 
-def _weighted_choice_no_replace(rng: np.random.Generator, n: int, size: int, weights: np.ndarray) -> np.ndarray:
+_WEIGHTED_SAMPLERS = ("numpy", "a-es")
+
+
+def _weighted_choice_no_replace(
+    rng: np.random.Generator,
+    n: int,
+    size: int,
+    weights: np.ndarray,
+    method: str = "numpy",
+) -> np.ndarray:
     size = int(min(size, n))
     if size <= 0:
         return np.empty((0,), dtype=np.int32)
@@ -461,9 +860,29 @@ def _weighted_choice_no_replace(rng: np.random.Generator, n: int, size: int, wei
     if size <= 0:
         return np.empty((0,), dtype=np.int32)
 
+    if method == "a-es":
+        return _a_es_choice(rng, w, size)
     return rng.choice(n, size=size, replace=False, p=p)
 
 
+def _a_es_choice(rng: np.random.Generator, weights: np.ndarray, size: int) -> np.ndarray:
+    # A-ES(Efraimidis-Spirakis)的指数 key 形式:
+    # - key_i = E_i / w_i, E_i ~ Exp(1).
+    # - key 最小的 size 个,就是一次按权重、不放回的抽样.
+    # argpartition 是 O(n),只对选中的 size 个排序.返回顺序即“被抽中的先后”.
+    # 权重 <=0 的项 key=inf,不会被选中,因此 size 还要 clamp 到正权重数量.
+    w = np.asarray(weights, dtype=np.float64)
+    size = min(size, int(np.count_nonzero(w > 0.0)))
+    keys = rng.standard_exponential(w.shape[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = np.where(w > 0.0, keys / w, np.inf)
+    if size < keys.shape[0]:
+        idx = np.argpartition(keys, size - 1)[:size]
+    else:
+        idx = np.arange(keys.shape[0])
+    return idx[np.argsort(keys[idx], kind="stable")]
+
+
 # -----------------------------------------------------------------------------
 # v1 record 构造
 # -----------------------------------------------------------------------------
@@ -562,10 +981,14 @@ def _run_average_mode(
     output_path: Path,
     scale_mode: str,
     opacity_mode: str,
+    profiler: _StageProfiler,
+    decode_cache: Optional[_PlyDecodeCache] = None,
 ) -> None:
-    first = _read_ply_frame(ply_files[0])
+    with profiler.stage("ply_read", 0):
+        first = _read_ply_frame(ply_files[0], decode_cache=decode_cache)
     if len(ply_files) >= 2:
-        last = _read_ply_frame(ply_files[-1])
+        with profiler.stage("ply_read", len(ply_files) - 1):
+            last = _read_ply_frame(ply_files[-1], decode_cache=decode_cache)
         if last.positions.shape != first.positions.shape:
             raise ValueError(
                 "首帧与末帧点数不一致,无法按 index 对齐计算 velocity.\n"
@@ -575,21 +998,22 @@ def _run_average_mode(
     else:
         velocities = np.zeros_like(first.positions, dtype=np.float32)
 
-    rec = _build_records(
-        positions=first.positions,
-        velocities=velocities,
-        f_dc=first.f_dc,
-        opacity_raw=first.opacity_raw,
-        scale_raw=first.scale_raw,
-        rot_raw=first.rot_raw,
-        time0=0.0,
-        duration=1.0,
-        scale_mode=scale_mode,
-        opacity_mode=opacity_mode,
-    )
+    with profiler.stage("build_records"):
+        rec = _build_records(
+            positions=first.positions,
+            velocities=velocities,
+            f_dc=first.f_dc,
+            opacity_raw=first.opacity_raw,
+            scale_raw=first.scale_raw,
+            rot_raw=first.rot_raw,
+            time0=0.0,
+            duration=1.0,
+            scale_mode=scale_mode,
+            opacity_mode=opacity_mode,
+        )
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("wb") as fp:
+    with profiler.stage("write"), output_path.open("wb") as fp:
         _write_records(fp, rec)
 
     print(f"[OK] wrote {len(rec):,} splats -> {output_path}")
@@ -602,6 +1026,8 @@ def _run_keyframe_mode(
     frame_step: int,
     scale_mode: str,
     opacity_mode: str,
+    profiler: _StageProfiler,
+    decode_cache: Optional[_PlyDecodeCache] = None,
 ) -> None:
     if frame_step <= 0:
         raise ValueError("--frame-step must be > 0")
@@ -619,8 +1045,10 @@ def _run_keyframe_mode(
             if j <= i:
                 break
 
-            a = _read_ply_frame(ply_files[i])
-            b = _read_ply_frame(ply_files[j])
+            with profiler.stage("ply_read", i):
+                a = _read_ply_frame(ply_files[i], decode_cache=decode_cache)
+            with profiler.stage("ply_read", j):
+                b = _read_ply_frame(ply_files[j], decode_cache=decode_cache)
 
             if b.positions.shape != a.positions.shape:
                 raise ValueError(
@@ -635,19 +1063,21 @@ def _run_keyframe_mode(
             velocities = (b.positions - a.positions).astype(np.float32) / np.float32(dt)
             t0 = i / float(n_frames - 1)
 
-            rec = _build_records(
-                positions=a.positions,
-                velocities=velocities,
-                f_dc=a.f_dc,
-                opacity_raw=a.opacity_raw,
-                scale_raw=a.scale_raw,
-                rot_raw=a.rot_raw,
-                time0=t0,
-                duration=dt,
-                scale_mode=scale_mode,
-                opacity_mode=opacity_mode,
-            )
-            _write_records(out, rec)
+            with profiler.stage("build_records", i):
+                rec = _build_records(
+                    positions=a.positions,
+                    velocities=velocities,
+                    f_dc=a.f_dc,
+                    opacity_raw=a.opacity_raw,
+                    scale_raw=a.scale_raw,
+                    rot_raw=a.rot_raw,
+                    time0=t0,
+                    duration=dt,
+                    scale_mode=scale_mode,
+                    opacity_mode=opacity_mode,
+                )
+            with profiler.stage("write", i):
+                _write_records(out, rec)
             total_records += len(rec)
             segments += 1
 
@@ -693,7 +1123,353 @@ def _build_sh_importance_weights(frame: PlyFrame, scale_mode: str, opacity_mode:
     return np.maximum(opacity * volume, 0.0)
 
 
-def _fit_weighted_minibatch_kmeans(
+# -----------------------------------------------------------------------------
+# 内置 k-means(float32, 真实 sample weight)
+# -----------------------------------------------------------------------------
+#
+# 替代 sklearn MiniBatchKMeans:
+# - 初始化: 加权 greedy k-means++(每个中心 `2 + log(k)` 个候选,逐个更新 D^2),候选距离走 GEMM.
+#   k >= 4096 时先粗分块,块内各自做 greedy k-means++,避免 O(k^2).
+# - 迭代: lloyd(全量 E/M 步) 或 minibatch(sklearn 同款按簇学习率的小批量更新,带低计数中心重分配).
+# - 距离: `_CentroidAssigner`(行块 x 中心块的分块 GEMM + running argmin,线程池并行).
+# - BLAS 固定 1 线程: 结果与线程数无关,可复现.
+
+_KMEANS_ALGORITHMS = ("lloyd", "minibatch")
+_KMEANS_REASSIGN_RATIO = 0.01  # minibatch: counts 低于最大值该比例的中心会被重分配
+_KMEANS_INIT_CELL_K = 1024  # k-means++: k >= 4 倍该值时先分块,每块约这么多个中心
+_ASSIGN_ROW_BLOCK = 2048  # 分配时每个行块的样本数
+_ASSIGN_CENTROID_BLOCK = 1024  # 分配时每个中心块的中心数
+
+
+@dataclass(frozen=True)
+class _KMeansConfig:
+    algorithm: str = "minibatch"
+    max_iter: int = 100
+    tol: float = 1e-4
+    threads: int = 0
+    batch_size: int = 4096
+
+    @property
+    def thread_count(self) -> int:
+        return int(self.threads) if self.threads > 0 else max(1, os.cpu_count() or 1)
+
+
+@dataclass
+class _KMeansModel:
+    centroids: np.ndarray  # [K,D] float32
+    inertia: float
+    n_iter: int
+    _assigner: Optional[_CentroidAssigner] = field(default=None, init=False, repr=False, compare=False)
+
+    def predict(self, x: np.ndarray, threads: int = 1) -> np.ndarray:
+        # assigner 延迟构建并缓存: 逐帧 predict 复用同一份中心范数与分块.
+        if self._assigner is None:
+            self._assigner = _CentroidAssigner(self.centroids)
+        with _blas_single_thread():
+            labels, _ = self._assigner.assign(x, threads)
+        return labels
+
+
+@contextmanager
+def _blas_single_thread() -> Iterator[None]:
+    # 线程池按行块并行时 BLAS 只用 1 线程: 既避免超订,也让结果不随线程数变化.
+    try:
+        from threadpoolctl import threadpool_limits
+    except Exception:  # pragma: no cover - 缺失时沿用 BLAS 默认线程数
+        yield
+        return
+    with threadpool_limits(1):
+        yield
+
+
+class _CentroidAssigner:
+    """
+    最近中心分配引擎(k-means 迭代与逐帧 labels 共用).
+
+    - 中心按 `_ASSIGN_CENTROID_BLOCK` 分块,预先存成 [-2c | ||c||^2] 的转置.
+      中心范数只算一次,同一个 codebook 跨帧复用.
+    - 行块补一列 1 后与各中心块做 GEMM,直接得到 ||c||^2 - 2x·c;逐块做 running argmin,
+      不会生成完整的 [B,K] 距离矩阵,单块内存约 `_ASSIGN_ROW_BLOCK * _ASSIGN_CENTROID_BLOCK * 4` 字节.
+    - 行块在线程池里并行. 调用方应在 `_blas_single_thread()` 内调用,结果与线程数无关.
+    """
+
+    def __init__(self, centroids: np.ndarray) -> None:
+        c = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_count = int(c.shape[0])
+        self.dim = int(c.shape[1])
+        c_norm2 = np.einsum("ij,ij->i", c, c)
+        aug = np.concatenate([-2.0 * c, c_norm2[:, None]], axis=1).astype(np.float32, copy=False)
+        self.blocks: list[tuple[int, np.ndarray]] = [
+            (start, np.ascontiguousarray(aug[start : start + _ASSIGN_CENTROID_BLOCK].T))
+            for start in range(0, self.centroid_count, _ASSIGN_CENTROID_BLOCK)
+        ]
+
+    def assign(self, x: np.ndarray, threads: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        返回 (labels[N] int64, dist2[N] float32).
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        n = x.shape[0]
+        labels = np.empty((n,), dtype=np.int64)
+        dist2 = np.empty((n,), dtype=np.float32)
+
+        def run(start: int) -> None:
+            end = min(start + _ASSIGN_ROW_BLOCK, n)
+            rows = end - start
+            xa = np.empty((rows, self.dim + 1), dtype=np.float32)
+            xa[:, : self.dim] = x[start:end]
+            xa[:, self.dim] = 1.0
+            best = np.full((rows,), np.inf, dtype=np.float32)
+            best_label = np.zeros((rows,), dtype=np.int64)
+            row_ids = np.arange(rows)
+            for c_start, block_t in self.blocks:
+                d = xa @ block_t  # [rows,Kb]
+                arg = np.argmin(d, axis=1)
+                val = d[row_ids, arg]
+                # 严格小于: 并列时保留更早的中心,与一次性 argmin 的结果一致.
+                better = val < best
+                best[better] = val[better]
+                best_label[better] = arg[better] + c_start
+            labels[start:end] = best_label
+            xb = x[start:end]
+            dist2[start:end] = np.maximum(best + np.einsum("ij,ij->i", xb, xb), 0.0)
+
+        starts = range(0, n, _ASSIGN_ROW_BLOCK)
+        if threads <= 1 or n <= _ASSIGN_ROW_BLOCK:
+            for start in starts:
+                run(start)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(run, starts))
+        return labels, dist2
+
+
+def _kmeans_plusplus(x: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    # 加权 greedy k-means++(与 sklearn `kmeans_plusplus` 同一算法):
+    # - 每选一个中心前按 w*D^2 抽 `2 + log(k)` 个候选,取能让总势能 sum(w*D^2) 最小的那个.
+    # - 每选一个中心就更新一次 D^2. 一批中心共用同一份旧 D^2 时会扎堆落进同一个密集簇,后续迭代也救不回来.
+    # - 候选到全部点的距离是一次 [trials,D]x[D,N] 的 GEMM,x 预先转置成行连续.
+    n = x.shape[0]
+    if not float(w.sum()) > 0.0:
+        # 子集里没有正权重的点(权重大多为 0 时可能抽到): 退化为等权.
+        w = np.ones_like(w)
+    trials = 2 + int(math.log(k))
+    xt = np.ascontiguousarray(x.T)
+    x_norm2 = np.einsum("ij,ij->i", x, x)
+    w32 = w.astype(np.float32)
+    chosen = np.empty((k,), dtype=np.int64)
+    chosen[0] = int(rng.choice(n, p=w / w.sum()))
+    c0 = x[chosen[0]]
+    d2 = np.maximum(x_norm2 + np.float32(c0 @ c0) - 2.0 * (c0 @ xt), 0.0).astype(np.float32)
+    for i in range(1, k):
+        cum = np.cumsum(w * d2, dtype=np.float64)
+        # 势能为 0: 不同的点已经不足 k 个,剩下的中心随便取(之后按空簇处理).
+        cand = np.searchsorted(cum, rng.random(trials) * cum[-1])
+        np.clip(cand, 0, n - 1, out=cand)
+        c = x[cand]  # [T,D]
+        dc = c @ xt  # [T,N]
+        dc *= -2.0
+        dc += x_norm2[None, :]
+        dc += np.einsum("ij,ij->i", c, c)[:, None]
+        np.maximum(dc, 0.0, out=dc)
+        np.minimum(dc, d2[None, :], out=dc)
+        best = int(np.argmin(dc @ w32))
+        chosen[i] = cand[best]
+        d2 = dc[best].copy()
+    return x[chosen].astype(np.float32, copy=True)
+
+
+def _kmeans_init(x: np.ndarray, w: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    # greedy k-means++ 是 O(k * N * trials),子集又随 k 增长(N >= 3k),整体 O(k^2): k=8192 要十几秒,65535 要十几分钟.
+    # k 大时先用 k-means++ 把子集粗分成 k/_KMEANS_INIT_CELL_K 块,按块内权重分配中心数,再在每块里做 greedy k-means++.
+    # 代价降到 O(k * cell_k),之后 Lloyd/mini-batch 会修正块边界附近的中心.
+    cells = k // _KMEANS_INIT_CELL_K
+    if cells < 4:
+        return _kmeans_plusplus(x, w, k, rng)
+    coarse = _kmeans_plusplus(x, w, cells, rng)
+    owner, _ = _CentroidAssigner(coarse).assign(x)
+    rows = np.bincount(owner, minlength=cells)
+    mass = np.bincount(owner, weights=w, minlength=cells)
+    share = k * mass / mass.sum() if float(mass.sum()) > 0.0 else k * rows / rows.sum()
+    # 按份额取整,每块不超过块内点数; 余下的中心按小数部分从大到小补齐.
+    alloc = np.minimum(np.floor(share).astype(np.int64), rows)
+    while int(alloc.sum()) < k:
+        priority = np.where(alloc < rows, share - alloc, -np.inf)
+        top = np.argsort(-priority, kind="stable")[: k - int(alloc.sum())]
+        alloc[top[np.isfinite(priority[top])]] += 1
+    centers = []
+    for j in np.flatnonzero(alloc):
+        ids = np.flatnonzero(owner == j)
+        centers.append(_kmeans_plusplus(x[ids], w[ids], int(alloc[j]), rng))
+    return np.concatenate(centers, axis=0)
+
+
+def _kmeans_weighted_sums(
+    x: np.ndarray, w: np.ndarray, labels: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    wsum = np.bincount(labels, weights=w, minlength=k)
+    sums = np.empty((k, x.shape[1]), dtype=np.float64)
+    for j in range(x.shape[1]):
+        sums[:, j] = np.bincount(labels, weights=w * x[:, j], minlength=k)
+    return wsum, sums
+
+
+def _kmeans_lloyd(
+    x: np.ndarray, w: np.ndarray, centers: np.ndarray, cfg: _KMeansConfig, tol_abs: float, threads: int
+) -> tuple[np.ndarray, float, int]:
+    k = centers.shape[0]
+    prev_labels: Optional[np.ndarray] = None
+    inertia = float("inf")
+    it = 0
+    for it in range(1, int(cfg.max_iter) + 1):
+        labels, d2 = _CentroidAssigner(centers).assign(x, threads)
+        inertia = float(np.dot(w, d2))
+        wsum, sums = _kmeans_weighted_sums(x, w, labels, k)
+
+        new = centers.astype(np.float64, copy=True)
+        filled = wsum > 0.0
+        new[filled] = sums[filled] / wsum[filled, None]
+        empty = np.flatnonzero(~filled)
+        if empty.shape[0] > 0:
+            # 空簇: 搬到当前加权误差最大的点上.
+            far = np.argpartition(-(w * d2), empty.shape[0] - 1)[: empty.shape[0]]
+            new[empty] = x[far]
+        new32 = new.astype(np.float32)
+
+        shift = float(np.sum((new32 - centers) ** 2, dtype=np.float64))
+        centers = new32
+        if prev_labels is not None and np.array_equal(labels, prev_labels):
+            break
+        if shift <= tol_abs:
+            break
+        prev_labels = labels
+    return centers, inertia, it
+
+
+def _kmeans_minibatch(
+    x: np.ndarray,
+    w: np.ndarray,
+    centers: np.ndarray,
+    cfg: _KMeansConfig,
+    tol_abs: float,
+    rng: np.random.Generator,
+    threads: int,
+) -> tuple[np.ndarray, float, int]:
+    # sklearn 同款: 每个中心有累计权重 counts,步长 = 本批权重 / counts.
+    # 停止条件: 一个 epoch 内中心平方位移 <= tol,或批 inertia 的 EWA 连续 10 步没有改善.
+    # 低计数中心重分配(同 sklearn `reassignment_ratio=0.01`): 每看过约 10*k 个样本(或有中心从未命中)时,
+    # counts 低于最大值 1% 的中心搬到本批随机抽的样本上,避免中心永久困在稀疏区域.
+    n, _ = x.shape
+    k = centers.shape[0]
+    batch = int(min(max(1, cfg.batch_size), n))
+    steps_per_epoch = max(1, -(-n // batch))
+    centers = centers.astype(np.float64, copy=True)
+    counts = np.zeros((k,), dtype=np.float64)
+    alpha = min(1.0, 2.0 * batch / (n + 1))
+    ewa: Optional[float] = None
+    best = float("inf")
+    no_improve = 0
+    epoch_shift = 0.0
+    epoch = 0
+    since_reassign = 0
+    for step in range(int(cfg.max_iter) * steps_per_epoch):
+        idx = rng.integers(0, n, batch)
+        xb = x[idx]
+        wb = w[idx]
+        labels, d2 = _CentroidAssigner(centers).assign(xb, threads)
+        batch_inertia = float(np.dot(wb, d2)) / batch
+
+        wsum, sums = _kmeans_weighted_sums(xb, wb, labels, k)
+        hit = wsum > 0.0
+        counts[hit] += wsum[hit]
+        delta = (sums[hit] - wsum[hit, None] * centers[hit]) / counts[hit, None]
+        centers[hit] += delta
+        epoch_shift += float(np.sum(delta * delta))
+
+        since_reassign += batch
+        if (counts == 0.0).any() or since_reassign >= 10 * k:
+            since_reassign = 0
+            low = np.flatnonzero(counts < _KMEANS_REASSIGN_RATIO * counts.max())
+            # 新位置只从本批正权重的行里抽; 一个都没有时这次跳过.
+            pos = np.flatnonzero(wb > 0.0)
+            cap = min(batch // 2, pos.shape[0])
+            if low.shape[0] > cap:
+                low = low[np.argsort(counts[low], kind="stable")[:cap]]
+            if low.shape[0] > 0:
+                pick = rng.choice(pos, size=low.shape[0], replace=False, p=wb[pos] / wb[pos].sum())
+                centers[low] = xb[pick]
+                kept = np.ones((k,), dtype=bool)
+                kept[low] = False
+                counts[low] = counts[kept].min() if kept.any() else 0.0
+
+        ewa = batch_inertia if ewa is None else ewa * (1.0 - alpha) + batch_inertia * alpha
+        if ewa < best:
+            best = ewa
+            no_improve = 0
+        else:
+            no_improve += 1
+        if no_improve >= 10:
+            break
+        if (step + 1) % steps_per_epoch == 0:
+            epoch += 1
+            if epoch_shift <= tol_abs:
+                break
+            epoch_shift = 0.0
+
+    c32 = centers.astype(np.float32)
+    _, d2 = _CentroidAssigner(c32).assign(x, threads)
+    return c32, float(np.dot(w, d2)), epoch + 1
+
+
+def _kmeans_fit(
+    x: np.ndarray,
+    weights: Optional[np.ndarray],
+    k: int,
+    seed: int,
+    cfg: _KMeansConfig,
+    init: Optional[np.ndarray] = None,
+) -> _KMeansModel:
+    """
+    加权 k-means. x: [N,D], weights: [N] 或 None(等权). 要求 1 <= k <= N.
+    init: 可选的初始中心 [k,D](例如复用已有 bundle 的 codebook),给出时跳过 k-means++.
+    """
+    if cfg.algorithm not in _KMEANS_ALGORITHMS:
+        raise ValueError(f"未知 k-means 算法: {cfg.algorithm}")
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    n = x.shape[0]
+    w = np.ones((n,), dtype=np.float64) if weights is None else np.asarray(weights, dtype=np.float64)
+    w = np.where(np.isfinite(w) & (w > 0.0), w, 0.0)
+    s = float(w.sum())
+    if not (math.isfinite(s) and s > 0.0):
+        w = np.ones((n,), dtype=np.float64)
+    else:
+        # 归一到均值 1,避免 importance 很小时 float 累加失真.
+        w = w * (n / s)
+
+    rng = np.random.default_rng(seed)
+    threads = cfg.thread_count
+    # 与 sklearn 的 tol 语义一致: 相对于数据各维方差的均值.
+    tol_abs = float(cfg.tol) * float(np.mean(np.var(x, axis=0, dtype=np.float64)))
+    with _blas_single_thread():
+        # 与 sklearn 一样只在子集上做 k-means++,子集大小 max(3*batch, 3*k).
+        init_n = min(n, max(3 * int(cfg.batch_size), 3 * k))
+        if init is not None:
+            centers = np.array(init, dtype=np.float32, copy=True)
+            if centers.shape != (k, x.shape[1]):
+                raise ValueError(f"k-means init 形状不匹配: got {centers.shape}, expected {(k, x.shape[1])}")
+        elif init_n < n:
+            init_idx = np.sort(rng.choice(n, size=init_n, replace=False))
+            centers = _kmeans_init(x[init_idx], w[init_idx], k, rng)
+        else:
+            centers = _kmeans_init(x, w, k, rng)
+        if cfg.algorithm == "lloyd":
+            centers, inertia, n_iter = _kmeans_lloyd(x, w, centers, cfg, tol_abs, threads)
+        else:
+            centers, inertia, n_iter = _kmeans_minibatch(x, w, centers, cfg, tol_abs, rng, threads)
+    return _KMeansModel(centroids=centers, inertia=inertia, n_iter=n_iter)
+
+
+def _fit_weighted_kmeans(
     *,
     name: str,
     features: np.ndarray,
@@ -701,15 +1477,38 @@ def _fit_weighted_minibatch_kmeans(
     codebook_count: int,
     seed: int,
     max_fit_samples: int,
+    weighted_sampler: str,
+    kmeans_cfg: _KMeansConfig,
+    profiler: _StageProfiler,
+    reuse_centroids: Optional[np.ndarray] = None,
+    reuse_mode: str = "direct",
 ) -> tuple[np.ndarray, np.ndarray]:
-    if MiniBatchKMeans is None:
-        raise ValueError(f"{name}: 当前环境缺少 scikit-learn,无法生成 SH codebook. 请安装 sklearn")
+    # reuse_centroids: `--reuse-codebooks` 读回的同 band centroids.
+    # - reuse_mode=direct: 不拟合,直接用它分配 labels.
+    # - reuse_mode=init: 作为 k-means 初始中心,k 以它为准.
     if features.ndim != 2:
         raise ValueError(f"{name}: features 必须是 2D, got {features.shape}")
     if features.shape[0] == 0:
         raise ValueError(f"{name}: 没有可用样本")
     if codebook_count <= 0:
         raise ValueError(f"{name}: codebookCount 必须 > 0, got {codebook_count}")
+    if reuse_centroids is not None:
+        if reuse_centroids.shape[1] != features.shape[1]:
+            raise ValueError(
+                f"{name}: 复用的 centroids 维度不匹配: got {reuse_centroids.shape[1]}, expected {features.shape[1]}"
+            )
+        if reuse_centroids.shape[0] != codebook_count:
+            _print_warn(f"{name}: 复用的 codebook 有 {reuse_centroids.shape[0]} 项,忽略 codebookCount={codebook_count}")
+        codebook_count = int(reuse_centroids.shape[0])
+        if reuse_mode == "init" and features.shape[0] < codebook_count:
+            _print_warn(f"{name}: 样本数 {features.shape[0]} < k={codebook_count},直接使用复用的 codebook")
+            reuse_mode = "direct"
+        if reuse_mode == "direct":
+            _print_info(f"{name}: reusing {codebook_count} centroids, skip k-means")
+            km = _KMeansModel(
+                centroids=np.ascontiguousarray(reuse_centroids, dtype=np.float32), inertia=float("nan"), n_iter=0
+            )
+            return km.centroids, _predict_labels_u16(name, km, features, kmeans_cfg, profiler)
 
     effective_k = min(int(codebook_count), features.shape[0], 65535)
     if effective_k != codebook_count:
@@ -722,27 +1521,38 @@ def _fit_weighted_minibatch_kmeans(
 
     rng = np.random.default_rng(seed)
     fit_sample_count = min(features.shape[0], max(max_fit_samples, effective_k))
-    fit_idx = _weighted_choice_no_replace(rng, features.shape[0], fit_sample_count, weights)
-    if fit_idx.size == 0:
-        fit_x = features.astype(np.float32, copy=False)
-    else:
-        fit_x = features[fit_idx].astype(np.float32, copy=False)
+    with profiler.stage(f"sampling:{name}"):
+        fit_idx = _weighted_choice_no_replace(rng, features.shape[0], fit_sample_count, weights, weighted_sampler)
+        if fit_idx.size == 0:
+            fit_x = features.astype(np.float32, copy=False)
+        else:
+            fit_x = features[fit_idx].astype(np.float32, copy=False)
 
+    # 拟合样本已经按权重抽过,这里等权拟合,避免权重被重复计入.
     _print_info(
-        f"{name}: fitting MiniBatchKMeans(k={effective_k}, sample={fit_x.shape[0]}, dim={fit_x.shape[1]})"
+        f"{name}: fitting k-means(k={effective_k}, sample={fit_x.shape[0]}, dim={fit_x.shape[1]}, "
+        f"algorithm={kmeans_cfg.algorithm}, threads={kmeans_cfg.thread_count}"
+        + (", init=reused)" if reuse_centroids is not None else ")")
     )
-    km = MiniBatchKMeans(n_clusters=effective_k, random_state=seed, batch_size=4096, n_init=3)
-    km.fit(fit_x)
+    with profiler.stage(f"kmeans_fit:{name}"):
+        km = _kmeans_fit(fit_x, None, effective_k, seed, kmeans_cfg, init=reuse_centroids)
+    _print_info(f"{name}: k-means done (iter={km.n_iter}, inertia={km.inertia:.6g})")
+    return km.centroids, _predict_labels_u16(name, km, features, kmeans_cfg, profiler)
+
 
+def _predict_labels_u16(
+    name: str, km: _KMeansModel, features: np.ndarray, kmeans_cfg: _KMeansConfig, profiler: _StageProfiler
+) -> np.ndarray:
     labels = np.empty((features.shape[0],), dtype=np.uint16)
     batch_size = 65536
-    for start in range(0, features.shape[0], batch_size):
-        end = min(start + batch_size, features.shape[0])
-        labels[start:end] = km.predict(features[start:end].astype(np.float32, copy=False)).astype(np.uint16)
-        if features.shape[0] > batch_size and start == 0:
-            _print_info(f"{name}: predicting labels in batches of {batch_size}")
-
-    return km.cluster_centers_.astype(np.float32, copy=False), labels
+    with profiler.stage(f"predict:{name}"):
+        for start in range(0, features.shape[0], batch_size):
+            end = min(start + batch_size, features.shape[0])
+            chunk = features[start:end].astype(np.float32, copy=False)
+            labels[start:end] = km.predict(chunk, kmeans_cfg.thread_count).astype(np.uint16)
+            if features.shape[0] > batch_size and start == 0:
+                _print_info(f"{name}: predicting labels in batches of {batch_size}")
+    return labels
 
 
 def _encode_centroids_bytes(centroids: np.ndarray, centroids_type: str) -> bytes:
@@ -945,6 +1755,34 @@ def _parse_splat4d_v2(path: Path) -> tuple[_ParsedV2Header, list[_ParsedV2Sectio
     return header, sections
 
 
+def _load_v2_sh_centroids(path: Path) -> dict[int, np.ndarray]:
+    """
+    `--reuse-codebooks`: 从已有 `.splat4d v2` 读回每个 band 的 SHCT centroids.
+
+    返回 band -> [K, coeffCount*3] float32. centroids 精度(f16/f32)与项数取自 META 的 band info.
+    """
+    header, sections = _parse_splat4d_v2(path)
+    data = path.read_bytes()
+    meta = next((section for section in sections if section.kind == "META"), None)
+    if meta is None or meta.length != 64:
+        raise ValueError(f"{path}: 缺少 META section,无法复用 SHCT")
+
+    out: dict[int, np.ndarray] = {}
+    for section in sections:
+        if section.kind != "SHCT" or not (1 <= section.band <= header.sh_bands):
+            continue
+        count, centroids_type, _labels_encoding, _reserved = _V2_BAND_INFO_STRUCT.unpack_from(
+            data, meta.offset + _V2_META_PREFIX_STRUCT.size + (section.band - 1) * _V2_BAND_INFO_STRUCT.size
+        )
+        _, coeff_count = _band_coeff_range(section.band)
+        dtype = "<f2" if centroids_type == 1 else "<f4"
+        payload = np.frombuffer(data, dtype=dtype, count=section.length // np.dtype(dtype).itemsize, offset=section.offset)
+        if count <= 0 or payload.shape[0] != count * coeff_count * 3:
+            raise ValueError(f"{path}: band={section.band} 的 SHCT 大小与 codebookCount={count} 不一致")
+        out[section.band] = payload.astype(np.float32).reshape(count, coeff_count * 3)
+    return out
+
+
 def _run_single_frame_v2_mode(
     *,
     ply_path: Path,
@@ -955,9 +1793,16 @@ def _run_single_frame_v2_mode(
     sh_codebook_count: int,
     sh_centroids_type: str,
     seed: int,
+    weighted_sampler: str,
+    kmeans_cfg: _KMeansConfig,
     self_check: bool,
+    profiler: _StageProfiler,
+    reuse_codebooks: Optional[Path] = None,
+    reuse_mode: str = "direct",
+    decode_cache: Optional[_PlyDecodeCache] = None,
 ) -> None:
-    vertices = _read_ply_vertices(ply_path)
+    with profiler.stage("ply_probe"):
+        vertices = _read_ply_vertices(ply_path)
     rest_fields = _find_rest_fields(vertices)
     detected_sh_bands = _detect_sh_bands_from_rest_fields(rest_fields)
 
@@ -977,20 +1822,22 @@ def _run_single_frame_v2_mode(
 
     expected_rest_coeff_count = (sh_bands + 1) * (sh_bands + 1) - 1 if sh_bands > 0 else 0
     rest_field_names = rest_fields[: expected_rest_coeff_count * 3] if sh_bands > 0 else None
-    frame = _read_ply_frame(ply_path, rest_field_names)
-
-    rec = _build_records(
-        positions=frame.positions,
-        velocities=np.zeros_like(frame.positions, dtype=np.float32),
-        f_dc=frame.f_dc,
-        opacity_raw=frame.opacity_raw,
-        scale_raw=frame.scale_raw,
-        rot_raw=frame.rot_raw,
-        time0=0.0,
-        duration=1.0,
-        scale_mode=scale_mode,
-        opacity_mode=opacity_mode,
-    )
+    with profiler.stage("ply_read", 0):
+        frame = _read_ply_frame(ply_path, rest_field_names, decode_cache)
+
+    with profiler.stage("build_records"):
+        rec = _build_records(
+            positions=frame.positions,
+            velocities=np.zeros_like(frame.positions, dtype=np.float32),
+            f_dc=frame.f_dc,
+            opacity_raw=frame.opacity_raw,
+            scale_raw=frame.scale_raw,
+            rot_raw=frame.rot_raw,
+            time0=0.0,
+            duration=1.0,
+            scale_mode=scale_mode,
+            opacity_mode=opacity_mode,
+        )
 
     sh_sections: list[_V2Section] = []
     band_infos: dict[int, _V2BandInfo] = {}
@@ -998,21 +1845,36 @@ def _run_single_frame_v2_mode(
         if frame.rest is None:
             raise ValueError("内部错误: 期望存在 SH rest,但读取结果为空")
 
-        importance = _build_sh_importance_weights(frame, scale_mode, opacity_mode)
+        with profiler.stage("sh_importance"):
+            importance = _build_sh_importance_weights(frame, scale_mode, opacity_mode)
         centroids_type_code = 1 if sh_centroids_type == "f16" else 2
 
+        reused: dict[int, np.ndarray] = {}
+        if reuse_codebooks is not None:
+            with profiler.stage("reuse_codebooks:load"):
+                reused = _load_v2_sh_centroids(reuse_codebooks)
+            _print_info(f"reuse codebooks: {reuse_codebooks} (mode={reuse_mode}, bands={sorted(reused)})")
+            missing = [band for band in range(1, sh_bands + 1) if band not in reused]
+            if missing:
+                raise ValueError(f"--reuse-codebooks: {reuse_codebooks} 缺少 band {missing} 的 SHCT")
+
         for band in range(1, sh_bands + 1):
             coeff_offset, coeff_count = _band_coeff_range(band)
             band_features = frame.rest[:, coeff_offset : coeff_offset + coeff_count, :].reshape(
                 frame.rest.shape[0], coeff_count * 3
             )
-            centroids, labels = _fit_weighted_minibatch_kmeans(
+            centroids, labels = _fit_weighted_kmeans(
                 name=f"sh{band}",
                 features=band_features,
                 weights=importance,
                 codebook_count=sh_codebook_count,
                 seed=seed + band,
                 max_fit_samples=200_000,
+                weighted_sampler=weighted_sampler,
+                kmeans_cfg=kmeans_cfg,
+                profiler=profiler,
+                reuse_centroids=reused.get(band),
+                reuse_mode=reuse_mode,
             )
             centroids3 = centroids.reshape(centroids.shape[0], coeff_count, 3)
             sh_sections.append(
@@ -1042,19 +1904,21 @@ def _run_single_frame_v2_mode(
                 f"sh{band}: codebookCount={centroids.shape[0]}, coeffCount={coeff_count}, centroidsType={centroids_type_code}"
             )
 
-    _write_splat4d_v2(
-        output_path=output_path,
-        rec=rec,
-        sh_bands=sh_bands,
-        time_model=1,
-        frame_count=1,
-        temporal_gaussian_cutoff=0.01,
-        band_infos=band_infos,
-        sh_sections=sh_sections,
-    )
+    with profiler.stage("write"):
+        _write_splat4d_v2(
+            output_path=output_path,
+            rec=rec,
+            sh_bands=sh_bands,
+            time_model=1,
+            frame_count=1,
+            temporal_gaussian_cutoff=0.01,
+            band_infos=band_infos,
+            sh_sections=sh_sections,
+        )
 
     if self_check:
-        header, sections = _parse_splat4d_v2(output_path)
+        with profiler.stage("self_check"):
+            header, sections = _parse_splat4d_v2(output_path)
         if header.splat_count != rec.shape[0]:
             raise ValueError(f"self-check: splatCount mismatch {header.splat_count} vs {rec.shape[0]}")
         if header.sh_bands != sh_bands:
@@ -1124,20 +1988,101 @@ def _build_arg_parser() -> argparse.ArgumentParser:
         help="仅对 v2+SH 有意义. SHCT 里 centroids 的存储精度",
     )
     parser.add_argument("--seed", type=int, default=1234, help="v2 SH codebook 的随机种子")
+    parser.add_argument(
+        "--weighted-sampler",
+        choices=list(_WEIGHTED_SAMPLERS),
+        default="numpy",
+        help="仅对 v2+SH 有意义. codebook 拟合样本的按权重不放回采样实现: numpy(默认,与旧版本一致) 或 a-es(指数 key,更快)",
+    )
+    parser.add_argument(
+        "--kmeans-algorithm",
+        choices=list(_KMEANS_ALGORITHMS),
+        default="minibatch",
+        help="仅对 v2+SH 有意义. SH codebook 拟合算法: minibatch(默认,快) 或 lloyd(全量迭代,误差更小但更慢)",
+    )
+    parser.add_argument(
+        "--kmeans-max-iter",
+        type=int,
+        default=100,
+        help="仅对 v2+SH 有意义. k-means 迭代预算(lloyd: 迭代次数, minibatch: epoch 数)",
+    )
+    parser.add_argument(
+        "--kmeans-tol",
+        type=float,
+        default=1e-4,
+        help="仅对 v2+SH 有意义. k-means 收敛阈值(相对数据方差的中心平方位移)",
+    )
+    parser.add_argument(
+        "--kmeans-threads",
+        type=int,
+        default=0,
+        help="仅对 v2+SH 有意义. k-means 与 labels 分配的线程数(0=CPU 核数). 结果与线程数无关",
+    )
+    parser.add_argument(
+        "--reuse-codebooks",
+        type=Path,
+        default=None,
+        help="仅对 v2+SH 有意义. 从已有 `.splat4d v2` 读回各 band 的 SHCT centroids",
+    )
+    parser.add_argument(
+        "--reuse-codebooks-mode",
+        choices=["direct", "init"],
+        default="direct",
+        help="仅对 v2+SH 有意义. direct(默认,直接使用,跳过 k-means) 或 init(作为 k-means 初始中心再迭代)",
+    )
+    parser.add_argument(
+        "--decode-cache-dir",
+        type=Path,
+        default=None,
+        help="跨运行的逐帧解码缓存目录(与 `.sog4d` 打包工具的同名参数共用): 按 size/mtime/内容 hash 存解码后的数组,命中时直接 memmap 读回",
+    )
+    parser.add_argument(
+        "--decode-cache-max-gb",
+        type=float,
+        default=20.0,
+        help="解码缓存的大小上限(GiB),超出按 LRU 淘汰",
+    )
     parser.add_argument(
         "--self-check",
         action="store_true",
         help="写出后做一次最小结构自检. v2 会校验 header/section table, v1 会校验文件长度是 64 的倍数",
     )
+    parser.add_argument(
+        "--profile-json",
+        type=Path,
+        default=None,
+        help="把各阶段 wall/CPU 耗时,峰值 RSS 与逐帧耗时直方图写到该 JSON 文件",
+    )
     return parser
 
 
+def _write_profile_json(args: argparse.Namespace, profiler: _StageProfiler, ply_files: list[Path]) -> None:
+    if args.profile_json is None:
+        return
+    profiler.write_json(
+        args.profile_json,
+        {
+            "tool": "ply_sequence_to_splat4d",
+            "splat4dVersion": int(args.splat4d_version),
+            "mode": args.mode,
+            "frameCount": len(ply_files),
+        },
+    )
+    _print_info(f"profile: {args.profile_json}")
+
+
 def main(argv: list[str]) -> int:
     parser = _build_arg_parser()
     args = parser.parse_args(argv)
 
+    profiler = _StageProfiler()
     try:
         ply_files = _resolve_input_ply_files(args)
+        decode_cache: Optional[_PlyDecodeCache] = None
+        if args.decode_cache_dir is not None:
+            if float(args.decode_cache_max_gb) <= 0:
+                raise ValueError(f"--decode-cache-max-gb 必须 >0, got {args.decode_cache_max_gb}")
+            decode_cache = _PlyDecodeCache(args.decode_cache_dir, int(float(args.decode_cache_max_gb) * (1 << 30)))
 
         _print_info(f"input frames: {len(ply_files)}")
         _print_info(f"first: {ply_files[0]}")
@@ -1154,6 +2099,8 @@ def main(argv: list[str]) -> int:
                     output_path=args.output,
                     scale_mode=args.scale_mode,
                     opacity_mode=args.opacity_mode,
+                    profiler=profiler,
+                    decode_cache=decode_cache,
                 )
             else:
                 _run_keyframe_mode(
@@ -1162,6 +2109,8 @@ def main(argv: list[str]) -> int:
                     frame_step=args.frame_step,
                     scale_mode=args.scale_mode,
                     opacity_mode=args.opacity_mode,
+                    profiler=profiler,
+                    decode_cache=decode_cache,
                 )
 
             if args.self_check:
@@ -1169,6 +2118,9 @@ def main(argv: list[str]) -> int:
                 if size % 64 != 0:
                     raise ValueError(f"self-check: v1 输出长度 {size} 不是 64 的整数倍")
                 _print_info(f"self-check ok: raw v1 bytes={size}, records={size // 64}")
+            if decode_cache is not None:
+                _print_info(decode_cache.summary())
+            _write_profile_json(args, profiler, ply_files)
             return 0
 
         if args.mode != "average":
@@ -1187,8 +2139,22 @@ def main(argv: list[str]) -> int:
             sh_codebook_count=args.sh_codebook_count,
             sh_centroids_type=args.sh_centroids_type,
             seed=int(args.seed),
+            weighted_sampler=args.weighted_sampler,
+            kmeans_cfg=_KMeansConfig(
+                algorithm=args.kmeans_algorithm,
+                max_iter=int(args.kmeans_max_iter),
+                tol=float(args.kmeans_tol),
+                threads=int(args.kmeans_threads),
+            ),
             self_check=bool(args.self_check),
+            profiler=profiler,
+            reuse_codebooks=args.reuse_codebooks,
+            reuse_mode=args.reuse_codebooks_mode,
+            decode_cache=decode_cache,
         )
+        if decode_cache is not None:
+            _print_info(decode_cache.summary())
+        _write_profile_json(args, profiler, ply_files)
         return 0
     except ValueError as exc:
         _print_error(str(exc))
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import gzip
+import json
 import subprocess
 import struct
 import sys
@@ -10,6 +12,12 @@ from pathlib import Path
 
 import numpy as np
 
+try:
+    # `.ply.zst` 输入的测试需要 zstandard,缺失时跳过.
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
 
 SCRIPT_PATH = Path(__file__).resolve().parents[1] / "ply_sequence_to_splat4d.py"
 FIXTURE_PLY_PATH = Path(__file__).resolve().parent / "data" / "single_frame_valid_3dgs.ply"
@@ -76,6 +84,35 @@ def _minimal_single_frame_ply_text(*, include_opacity: bool = True) -> str:
     return "\n".join([*header_lines, value_line, ""])
 
 
+def _binary_single_frame_ply_bytes(*, fmt: str, truncate_bytes: int = 0) -> bytes:
+    # 说明:
+    # - 与 `single_frame_valid_3dgs.ply` 同值的 binary 版本.
+    # - `truncate_bytes` 用来构造 body 被截断的坏文件.
+    names = [
+        "x", "y", "z",
+        "f_dc_0", "f_dc_1", "f_dc_2",
+        "opacity",
+        "scale_0", "scale_1", "scale_2",
+        "rot_0", "rot_1", "rot_2", "rot_3",
+    ]
+    values = [0.0, 0.0, 0.0, 0.10, 0.20, 0.30, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0]
+    endian = "<" if fmt == "binary_little_endian" else ">"
+    header = "\n".join(
+        [
+            "ply",
+            f"format {fmt} 1.0",
+            "element vertex 1",
+            *[f"property float {name}" for name in names],
+            "end_header",
+            "",
+        ]
+    ).encode("ascii")
+    body = struct.pack(f"{endian}{len(values)}f", *values)
+    if truncate_bytes:
+        body = body[:-truncate_bytes]
+    return header + body
+
+
 def _minimal_single_frame_sh3_ply_text() -> str:
     # 说明:
     # - 生成 2 个 splat 的最小 SH3 PLY.
@@ -328,6 +365,146 @@ class SingleFrameCliTests(unittest.TestCase):
             self.assertAlmostEqual(float(records["time"][0]), 0.0, places=6)
             self.assertAlmostEqual(float(records["duration"][0]), 1.0, places=6)
 
+    def test_binary_big_endian_ply_matches_ascii_fixture(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_binary_be_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_ply = tmp_dir / "single_frame_be.ply"
+            input_ply.write_bytes(_binary_single_frame_ply_bytes(fmt="binary_big_endian"))
+
+            outputs = []
+            for name, source in (("ascii", FIXTURE_PLY_PATH), ("binary", input_ply)):
+                out_path = tmp_dir / f"{name}.splat4d"
+                result = self.run_cmd(
+                    "--input-ply",
+                    str(source),
+                    "--output",
+                    str(out_path),
+                    "--opacity-mode",
+                    "linear",
+                    "--scale-mode",
+                    "linear",
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{name} 导出失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                outputs.append(out_path.read_bytes())
+
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_gzip_compressed_ply_matches_plain_fixture(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_gzip_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            ascii_gz = tmp_dir / "single_frame_ascii.ply.gz"
+            ascii_gz.write_bytes(gzip.compress(FIXTURE_PLY_PATH.read_bytes()))
+            binary_gz = tmp_dir / "single_frame_le.ply.gz"
+            binary_gz.write_bytes(gzip.compress(_binary_single_frame_ply_bytes(fmt="binary_little_endian")))
+
+            outputs = []
+            for name, source in (("plain", FIXTURE_PLY_PATH), ("ascii_gz", ascii_gz), ("binary_gz", binary_gz)):
+                out_path = tmp_dir / f"{name}.splat4d"
+                result = self.run_cmd(
+                    "--input-ply",
+                    str(source),
+                    "--output",
+                    str(out_path),
+                    "--opacity-mode",
+                    "linear",
+                    "--scale-mode",
+                    "linear",
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{name} 导出失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                outputs.append(out_path.read_bytes())
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+
+    @unittest.skipUnless(zstandard is not None, "需要 zstandard")
+    def test_zstd_compressed_ply_matches_plain_fixture(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_zstd_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            cctx = zstandard.ZstdCompressor()
+            ascii_zst = tmp_dir / "single_frame_ascii.ply.zst"
+            ascii_zst.write_bytes(cctx.compress(FIXTURE_PLY_PATH.read_bytes()))
+            # 多个 zstd frame 拼接也要整体读完.
+            binary = _binary_single_frame_ply_bytes(fmt="binary_little_endian")
+            cut = len(binary) // 2
+            binary_zst = tmp_dir / "single_frame_le.ply.zst"
+            binary_zst.write_bytes(cctx.compress(binary[:cut]) + cctx.compress(binary[cut:]))
+
+            outputs = []
+            for name, source in (("plain", FIXTURE_PLY_PATH), ("ascii_zst", ascii_zst), ("binary_zst", binary_zst)):
+                out_path = tmp_dir / f"{name}.splat4d"
+                result = self.run_cmd(
+                    "--input-ply",
+                    str(source),
+                    "--output",
+                    str(out_path),
+                    "--opacity-mode",
+                    "linear",
+                    "--scale-mode",
+                    "linear",
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{name} 导出失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                outputs.append(out_path.read_bytes())
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+
+    def test_truncated_binary_ply_fails_clearly(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_truncated_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_ply = tmp_dir / "truncated.ply"
+            input_ply.write_bytes(_binary_single_frame_ply_bytes(fmt="binary_little_endian", truncate_bytes=4))
+
+            result = self.run_cmd(
+                "--input-ply",
+                str(input_ply),
+                "--output",
+                str(tmp_dir / "truncated.splat4d"),
+            )
+
+            self.assertNotEqual(
+                result.returncode,
+                0,
+                msg=f"截断的 binary PLY 本应失败,但命令意外成功.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+            )
+            self.assertIn("PLY: vertex body truncated", result.stderr)
+
+    def test_ascii_vertex_line_with_missing_column_fails_clearly(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_ascii_columns_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            text = _minimal_single_frame_sh3_ply_text()
+            lines = text.splitlines()
+            # 第 2 个 vertex(line=1)去掉最后一列.
+            lines[-1] = " ".join(lines[-1].split()[:-1])
+            input_ply = tmp_dir / "missing_column.ply"
+            input_ply.write_text("\n".join([*lines, ""]), encoding="utf-8")
+
+            result = self.run_cmd(
+                "--input-ply",
+                str(input_ply),
+                "--output",
+                str(tmp_dir / "missing_column.splat4d"),
+            )
+
+            self.assertNotEqual(
+                result.returncode,
+                0,
+                msg=f"列数不足的 ascii PLY 本应失败,但命令意外成功.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+            )
+            self.assertIn("PLY: vertex line has too few columns", result.stderr)
+            self.assertIn("line=1", result.stderr)
+
     def test_missing_required_gaussian_field_fails_clearly(self) -> None:
         with tempfile.TemporaryDirectory(prefix="splat4d_missing_field_") as tmp_dir_str:
             tmp_dir = Path(tmp_dir_str)
@@ -457,6 +634,93 @@ class SingleFrameCliTests(unittest.TestCase):
             self.assertEqual((2, 2, 1, 0), band_infos[1])
             self.assertEqual((2, 2, 1, 0), band_infos[2])
 
+    def test_v2_reuse_codebooks_from_existing_splat4d(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_v2_reuse_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_ply = tmp_dir / "single_frame_sh3.ply"
+            input_ply.write_text(_minimal_single_frame_sh3_ply_text(), encoding="utf-8")
+
+            common = (
+                "--input-ply",
+                str(input_ply),
+                "--mode",
+                "average",
+                "--opacity-mode",
+                "linear",
+                "--scale-mode",
+                "linear",
+                "--splat4d-version",
+                "2",
+                "--sh-codebook-count",
+                "2",
+                "--sh-centroids-type",
+                "f32",
+            )
+            source = tmp_dir / "source.splat4d"
+            direct = tmp_dir / "direct.splat4d"
+            init = tmp_dir / "init.splat4d"
+            results = [
+                self.run_cmd(*common, "--output", str(source)),
+                self.run_cmd(*common, "--output", str(direct), "--reuse-codebooks", str(source)),
+                self.run_cmd(
+                    *common,
+                    "--output",
+                    str(init),
+                    "--reuse-codebooks",
+                    str(source),
+                    "--reuse-codebooks-mode",
+                    "init",
+                    "--self-check",
+                ),
+            ]
+            for result in results:
+                self.assertEqual(result.returncode, 0, msg=f"stdout:\n{result.stdout}\nstderr:\n{result.stderr}")
+
+            # direct: SHCT 原样复用,SHLB 用同一组 centroids 分配,整个文件应逐字节一致.
+            self.assertIn("sh3: reusing 2 centroids, skip k-means", results[1].stderr)
+            self.assertNotIn("fitting k-means", results[1].stderr)
+            self.assertEqual(source.read_bytes(), direct.read_bytes())
+            self.assertIn("init=reused)", results[2].stderr)
+            self.assertIn("self-check ok", results[2].stderr)
+
+    def test_profile_json_reports_stage_timings(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_profile_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_ply = tmp_dir / "single_frame_sh3.ply"
+            input_ply.write_text(_minimal_single_frame_sh3_ply_text(), encoding="utf-8")
+
+            profile_path = tmp_dir / "profile.json"
+            result = self.run_cmd(
+                "--input-ply",
+                str(input_ply),
+                "--output",
+                str(tmp_dir / "out.splat4d"),
+                "--opacity-mode",
+                "linear",
+                "--scale-mode",
+                "linear",
+                "--splat4d-version",
+                "2",
+                "--sh-codebook-count",
+                "2",
+                "--self-check",
+                "--profile-json",
+                str(profile_path),
+            )
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            profile = json.loads(profile_path.read_text(encoding="utf-8"))
+            self.assertEqual("ply_sequence_to_splat4d", profile["tool"])
+            self.assertGreater(profile["peakRssBytes"], 0)
+            stages = profile["stages"]
+            for name in ("ply_read", "build_records", "kmeans_fit:sh1", "predict:sh3", "write", "self_check"):
+                self.assertIn(name, stages)
+                self.assertGreaterEqual(stages[name]["wallSeconds"], 0.0)
+                self.assertGreater(stages[name]["processPeakRssBytesAtEnd"], 0)
+                self.assertGreaterEqual(stages[name]["peakRssGrowthBytes"], 0)
+                self.assertLessEqual(stages[name]["processPeakRssBytesAtEnd"], profile["peakRssBytes"])
+            self.assertEqual(1, stages["ply_read"]["perFrame"]["count"])
+
     def test_single_ply_v2_sh3_preserves_channel_major_rest_layout(self) -> None:
         with tempfile.TemporaryDirectory(prefix="splat4d_v2_layout_") as tmp_dir_str:
             tmp_dir = Path(tmp_dir_str)
@@ -563,6 +827,50 @@ class SingleFrameCliTests(unittest.TestCase):
                 ),
             )
 
+    def test_decode_cache_hit_keeps_channel_major_rest_layout(self) -> None:
+        with tempfile.TemporaryDirectory(prefix="splat4d_decode_cache_") as tmp_dir_str:
+            tmp_dir = Path(tmp_dir_str)
+            input_ply = tmp_dir / "channel_major_sh3.ply"
+            input_ply.write_text(_single_vertex_channel_major_sh3_ply_text(), encoding="utf-8")
+            cache_dir = tmp_dir / "cache"
+
+            outputs: list[bytes] = []
+            for tag, extra in (
+                ("plain", ()),
+                ("cold", ("--decode-cache-dir", str(cache_dir))),
+                ("warm", ("--decode-cache-dir", str(cache_dir))),
+            ):
+                out_path = tmp_dir / f"{tag}.splat4d"
+                result = self.run_cmd(
+                    "--input-ply",
+                    str(input_ply),
+                    "--output",
+                    str(out_path),
+                    "--opacity-mode",
+                    "linear",
+                    "--scale-mode",
+                    "linear",
+                    "--splat4d-version",
+                    "2",
+                    "--sh-codebook-count",
+                    "1",
+                    *extra,
+                )
+                self.assertEqual(
+                    result.returncode,
+                    0,
+                    msg=f"{tag} 导出失败.\nstdout:\n{result.stdout}\nstderr:\n{result.stderr}",
+                )
+                if tag == "cold":
+                    self.assertIn("decode cache: hits=0, misses=1", result.stdout + result.stderr)
+                if tag == "warm":
+                    self.assertIn("decode cache: hits=1, misses=0", result.stdout + result.stderr)
+                outputs.append(out_path.read_bytes())
+
+            # 缓存里存的是 PLY 字段顺序的原始 rest,命中后仍按 channel-major 解释.
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(outputs[0], outputs[2])
+
     def test_v2_rejects_multi_frame_input_clearly(self) -> None:
         with tempfile.TemporaryDirectory(prefix="splat4d_v2_multiframe_") as tmp_dir_str:
             tmp_dir = Path(tmp_dir_str)